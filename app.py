@@ -3,19 +3,22 @@ import queue
 import threading
 import uuid
 from pathlib import Path
-from concurrent.futures import ThreadPoolExecutor, as_completed
 
 from flask import Flask, render_template, request, jsonify, Response, send_from_directory
 
 from modules.downloader import YouTubeDownloader
 from modules.transcriber import VideoTranscriber
 from modules.analyzer import ViralMomentAnalyzer
+from modules.progressive_ingest import download_and_transcribe
 from modules.video_processor import VideoProcessor
 from modules.subtitle_generator import SubtitleGenerator
+from utils.download_store import DownloadStore
 from utils.helpers import check_dependencies, clean_filename
+from utils.transcript_index import TranscriptIndex
 from config import (
     SUBTITLE_TEMPLATES, OPENAI_API_KEY, ANTHROPIC_API_KEY,
     DOWNLOADS_DIR, OUTPUTS_DIR, SUPPORTED_FORMATS, CHUNK_DURATION,
+    ANALYSIS_STREAMING, INGEST_PROGRESSIVE,
 )
 
 app = Flask(__name__)
@@ -73,6 +76,8 @@ def upload_file():
 
     downloads_path = Path(DOWNLOADS_DIR)
     downloads_path.mkdir(exist_ok=True)
+    # Uploads are not in the download index; old ones are removed by age
+    DownloadStore(downloads_path).sweep_untracked()
     filename = clean_filename(file.filename)
     save_path = downloads_path / filename
     file.save(str(save_path))
@@ -115,7 +120,23 @@ def process_video():
     q: queue.Queue = queue.Queue()
 
     def worker():
+        # Video id whose download is kept from eviction until this worker is done
+        leased_id = None
         try:
+            transcriber = VideoTranscriber()
+            transcript = None
+
+            last_tr_pct = [-1]
+            def _tr_progress(done, total):
+                rounded = int(done / total * 100) if total else 100
+                if rounded >= last_tr_pct[0] + 2 or rounded >= 100:
+                    last_tr_pct[0] = rounded
+                    q.put(("transcribe_progress", {
+                        "percent": min(rounded, 100),
+                        "done": done,
+                        "total": total,
+                    }))
+
             # Step 1 — Acquire video
             if source == "youtube":
                 q.put(("progress", {"step": 1, "total": 5, "message": "Downloading video from YouTube..."}))
@@ -133,7 +154,16 @@ def process_video():
                             "total": total,
                         }))
 
-                video_data = downloader.download(url, quality, progress_callback=_dl_progress)
+                if INGEST_PROGRESSIVE and downloader.lookup(url, quality) is None:
+                    # The audio is transcribed while the video is still downloading.
+                    q.put(("progress", {"step": 2, "total": 5, "message": "Downloading and transcribing..."}))
+                    video_data, transcript = download_and_transcribe(
+                        downloader, transcriber, url, quality,
+                        progress_callback=_dl_progress, transcribe_progress=_tr_progress, lease=True,
+                    )
+                else:
+                    video_data = downloader.download(url, quality, progress_callback=_dl_progress, lease=True)
+                leased_id = video_data["video_id"]
             else:
                 q.put(("progress", {"step": 1, "total": 5, "message": "Loading local video..."}))
                 save_path = Path(DOWNLOADS_DIR) / local_file
@@ -156,15 +186,34 @@ def process_video():
                 }
 
             # Step 2 — Transcribe
-            q.put(("progress", {"step": 2, "total": 5, "message": "Transcribing audio..."}))
-            transcriber = VideoTranscriber()
-            transcript = transcriber.transcribe(video_data["filepath"], language=None)
-            detected_language = transcript.get("language", "en")
-
-            # Step 3 — Analyze
-            q.put(("progress", {"step": 3, "total": 5, "message": "Analyzing for viral moments..."}))
             analyzer = ViralMomentAnalyzer(provider=ai_provider)
-            viral_moments = analyzer.analyze_transcript(transcript, chunk_duration=CHUNK_DURATION)
+            if transcript is not None:
+                # Already transcribed during the download
+                q.put(("progress", {"step": 3, "total": 5, "message": "Analyzing for viral moments..."}))
+                viral_moments = analyzer.analyze_transcript(transcript, chunk_duration=CHUNK_DURATION, video_signals=video_data)
+            else:
+                q.put(("progress", {"step": 2, "total": 5, "message": "Transcribing audio..."}))
+                stream = transcriber.transcribe_stream(
+                    video_data["filepath"], language=None, progress_callback=_tr_progress
+                )
+                if ANALYSIS_STREAMING:
+                    # Windows are scored as soon as they close, overlapping with Whisper.
+                    q.put(("progress", {"step": 3, "total": 5, "message": "Transcribing and analyzing for viral moments..."}))
+                    viral_moments = analyzer.analyze_transcript_stream(
+                        stream, chunk_duration=CHUNK_DURATION, video_signals=video_data
+                    )
+                    transcript = stream.transcript
+                else:
+                    for _ in stream:
+                        pass
+                    transcript = stream.transcript
+
+                    # Step 3 — Analyze
+                    q.put(("progress", {"step": 3, "total": 5, "message": "Analyzing for viral moments..."}))
+                    viral_moments = analyzer.analyze_transcript(transcript, chunk_duration=CHUNK_DURATION, video_signals=video_data)
+            # Refinement, subtitles and restyles all query this transcript by time range.
+            transcript = TranscriptIndex(transcript)
+            detected_language = transcript.get("language", "en")
 
             if not viral_moments:
                 q.put(("error", {"message": "No viral moments found. Try a different video or lower the minimum score."}))
@@ -184,36 +233,49 @@ def process_video():
             # Step 5 — Extract clips
             q.put(("progress", {"step": 5, "total": 5, "message": f"Extracting {len(validated_moments)} clips..."}))
 
-            progress_lock = threading.Lock()
-
-            def extract_single_clip(index, moment):
-                output_name = f"clip_{index+1}_score_{moment['score']:.1f}"
-                pre_subtitle_path = processor.extract_clip(
+            # Nearby clips share one decode of the source; failures are reported per clip.
+            if add_subtitles:
+                # Subtitles are burned in the same pass. Restyling re-renders from
+                # the source, so no pre-subtitle file is kept.
+                generator = SubtitleGenerator()
+                results = generator.render_subtitled_clips(
+                    processor,
                     video_data["filepath"],
-                    moment["start"],
-                    moment["end"],
-                    output_name,
+                    transcript,
+                    [
+                        {"start": m["start"], "end": m["end"], "output_name": f"clip_{i+1}_final"}
+                        for i, m in enumerate(validated_moments)
+                    ],
                     vertical_format=vertical_format,
+                    style_template=subtitle_style,
+                    language=detected_language,
                 )
-                clip_path = pre_subtitle_path
-                if add_subtitles:
-                    generator = SubtitleGenerator()
-                    output_name = f"clip_{index+1}_final"
-                    clip_path = generator.add_subtitles(
-                        pre_subtitle_path,
-                        transcript,
-                        moment["start"],
-                        moment["end"],
-                        output_name,
-                        vertical_format=vertical_format,
-                        clip_start_time=moment["start"],
-                        style_template=subtitle_style,
-                        language=detected_language,
-                    )
-                return {
-                    "index": index,
+            else:
+                results = processor.extract_clips_batch(
+                    video_data["filepath"],
+                    [
+                        {
+                            "start": m["start"],
+                            "end": m["end"],
+                            "output_name": f"clip_{i+1}_score_{m['score']:.1f}",
+                        }
+                        for i, m in enumerate(validated_moments)
+                    ],
+                    vertical_format=vertical_format,
+                )
+
+            clips = []
+            for index, (moment, result) in enumerate(zip(validated_moments, results)):
+                if result["error"]:
+                    q.put(("clip_error", {
+                        "index": index,
+                        "message": f"Failed to extract clip {index + 1}: {result['error']}",
+                    }))
+                    continue
+                clip_path = result["path"]
+                clips.append({
                     "path": clip_path,
-                    "pre_subtitle_path": pre_subtitle_path,
+                    "pre_subtitle_path": None if add_subtitles else clip_path,
                     "filename": Path(clip_path).name,
                     "start": moment["start"],
                     "end": moment["end"],
@@ -222,29 +284,12 @@ def process_video():
                     "reason": moment.get("reason", ""),
                     "title": moment.get("title", ""),
                     "description": moment.get("description", ""),
-                }
-
-            clips = []
-            max_workers = min(4, len(validated_moments))
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = {
-                    executor.submit(extract_single_clip, i, m): i
-                    for i, m in enumerate(validated_moments)
-                }
-                for future in as_completed(futures):
-                    try:
-                        clips.append(future.result())
-                    except Exception as e:
-                        q.put(("error", {"message": f"Failed to extract a clip: {str(e)}"}))
-
-            clips.sort(key=lambda x: x["index"])
-            # Remove internal index key
-            for c in clips:
-                c.pop("index", None)
+                })
 
             # Store session data for restyle feature
             session_id = str(uuid.uuid4())
             _sessions[session_id] = {
+                "source_path": video_data["filepath"],
                 "transcript": transcript,
                 "clips": clips,
                 "vertical_format": vertical_format,
@@ -265,6 +310,9 @@ def process_video():
 
         except Exception as e:
             q.put(("error", {"message": str(e)}))
+        finally:
+            if leased_id:
+                downloader.release(leased_id)
 
     def generate():
         t = threading.Thread(target=worker, daemon=True)
@@ -308,24 +356,40 @@ def restyle_clip():
         return jsonify({"error": "Invalid clip index"}), 400
 
     clip = clips[clip_index]
-    pre_sub_path = clip.get("pre_subtitle_path", "")
-    if not pre_sub_path or not Path(pre_sub_path).exists():
-        return jsonify({"error": "Pre-subtitle clip not available"}), 404
+    source_path = session.get("source_path", "")
+    pre_sub_path = clip.get("pre_subtitle_path") or ""
+    has_source = bool(source_path) and Path(source_path).exists()
+    if not has_source and (not pre_sub_path or not Path(pre_sub_path).exists()):
+        return jsonify({"error": "Source video not available"}), 404
 
     try:
         generator = SubtitleGenerator()
         output_name = f"clip_{clip_index+1}_restyle"
-        new_path = generator.add_subtitles(
-            pre_sub_path,
-            session["transcript"],
-            clip["start"],
-            clip["end"],
-            output_name,
-            vertical_format=session["vertical_format"],
-            clip_start_time=clip["start"],
-            style_template=style,
-            language=session["language"],
-        )
+        if has_source:
+            # Re-render from the source in one pass instead of stacking a second encode.
+            new_path = generator.render_subtitled_clip(
+                VideoProcessor(),
+                source_path,
+                session["transcript"],
+                clip["start"],
+                clip["end"],
+                output_name,
+                vertical_format=session["vertical_format"],
+                style_template=style,
+                language=session["language"],
+            )
+        else:
+            new_path = generator.add_subtitles(
+                pre_sub_path,
+                session["transcript"],
+                clip["start"],
+                clip["end"],
+                output_name,
+                vertical_format=session["vertical_format"],
+                clip_start_time=clip["start"],
+                style_template=style,
+                language=session["language"],
+            )
         new_filename = Path(new_path).name
         # Update session data
         clip["path"] = new_path
@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""Compare per-chunk prefilter scoring with the segment-level SegmentPrefilter.
+
+Builds a synthetic transcript (default 10 hours) with keywords, hook phrases
+and pauses, cuts it into sliding windows and times ranking features for all
+of them both ways.
+
+    python benchmarks/prefilter.py --hours 10 --window 45 --overlap 15
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules import analyzer as analyzer_module
+from modules.analyzer import ViralMomentAnalyzer
+
+_VOCABULARY = (
+    "so we went there and it was honestly a normal day until the secret came out "
+    "nobody talks about this but the truth is 250 people were wrong why would you "
+    "wait for it no way that is insane what happened next changed everything"
+).split()
+
+
+def _synthetic_segments(hours, seed=0):
+    rng = random.Random(seed)
+    segments = []
+    current = 0.0
+    while current < hours * 3600.0:
+        duration = rng.uniform(2.0, 6.0)
+        words = [rng.choice(_VOCABULARY) for _ in range(int(duration * 2.8))]
+        text = ' '.join(words) + rng.choice(['.', '?', '!', ',', ''])
+        segments.append({'start': current, 'end': current + duration, 'text': ' ' + text.capitalize()})
+        current += duration + rng.choice([0.0, 0.1, 0.5, 1.0])
+    return segments
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, default=10.0, help='Synthetic transcript length')
+    parser.add_argument('--window', type=float, default=analyzer_module.SLIDING_WINDOW_SIZE, help='Sliding window (s)')
+    parser.add_argument('--overlap', type=float, default=analyzer_module.SLIDING_OVERLAP, help='Window overlap (s)')
+    args = parser.parse_args()
+    analyzer_module.SLIDING_WINDOW_SIZE = args.window
+    analyzer_module.SLIDING_OVERLAP = args.overlap
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    segments = _synthetic_segments(args.hours)
+    chunks = analyzer._create_sliding_chunks(segments)
+
+    started = time.perf_counter()
+    per_chunk = [analyzer._prefilter_features(chunk, 'en') for chunk in chunks]
+    per_chunk_time = time.perf_counter() - started
+
+    started = time.perf_counter()
+    vectorized = analyzer._prefilter_feature_rows(chunks, 'en')
+    vectorized_time = time.perf_counter() - started
+
+    print(f"Transcript:         {args.hours:g}h, {len(segments)} segments, "
+          f"{len(chunks)} sliding chunks ({args.window:g}s, {args.overlap:g}s overlap)")
+    print(f"Per-chunk:          {per_chunk_time:.3f}s")
+    print(f"SegmentPrefilter:   {vectorized_time:.3f}s")
+    print(f"Speed-up:           {per_chunk_time / vectorized_time:.1f}x")
+    print(f"Identical features: {per_chunk == vectorized}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,87 @@
+#!/usr/bin/env python3
+"""Compare linear transcript range scans with TranscriptIndex lookups.
+
+Builds a synthetic transcript (default 6 hours, ~3 words/s) and times the
+range queries subtitle rendering and moment refinement issue per clip.
+
+    python benchmarks/transcript_index.py --hours 6 --queries 2000
+"""
+
+import argparse
+import random
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from modules.transcriber import VideoTranscriber
+from utils.transcript_index import TranscriptIndex
+
+
+def _synthetic_transcript(hours, seed=0):
+    rng = random.Random(seed)
+    segments = []
+    current = 0.0
+    total = hours * 3600.0
+    while current < total:
+        words = []
+        for _ in range(rng.randint(6, 14)):
+            start = current
+            current += rng.uniform(0.15, 0.45)
+            words.append({'word': 'word', 'start': round(start, 3), 'end': round(current, 3), 'probability': 1.0})
+        segments.append({
+            'id': len(segments),
+            'start': words[0]['start'],
+            'end': words[-1]['end'],
+            'text': ' '.join(word['word'] for word in words),
+            'words': words,
+        })
+        current += rng.uniform(0.0, 0.8)
+    return {'language': 'en', 'duration': current, 'segments': segments}
+
+
+def _time_queries(label, queries, get_words, get_segments, get_text):
+    started = time.perf_counter()
+    for start, end in queries:
+        get_words(start, end)
+        get_segments(start, end)
+        get_text(start)
+    elapsed = time.perf_counter() - started
+    print(f"{label:<20}{elapsed:.3f}s ({elapsed / len(queries) * 1e6:.1f} us/query)")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--hours', type=float, default=6.0, help='Synthetic transcript length')
+    parser.add_argument('--queries', type=int, default=2000, help='Range queries per method')
+    args = parser.parse_args()
+
+    transcript = _synthetic_transcript(args.hours)
+    word_count = sum(len(segment['words']) for segment in transcript['segments'])
+    rng = random.Random(1)
+    queries = []
+    for _ in range(args.queries):
+        start = rng.uniform(0.0, transcript['duration'])
+        queries.append((start, start + rng.uniform(15.0, 60.0)))
+
+    transcriber = VideoTranscriber()
+    started = time.perf_counter()
+    index = TranscriptIndex(transcript)
+    build_time = time.perf_counter() - started
+
+    print(f"Transcript:         {args.hours:g}h, {len(transcript['segments'])} segments, {word_count} words")
+    print(f"Index build:        {build_time:.3f}s")
+    linear = _time_queries(
+        'Linear scan:', queries,
+        lambda s, e: transcriber.get_words_in_range(transcript, s, e),
+        lambda s, e: transcriber.get_segments_in_range(transcript, s, e),
+        lambda t: transcriber.get_text_at_time(transcript, t),
+    )
+    indexed = _time_queries('TranscriptIndex:', queries, index.words_in_range, index.segments_in_range, index.text_at)
+    print(f"Speed-up:           {linear / indexed:.0f}x")
+
+
+if __name__ == "__main__":
+    main()
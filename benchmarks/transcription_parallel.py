@@ -0,0 +1,83 @@
+#!/usr/bin/env python3
+"""Compare serial and parallel (span-split) faster-whisper transcription.
+
+Reports wall time, speed-up and timestamp drift of words near each seam,
+measured against the serial transcript.
+
+    python benchmarks/transcription_parallel.py path/to/video.mp4 --workers 8
+"""
+
+import argparse
+import sys
+import time
+from bisect import bisect_left
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import modules.transcriber as transcriber_module
+from modules.transcriber import VideoTranscriber
+from utils.audio_cache import detect_silences, load_decoded_audio
+from config import AUDIO_SAMPLE_RATE
+
+
+def _flatten_words(transcript):
+    return [word for segment in transcript['segments'] for word in segment.get('words', [])]
+
+
+def _seam_drift(serial_words, parallel_words, seams, radius=5.0):
+    """Mean/max |start difference| of identical words within `radius` seconds of a seam."""
+    serial_starts = [word['start'] for word in serial_words]
+    drifts = []
+    for word in parallel_words:
+        if not any(abs(word['start'] - seam) <= radius for seam in seams):
+            continue
+        index = bisect_left(serial_starts, word['start'] - 1.0)
+        candidates = [
+            candidate for candidate in serial_words[index:index + 20]
+            if candidate['word'].lower() == word['word'].lower()
+        ]
+        if candidates:
+            drifts.append(min(abs(candidate['start'] - word['start']) for candidate in candidates))
+    if not drifts:
+        return 0.0, 0.0, 0
+    return sum(drifts) / len(drifts), max(drifts), len(drifts)
+
+
+def _timed_transcription(video_path, language, workers):
+    transcriber_module.WHISPER_PARALLEL_WORKERS = workers
+    transcriber = VideoTranscriber()
+    started = time.perf_counter()
+    transcript = transcriber.transcribe(video_path, force=True, language=language)
+    return transcript, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('video', help='Video or audio file to transcribe')
+    parser.add_argument('--workers', type=int, default=8, help='Parallel worker processes')
+    parser.add_argument('--language', default=None, help='Force a language (default: auto-detect)')
+    args = parser.parse_args()
+
+    # Decode up front so both runs read the same cached PCM.
+    audio = load_decoded_audio(args.video)
+    duration = len(audio) / AUDIO_SAMPLE_RATE
+
+    serial, serial_time = _timed_transcription(args.video, args.language, 0)
+    parallel, parallel_time = _timed_transcription(args.video, args.language, args.workers)
+
+    span_count = max(2, min(args.workers, int(duration // transcriber_module.WHISPER_PARALLEL_MIN_SPAN)))
+    spans = VideoTranscriber()._plan_transcription_spans(detect_silences(audio), duration, span_count)
+    seams = [start for start, _ in spans[1:]]
+    mean_drift, max_drift, matched = _seam_drift(_flatten_words(serial), _flatten_words(parallel), seams)
+
+    print(f"Audio duration:     {duration:.1f}s")
+    print(f"Serial:             {serial_time:.1f}s ({len(serial['segments'])} segments)")
+    print(f"Parallel ({args.workers} workers): {parallel_time:.1f}s ({len(parallel['segments'])} segments)")
+    print(f"Speed-up:           {serial_time / parallel_time:.2f}x")
+    print(f"Seams:              {', '.join(f'{seam:.1f}s' for seam in seams)}")
+    print(f"Seam word drift:    mean {mean_drift * 1000:.0f} ms, max {max_drift * 1000:.0f} ms ({matched} words)")
+
+
+if __name__ == "__main__":
+    main()
@@ -14,16 +14,35 @@ BASE_DIR = Path(__file__).parent
 DOWNLOADS_DIR = BASE_DIR / "downloads"
 OUTPUTS_DIR = BASE_DIR / "outputs"
 TRANSCRIPTS_DIR = BASE_DIR / "transcripts"
+AUDIO_CACHE_DIR = BASE_DIR / "cache" / "audio"  # Decoded 16 kHz mono PCM shared by audio stages
+ANALYSIS_CACHE_DIR = BASE_DIR / "cache" / "analysis"  # LLM results and per-chunk scores
 
 for dir_path in [DOWNLOADS_DIR, OUTPUTS_DIR, TRANSCRIPTS_DIR]:
     dir_path.mkdir(exist_ok=True)
 
 VIDEO_QUALITY = "720p"
+# Audio-first ingest (main.py --audio-first): transcribe and analyze from the audio stream, then
+# download only the selected moments' time ranges (plus padding) of the video.
+INGEST_AUDIO_FIRST = False
+VIDEO_RANGE_PADDING = 2.0  # Seconds of video kept around each moment, room for sentence refinement
+# Progressive ingest (web UI): download the audio stream next to the video, decode it to PCM while it
+# arrives and transcribe it span by span, so transcription is mostly done when the video download ends.
+INGEST_PROGRESSIVE = False
+PROGRESSIVE_TRANSCRIBE_SPAN = 120  # Seconds per span; cuts move to silences within WHISPER_PARALLEL_SEARCH_WINDOW
 WHISPER_MODEL = "base"
 WHISPER_BACKEND = "faster-whisper"  # Options: "faster-whisper", "openai-whisper"
 WHISPER_DEVICE = "cpu"  # Set to "cuda" on GPU VPS instances
 WHISPER_COMPUTE_TYPE = "int8"  # Good CPU default for faster-whisper
 WHISPER_VAD_FILTER = False  # Keep timestamps stable for clipping by default
+AUDIO_SAMPLE_RATE = 16000  # Whisper's native rate; audio is decoded once per source at this rate
+AUDIO_CACHE_MAX_MB = 4096  # Decoded int16 PCM in cache/audio (~115 MB per hour of source), least recently used evicted first
+AUDIO_CACHE_MAX_ENTRIES = 100
+WHISPER_PARALLEL_WORKERS = 0  # >1: split long audio at silences and transcribe spans in a process pool (faster-whisper)
+WHISPER_PARALLEL_CPU_THREADS = 4  # cpu_threads of each worker's WhisperModel
+WHISPER_PARALLEL_MIN_SPAN = 120  # Seconds; audio shorter than two spans stays on the serial path
+WHISPER_PARALLEL_SEARCH_WINDOW = 20  # Seconds around each nominal cut searched for a silence
+FINGERPRINT_SAMPLE_COUNT = 16  # Evenly spaced blocks hashed (plus head and tail) to identify a source file
+FINGERPRINT_SAMPLE_SIZE = 256 * 1024  # Bytes per sampled block
 
 # AI Provider Settings
 AI_PROVIDER = "openai"  # Options: "ollama", "openai", "anthropic"
@@ -31,6 +50,63 @@ LLM_MODEL = "llama3.2:latest"  # For Ollama
 OPENAI_MODEL = "gpt-5-mini-2025-08-07"  # For OpenAI
 ANTHROPIC_MODEL = "claude-3-opus-20240229"  # For Anthropic
 AI_TEMPERATURE = 0.0  # Set to 0 for deterministic outputs
+OLLAMA_NUM_CTX = 8192  # Context window requested from Ollama
+
+
+def _parse_concurrency(value: str, source: str) -> int:
+    """Positive int from an environment setting; 1 (with a warning) if it is not one."""
+    try:
+        concurrency = int(value.strip())
+    except ValueError:
+        concurrency = 0
+    if concurrency < 1:
+        print(f"Warning: invalid parallel request count {value!r} in {source}, using 1")
+        return 1
+    return concurrency
+
+
+def _parse_ollama_hosts(value: str) -> list:
+    """OLLAMA_HOSTS entries "url" or "url=N" as {"host", "max_concurrency"}; entries without a url are skipped."""
+    hosts = []
+    for entry in value.split(","):
+        if not entry.strip():
+            continue
+        entry = entry.strip()
+        host, separator, concurrency = entry.rpartition("=")
+        host = host.strip() if separator else entry
+        if not host:
+            print(f"Warning: ignoring OLLAMA_HOSTS entry without a host: {entry!r}")
+            continue
+        hosts.append({
+            "host": host,
+            "max_concurrency": _parse_concurrency(concurrency, f"OLLAMA_HOSTS entry {entry!r}") if separator else 1,
+        })
+    return hosts
+
+
+# Ollama endpoints and the parallel requests each one serves (match its OLLAMA_NUM_PARALLEL).
+# Override with OLLAMA_HOSTS="http://gpu1:11434=4,http://gpu2:11434=2".
+OLLAMA_HOSTS = _parse_ollama_hosts(os.getenv("OLLAMA_HOSTS", "")) or [{
+    "host": os.getenv("OLLAMA_HOST", "http://localhost:11434"),
+    "max_concurrency": _parse_concurrency(os.getenv("OLLAMA_NUM_PARALLEL", "1"), "OLLAMA_NUM_PARALLEL"),
+}]
+OLLAMA_HEALTH_CHECK_INTERVAL = 30  # Seconds before a host marked down is probed again
+LLM_CONTEXT_TOKENS = {"ollama": OLLAMA_NUM_CTX, "openai": 128000, "anthropic": 200000}  # Sizes batched prompts
+# Process-wide limits per provider, shared by all concurrent jobs. Concurrency adapts (AIMD)
+# between 1 and max_concurrency; rpm/tpm of 0 disable the request/token buckets.
+LLM_RATE_LIMITS = {
+    "openai": {"max_concurrency": 16, "initial_concurrency": 8, "rpm": 500, "tpm": 200000},
+    "anthropic": {"max_concurrency": 8, "initial_concurrency": 4, "rpm": 50, "tpm": 40000},
+    "ollama": {"max_concurrency": sum(host["max_concurrency"] for host in OLLAMA_HOSTS),
+               "initial_concurrency": sum(host["max_concurrency"] for host in OLLAMA_HOSTS), "rpm": 0, "tpm": 0},
+}
+LLM_STRUCTURED_OUTPUT = True  # Schema-constrained replies (Ollama format, OpenAI json_schema, Anthropic tool use)
+LLM_SCORE_MAX_TOKENS = 200  # Output cap for one score object; batches get ANALYSIS_BATCH_TOKENS_PER_CHUNK per chunk
+LLM_METADATA_MAX_TOKENS = 300  # Output cap for a clip title and description
+LLM_REASONING_TOKENS = 2000  # Extra output budget for reasoning models (gpt-5, o-series), which spend it before answering
+LLM_MAX_RETRIES = 5  # Retries of rate-limited/overloaded calls
+LLM_RETRY_BASE_DELAY = 1.0  # Seconds; full-jitter exponential backoff
+LLM_RETRY_MAX_DELAY = 30.0
 
 # API Keys (set via environment variables)
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
@@ -233,10 +309,27 @@ Reason: [Brief explanation]
 """
 
 MAX_VIDEO_SIZE_MB = 500
+DOWNLOAD_STORE_MAX_MB = 20480  # Disk quota of reusable downloads; least recently used are deleted first
+DOWNLOAD_UNTRACKED_MAX_AGE_HOURS = 24  # Uploads and other files the download index does not track are deleted after this
+DOWNLOAD_STORE_TOUCH_INTERVAL = 300  # Seconds; a reuse rewrites the download index at most this often per entry
+BATCH_DOWNLOAD_WORKERS = 3  # Batch mode (main.py --batch): videos downloaded at once
+BATCH_MAX_IN_FLIGHT = 6  # Videos between download and rendering at any time; playlists are expanded lazily
 SUPPORTED_FORMATS = [".mp4", ".webm", ".mkv"]
 OUTPUT_FORMAT = "mp4"
 VIDEO_CODEC = "libx264"
 AUDIO_CODEC = "aac"
+VERTICAL_OUTPUT_SIZE = (1080, 1920)  # 9:16 frame used for vertical clips
+
+# Batch clip extraction: nearby clips are cut from one decode of the source
+BATCH_EXTRACT_ENABLED = True
+BATCH_EXTRACT_MAX_GAP = 20  # Max seconds of source decoded between two clips sharing a process
+BATCH_EXTRACT_MAX_OVERLAP = 1.6  # Covered/spanned ratio above which clips use separate processes
+BATCH_EXTRACT_MAX_OUTPUTS = 6  # Max clips encoded by one ffmpeg process
+BATCH_EXTRACT_WORKERS = 4  # Concurrent ffmpeg processes
+
+# Horizontal clips without subtitles: re-encode only up to the first keyframe, copy the rest
+SMART_CUT_ENABLED = True
+SMART_CUT_TOLERANCE = 0.02  # Seconds; a keyframe this close to the cut point needs no re-encode
 
 WHISPER_LANGUAGE = None  
 WHISPER_TASK = "transcribe"  
@@ -257,5 +350,44 @@ ANALYSIS_CANDIDATE_RATIO = 0.45
 ANALYSIS_MIN_CANDIDATES = 24
 ANALYSIS_EXPANSION_BATCH = 12
 ANALYSIS_TARGET_MOMENTS = 5
+# Learned prefilter (python main.py --train-prefilter): logistic regression over hashed n-grams and
+# heuristic features, trained from cached LLM chunk scores. Used for ranking when the file exists.
+PREFILTER_MODEL_ENABLED = True
+PREFILTER_MODEL_PATH = ANALYSIS_CACHE_DIR / "prefilter_model.npz"
+PREFILTER_MODEL_HASH_BITS = 16
+PREFILTER_MODEL_MIN_SAMPLES = 200  # Cached scores needed before training
+PREFILTER_MODEL_HIT_MARGIN = 2.0  # Shortlist until predicted hits reach this multiple of ANALYSIS_TARGET_MOMENTS
+PREFILTER_REPLAY_WEIGHT = 6.0  # Prefilter points for a chunk at the video's YouTube "most replayed" peak
+CHUNK_CHAPTER_HINTS = True  # Break fixed/smart chunks at YouTube chapter starts; sliding adds a window per chapter
+ANALYSIS_PROMPT_VERSION = 2  # Bump when the scoring prompt changes to invalidate cached chunk scores
+ANALYSIS_CHUNK_CACHE_MAX_MB = 256  # Per-chunk LLM score cache (cache/analysis/chunks), least recently used evicted first
+ANALYSIS_CHUNK_CACHE_MAX_ENTRIES = 100000
+ANALYSIS_RESULT_CACHE_MAX_ENTRIES = 500  # Whole-transcript results in cache/analysis
+ANALYSIS_CACHE_PRUNE_INTERVAL = 3600  # Seconds between LRU sweeps of cache/analysis (a sweep stats every entry)
+ANALYSIS_CACHE_PRUNE_WRITES = 5000  # ...or sooner, once an analyzer has written this many chunk scores
+ANALYSIS_BATCH_SCORING = True  # Score several chunks per LLM request (rubric sent once)
+ANALYSIS_MAX_BATCH_CHUNKS = 8
+ANALYSIS_BATCH_PROMPT_TOKENS = 1200  # Rubric, instructions and slack reserved in each batched request
+ANALYSIS_BATCH_TOKENS_PER_CHUNK = 150  # Id header plus the JSON reply object of one chunk
+# Two-stage cascade: a cheap screening model scores every candidate, the main model re-scores
+# the top ANALYSIS_CASCADE_TOP_N plus those within ANALYSIS_CASCADE_BORDERLINE of the threshold.
+ANALYSIS_CASCADE_ENABLED = False
+ANALYSIS_SCREEN_PROVIDER = "ollama"
+ANALYSIS_SCREEN_MODEL = None  # None uses the screening provider's default model above
+ANALYSIS_CASCADE_TOP_N = 10
+ANALYSIS_CASCADE_BORDERLINE = 1.5  # Score points below the threshold still worth a second opinion
+ANALYSIS_CASCADE_MAX_FINALISTS = 30
+# Overlapping moments (neighbouring sliding windows) are suppressed before and after refinement:
+# of two moments whose intersection-over-union exceeds MOMENT_NMS_IOU, the lower-scoring one is dropped.
+MOMENT_NMS_IOU = 0.3
+MOMENT_MERGE_ADJACENT = False  # Merge touching high-scoring windows into one moment up to MAX_CLIP_LENGTH
+MOMENT_MERGE_GAP = 2.0  # Seconds between two moments that still count as adjacent
+# "windows": each scored window above the threshold is a moment. "curve": window scores become a
+# per-second interest curve and the best sentence-aligned, non-overlapping clips are chosen on it.
+MOMENT_SELECTION = "windows"
+MOMENT_CURVE_RESOLUTION = 1.0  # Seconds per curve bin
+MOMENT_CURVE_MAX_CLIPS = 10
+MOMENT_CURVE_MIN_COVERAGE = 0.8  # Share of a curve clip that scored windows must cover
+ANALYSIS_STREAMING = False  # Score sliding windows while transcription runs (web UI; skips the prefilter)
 
 VIDEO_INFO_CACHE_SIZE = 128
@@ -3,7 +3,7 @@
 import argparse
 import sys
 from pathlib import Path
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 import json
 
 from modules.downloader import YouTubeDownloader
@@ -11,6 +11,7 @@ from modules.transcriber import VideoTranscriber
 from modules.analyzer import ViralMomentAnalyzer
 from modules.video_processor import VideoProcessor
 from modules.subtitle_generator import SubtitleGenerator
+from modules.batch_pipeline import BatchPipeline
 from utils.helpers import (
     check_dependencies, 
     select_moments, 
@@ -19,7 +20,194 @@ from utils.helpers import (
     format_time,
     ProgressBar
 )
-from config import VIDEO_QUALITY, DEFAULT_NUM_CLIPS
+from utils.transcript_index import TranscriptIndex
+from config import VIDEO_QUALITY, DEFAULT_NUM_CLIPS, INGEST_AUDIO_FIRST, BATCH_DOWNLOAD_WORKERS, OUTPUTS_DIR
+
+
+def pick_moments(viral_moments: List[Dict], min_score: float, max_clips: int) -> List[Dict]:
+    """Moments scoring at least min_score (else the top 3), capped to max_clips."""
+    high_scoring_moments = [m for m in viral_moments if m['score'] >= min_score]
+    
+    if not high_scoring_moments:
+        print(f"\n⚠️ No moments reached the minimum score of {min_score}/10.")
+        print(f"Showing top {min(3, len(viral_moments))} moments instead:")
+        high_scoring_moments = viral_moments[:min(3, len(viral_moments))]
+    else:
+        print(f"✅ {len(high_scoring_moments)} moments with score ≥ {min_score}/10")
+    
+    return select_moments(high_scoring_moments, max_clips)
+
+
+def render_clips(processor: VideoProcessor, generator: Optional[SubtitleGenerator], video_path: str,
+                 transcript: Dict, moments: List[Dict], args, ranges: Optional[List[Dict]] = None) -> List[str]:
+    """Render (or just cut) one clip per moment and write its metadata JSON; returns the clip paths."""
+    vertical_format = (args.format == 'vertical')
+    progress = ProgressBar(len(moments), "Rendering clips")
+    final_clips = []
+    
+    clip_requests = [
+        {
+            'start': moment['start'],
+            'end': moment['end'],
+            'output_name': f"viral_clip_{i+1}_score_{moment['score']:.1f}",
+        }
+        for i, moment in enumerate(moments)
+    ]
+    if generator:
+        # Cut, reframe and burn subtitles in a single ffmpeg pass per clip group.
+        results = generator.render_subtitled_clips(
+            processor,
+            video_path,
+            transcript,
+            clip_requests,
+            vertical_format=vertical_format,
+            style_template=args.subtitle_style,
+            ranges=ranges
+        )
+    elif ranges:
+        results = processor.extract_clips_from_ranges(
+            ranges,
+            clip_requests,
+            vertical_format=vertical_format
+        )
+    else:
+        results = processor.extract_clips_batch(
+            video_path,
+            clip_requests,
+            vertical_format=vertical_format
+        )
+    
+    for i, (moment, result) in enumerate(zip(moments, results)):
+        if result['error']:
+            print(f"\n⚠️  Failed to render clip {i+1}: {result['error']}")
+            continue
+        clip_path = result['path']
+        final_clips.append(clip_path)
+        
+        metadata_path = Path(clip_path).with_suffix('.json')
+        with open(metadata_path, 'w') as f:
+            json.dump({
+                'original_video': str(video_path),
+                'start_time': moment['start'],
+                'end_time': moment['end'],
+                'duration': moment['duration'],
+                'score': moment['score'],
+                'reason': moment['reason'],
+                'original_start': moment.get('original_start', moment['start']),
+                'original_end': moment.get('original_end', moment['end'])
+            }, f, indent=2)
+        
+        progress.update()
+    
+    progress.finish()
+    return final_clips
+
+
+def run_batch(args) -> List[Dict[str, Any]]:
+    """Process every video of a playlist, channel or manifest file; returns one result per video.
+
+    Videos flow through download -> transcribe -> analyze -> render stages, so
+    later videos download while earlier ones are transcribed and rendered.
+    The Whisper model and the analyzer are loaded once for the whole batch,
+    and a failing video is reported without stopping the others.
+    """
+    downloader = YouTubeDownloader()
+    transcriber = VideoTranscriber()
+    analyzer = ViralMomentAnalyzer(provider=args.provider)
+    output_root = Path(args.output_dir) if args.output_dir else OUTPUTS_DIR
+    output_root.mkdir(parents=True, exist_ok=True)
+    generator = None if args.no_subtitles else SubtitleGenerator()
+    
+    def download(state):
+        if args.audio_first:
+            state['metadata'] = downloader.download_audio(state['source'], lease=True)
+        else:
+            state['metadata'] = downloader.download(state['source'], args.quality, lease=True)
+        return state
+    
+    def transcribe(state):
+        state['transcript'] = TranscriptIndex(
+            transcriber.transcribe(state['metadata']['filepath'], force=args.force_transcribe)
+        )
+        return state
+    
+    def analyze(state):
+        viral_moments = analyzer.analyze_transcript(state['transcript'], video_signals=state['metadata'])
+        selected_moments = pick_moments(viral_moments, args.min_score, args.clips) if viral_moments else []
+        state['moments'] = analyzer.refine_moments(selected_moments, state['transcript'])
+        return state
+    
+    def render(state):
+        state['clips'] = []
+        if not state['moments']:
+            return state
+        video_metadata = state['metadata']
+        video_path = video_metadata['filepath']
+        # One directory per video: clip names only differ by index and score
+        processor = VideoProcessor(output_root / video_metadata.get('video_id', Path(video_path).stem))
+        moments = processor.validate_timestamps(video_path, state['moments'])
+        ranges = None
+        if args.audio_first:
+            ranges = downloader.download_ranges(
+                state['source'],
+                [(moment['start'], moment['end']) for moment in moments],
+                args.quality,
+                duration=video_metadata['duration'],
+            )
+        state['clips'] = render_clips(processor, generator, video_path, state['transcript'], moments, args, ranges)
+        create_summary_report(video_metadata, moments, state['clips'])
+        return state
+    
+    def report(result):
+        state = result['state']
+        if 'metadata' in state:
+            # Done with this video: later downloads of the batch may evict it again
+            downloader.release(state['metadata'].get('video_id'))
+        title = state.get('metadata', {}).get('title', result['source'])
+        if result['status'] == 'ok':
+            print(f"\n✅ {title}: {len(state['clips'])} clips")
+        else:
+            print(f"\n❌ {title}: failed during {result['stage']}: {result['error']}")
+    
+    pipeline = BatchPipeline(
+        [
+            ('download', download, BATCH_DOWNLOAD_WORKERS),
+            ('transcribe', transcribe, 1),
+            ('analyze', analyze, 1),
+            ('render', render, 1),
+        ],
+        on_result=report,
+    )
+    expand_failures = []
+    
+    def expand_failed(url, error):
+        # A playlist or channel that cannot be listed fails alone; the other sources go on
+        result = {'source': url, 'status': 'failed', 'state': {'source': url}, 'stage': 'expand', 'error': str(error)}
+        expand_failures.append(result)
+        report(result)
+    
+    results = pipeline.run(downloader.iter_batch_urls(args.batch, on_error=expand_failed))
+    results += expand_failures
+    
+    report_path = output_root / "batch_report.json"
+    with open(report_path, 'w') as f:
+        json.dump([
+            {
+                'source': result['source'],
+                'status': result['status'],
+                'title': result['state'].get('metadata', {}).get('title'),
+                'clips': result['state'].get('clips', []),
+                'failed_stage': result['stage'],
+                'error': result['error'],
+            }
+            for result in results
+        ], f, indent=2)
+    
+    succeeded = sum(1 for result in results if result['status'] == 'ok')
+    print(f"\n🎉 Batch complete: {succeeded}/{len(results)} videos processed")
+    print(f"📊 Generated {sum(len(result['state'].get('clips', [])) for result in results)} viral clips")
+    print(f"📁 Report: {report_path}")
+    return results
 
 
 def main():
@@ -32,18 +220,28 @@ Examples:
   python main.py --url "https://youtube.com/watch?v=..." --quality 1080p --clips 3
   python main.py --url "https://youtube.com/watch?v=..." --no-subtitles
   python main.py --file "path/to/video.mp4" --clips 5
+  python main.py --url "https://youtube.com/watch?v=..." --audio-first
+  python main.py --batch "https://youtube.com/@channel" --clips 3
+  python main.py --batch urls.txt
+  python main.py --train-prefilter
         """
     )
     
     input_group = parser.add_mutually_exclusive_group(required=True)
     input_group.add_argument('--url', type=str, help='YouTube video URL')
     input_group.add_argument('--file', type=str, help='Local video file path')
+    input_group.add_argument('--batch', type=str,
+                            help='Playlist or channel URL, or a file with one URL per line, processed as a batch')
+    input_group.add_argument('--train-prefilter', action='store_true',
+                            help='Train the learned prefilter from cached LLM chunk scores and exit')
     
     parser.add_argument('--quality', type=str, default=VIDEO_QUALITY, 
                        choices=['360p', '480p', '720p', '1080p'],
                        help='Video download quality (default: %(default)s)')
     parser.add_argument('--clips', type=int, default=DEFAULT_NUM_CLIPS,
                        help='Maximum number of clips to generate (default: %(default)s)')
+    parser.add_argument('--audio-first', action='store_true', default=INGEST_AUDIO_FIRST,
+                       help='Download only the audio for analysis, then only the video ranges of the selected clips')
     parser.add_argument('--no-subtitles', action='store_true',
                        help='Skip adding subtitles to clips')
     parser.add_argument('--force-transcribe', action='store_true',
@@ -67,12 +265,39 @@ Examples:
     print("\n🎬 YouTube Video Viral Moment Extractor")
     print("=" * 50)
     
+    if args.train_prefilter:
+        print("\n🧠 Training prefilter from cached chunk scores...")
+        if ViralMomentAnalyzer.train_prefilter_model() is None:
+            sys.exit(1)
+        return
+    
     if not check_dependencies(provider=args.provider):
         print("\n❌ Please install missing dependencies and try again.")
         sys.exit(1)
     
+    if args.batch:
+        try:
+            results = run_batch(args)
+        except KeyboardInterrupt:
+            print("\n\n⚠️  Process interrupted by user.")
+            sys.exit(1)
+        except Exception as e:
+            print(f"\n❌ Error: {e}")
+            sys.exit(1)
+        if results and all(result['status'] == 'failed' for result in results):
+            sys.exit(1)
+        return
+    
     try:
-        if args.url:
+        audio_first = bool(args.url) and args.audio_first
+        if audio_first:
+            print(f"\n📥 Downloading audio from YouTube...")
+            downloader = YouTubeDownloader()
+            # Leased so the range downloads below cannot evict it; the lease ends with the process
+            video_metadata = downloader.download_audio(args.url, lease=True)
+            video_path = video_metadata['filepath']
+            print(f"✅ Downloaded audio: {video_metadata['title']}")
+        elif args.url:
             print(f"\n📥 Downloading video from YouTube...")
             downloader = YouTubeDownloader()
             video_metadata = downloader.download(args.url, args.quality)
@@ -97,12 +322,12 @@ Examples:
         print(f"Estimated time: {format_time(video_metadata['duration'] * 0.3)}")
         
         transcriber = VideoTranscriber()
-        transcript = transcriber.transcribe(video_path, force=args.force_transcribe)
+        transcript = TranscriptIndex(transcriber.transcribe(video_path, force=args.force_transcribe))
         print(f"✅ Transcription complete: {len(transcript['segments'])} segments")
         
         print(f"\n🤖 Analyzing transcript for viral moments (provider: {args.provider})...")
         analyzer = ViralMomentAnalyzer(provider=args.provider)
-        viral_moments = analyzer.analyze_transcript(transcript)
+        viral_moments = analyzer.analyze_transcript(transcript, video_signals=video_metadata)
         
         if not viral_moments:
             print("\n❌ No viral moments found with sufficient score.")
@@ -111,102 +336,44 @@ Examples:
         
         print(f"✅ Found {len(viral_moments)} potential viral moments!")
         
-        # Filter by minimum score
-        high_scoring_moments = [m for m in viral_moments if m['score'] >= args.min_score]
-        
-        if not high_scoring_moments:
-            print(f"\n⚠️ No moments reached the minimum score of {args.min_score}/10.")
-            print(f"Showing top {min(3, len(viral_moments))} moments instead:")
-            high_scoring_moments = viral_moments[:min(3, len(viral_moments))]
-        else:
-            print(f"✅ {len(high_scoring_moments)} moments with score ≥ {args.min_score}/10")
-        
-        selected_moments = select_moments(high_scoring_moments, args.clips)
+        selected_moments = pick_moments(viral_moments, args.min_score, args.clips)
         
         if not selected_moments:
             print("\n❌ No moments selected.")
             sys.exit(0)
         
-        print(f"\n✂️  Extracting {len(selected_moments)} clips...")
-        processor = VideoProcessor()
+        add_subtitles = not args.no_subtitles
+        if add_subtitles:
+            print(f"\n✂️  Rendering {len(selected_moments)} clips with animated subtitles...")
+        else:
+            print(f"\n✂️  Extracting {len(selected_moments)} clips...")
+
+        if args.output_dir:
+            output_dir = Path(args.output_dir)
+            output_dir.mkdir(exist_ok=True)
+            processor = VideoProcessor(output_dir)
+        else:
+            processor = VideoProcessor()
+        generator = SubtitleGenerator() if add_subtitles else None
         
         refined_moments = analyzer.refine_moments(selected_moments, transcript)
         validated_moments = processor.validate_timestamps(video_path, refined_moments)
         
-        progress = ProgressBar(len(validated_moments), "Extracting clips")
-        clip_paths = []
-        
-        for i, moment in enumerate(validated_moments):
-            try:
-                output_name = f"viral_clip_{i+1}_score_{moment['score']:.1f}"
-                clip_path = processor.extract_clip(
-                    video_path,
-                    moment['start'],
-                    moment['end'],
-                    output_name,
-                    vertical_format=(args.format == 'vertical')
-                )
-                clip_paths.append(clip_path)
-                
-                import json
-                metadata_path = Path(clip_path).with_suffix('.json')
-                with open(metadata_path, 'w') as f:
-                    json.dump({
-                        'original_video': str(video_path),
-                        'start_time': moment['start'],
-                        'end_time': moment['end'],
-                        'duration': moment['duration'],
-                        'score': moment['score'],
-                        'reason': moment['reason'],
-                        'original_start': moment.get('original_start', moment['start']),
-                        'original_end': moment.get('original_end', moment['end'])
-                    }, f, indent=2)
-                
-                progress.update()
-            except Exception as e:
-                print(f"\n⚠️  Failed to extract clip {i+1}: {e}")
-        
-        progress.finish()
-        print(f"✅ Extracted {len(clip_paths)} clips successfully!")
-        
-        if not args.no_subtitles and clip_paths:
-            print(f"\n🎨 Adding animated subtitles to clips...")
-            generator = SubtitleGenerator()
-            
-            if args.output_dir:
-                generator.output_dir = Path(args.output_dir)
-                generator.output_dir.mkdir(exist_ok=True)
-            
-            progress = ProgressBar(len(clip_paths), "Adding subtitles")
-            final_clips = []
-            
-            for clip_path in clip_paths:
-                try:
-                    metadata_path = Path(clip_path).with_suffix('.json')
-                    with open(metadata_path, 'r') as f:
-                        metadata = json.load(f)
-                    
-                    output_name = Path(clip_path).stem
-                    subtitled_path = generator.add_subtitles(
-                        clip_path,
-                        transcript,
-                        metadata.get('original_start', metadata['start_time']),
-                        metadata.get('original_end', metadata['end_time']),
-                        output_name,
-                        vertical_format=(args.format == 'vertical'),
-                        clip_start_time=metadata['start_time'],
-                        style_template=args.subtitle_style
-                    )
-                    final_clips.append(subtitled_path)
-                    progress.update()
-                except Exception as e:
-                    print(f"\n⚠️  Failed to add subtitles: {e}")
-                    final_clips.append(clip_path)
-            
-            progress.finish()
-            print(f"✅ Added subtitles to {len(final_clips)} clips!")
+        ranges = None
+        if audio_first:
+            print(f"\n📥 Downloading the video ranges of {len(validated_moments)} clips...")
+            ranges = downloader.download_ranges(
+                args.url,
+                [(moment['start'], moment['end']) for moment in validated_moments],
+                args.quality,
+                duration=video_metadata['duration'],
+            )
+        
+        final_clips = render_clips(processor, generator, video_path, transcript, validated_moments, args, ranges)
+        if add_subtitles:
+            print(f"✅ Rendered {len(final_clips)} subtitled clips successfully!")
         else:
-            final_clips = clip_paths
+            print(f"✅ Extracted {len(final_clips)} clips successfully!")
         
         summary_path = create_summary_report(video_metadata, validated_moments, final_clips)
         
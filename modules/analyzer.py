@@ -1,11 +1,14 @@
 import json
-import ollama
-from typing import List, Dict, Tuple, Optional
+from typing import List, Dict, Tuple, Optional, Iterable, Iterator
 import re
 from pathlib import Path
 import hashlib
-from concurrent.futures import ThreadPoolExecutor, as_completed
+import os
+from bisect import bisect_left, bisect_right
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, as_completed, wait
 import threading
+import time
 
 from config import (
     AI_PROVIDER, LLM_MODEL, OPENAI_MODEL, ANTHROPIC_MODEL,
@@ -13,8 +16,27 @@ from config import (
     VIRAL_ANALYSIS_PROMPT, MIN_VIRAL_SCORE, MIN_CLIP_LENGTH, MAX_CLIP_LENGTH,
     CHUNK_STRATEGY, CHUNK_DURATION, SLIDING_WINDOW_SIZE, SLIDING_OVERLAP,
     ANALYSIS_PREFILTER_ENABLED, ANALYSIS_CANDIDATE_RATIO,
-    ANALYSIS_MIN_CANDIDATES, ANALYSIS_EXPANSION_BATCH, ANALYSIS_TARGET_MOMENTS
+    ANALYSIS_MIN_CANDIDATES, ANALYSIS_EXPANSION_BATCH, ANALYSIS_TARGET_MOMENTS,
+    ANALYSIS_PROMPT_VERSION, ANALYSIS_CHUNK_CACHE_MAX_MB, ANALYSIS_CHUNK_CACHE_MAX_ENTRIES,
+    ANALYSIS_CACHE_PRUNE_INTERVAL, ANALYSIS_CACHE_PRUNE_WRITES,
+    ANALYSIS_RESULT_CACHE_MAX_ENTRIES, ANALYSIS_BATCH_SCORING, ANALYSIS_MAX_BATCH_CHUNKS,
+    ANALYSIS_BATCH_PROMPT_TOKENS, ANALYSIS_BATCH_TOKENS_PER_CHUNK, LLM_CONTEXT_TOKENS, OLLAMA_NUM_CTX,
+    LLM_STRUCTURED_OUTPUT, LLM_SCORE_MAX_TOKENS, LLM_METADATA_MAX_TOKENS, LLM_REASONING_TOKENS,
+    ANALYSIS_CASCADE_ENABLED, ANALYSIS_SCREEN_PROVIDER, ANALYSIS_SCREEN_MODEL, ANALYSIS_CASCADE_TOP_N,
+    ANALYSIS_CASCADE_BORDERLINE, ANALYSIS_CASCADE_MAX_FINALISTS, ANALYSIS_CACHE_DIR,
+    PREFILTER_MODEL_ENABLED, PREFILTER_MODEL_PATH, PREFILTER_MODEL_MIN_SAMPLES, PREFILTER_MODEL_HIT_MARGIN,
+    MOMENT_NMS_IOU, MOMENT_MERGE_ADJACENT, MOMENT_MERGE_GAP,
+    MOMENT_SELECTION, MOMENT_CURVE_RESOLUTION, MOMENT_CURVE_MAX_CLIPS, MOMENT_CURVE_MIN_COVERAGE,
+    PREFILTER_REPLAY_WEIGHT, CHUNK_CHAPTER_HINTS
 )
+from modules.moment_curve import covered_bins, score_curve, select_intervals
+from modules.youtube_signals import chapter_starts, replay_scores
+from modules.prefilter_engine import NUMBER_PATTERN, QUESTION_WORDS, SegmentPrefilter, normalize_prefilter_text
+from modules.prefilter_model import PrefilterModel, iter_cached_scores
+from utils.helpers import atomic_write_json, load_json_file, prune_cache_dir
+from utils.ollama_pool import get_ollama_pool
+from utils.rate_limit import get_provider_limiter
+from utils.transcript_index import build_transcript_index
 
 # Import API libraries only if needed
 try:
@@ -62,14 +84,76 @@ class ViralMomentAnalyzer:
         ),
     }
 
-    def __init__(self, provider: str = None, model_name: str = None, enable_cache: bool = True):
+    # JSON schemas for structured output. OpenAI strict mode needs every property
+    # required and no additional properties; batch replies are wrapped in an object.
+    SCORE_SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'emotional_impact': {'type': 'number'},
+            'surprise_drama': {'type': 'number'},
+            'quotability': {'type': 'number'},
+            'hook_power': {'type': 'number'},
+            'overall_score': {'type': 'number'},
+            'moment_type': {'type': 'string'},
+            'reason': {'type': 'string'},
+        },
+        'required': [
+            'emotional_impact', 'surprise_drama', 'quotability', 'hook_power',
+            'overall_score', 'moment_type', 'reason'
+        ],
+        'additionalProperties': False,
+    }
+    BATCH_SCORE_SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'results': {
+                'type': 'array',
+                'items': {
+                    'type': 'object',
+                    'properties': {'id': {'type': 'integer'}, **SCORE_SCHEMA['properties']},
+                    'required': ['id'] + SCORE_SCHEMA['required'],
+                    'additionalProperties': False,
+                },
+            },
+        },
+        'required': ['results'],
+        'additionalProperties': False,
+    }
+    METADATA_SCHEMA = {
+        'type': 'object',
+        'properties': {
+            'title': {'type': 'string'},
+            'description': {'type': 'string'},
+        },
+        'required': ['title', 'description'],
+        'additionalProperties': False,
+    }
+
+    # Heuristic prefilter signals that depend on the text alone (and so can be learned from the chunk cache)
+    PREFILTER_TEXT_FEATURES = (
+        'punctuation', 'quotes', 'numbers', 'keywords', 'phrases', 'question_start', 'hook_end'
+    )
+
+    # 'screen' for the cheap first stage of a cascade; recorded with every score and cache entry
+    score_stage = 'final'
+    screen_analyzer = None
+    prefilter_model = None
+
+    def __init__(self, provider: str = None, model_name: str = None, enable_cache: bool = True,
+                 score_stage: str = 'final'):
         self.provider = provider or AI_PROVIDER
         self.enable_cache = enable_cache
+        self.score_stage = score_stage
 
         # Set up cache directory
-        self.cache_dir = Path(__file__).parent.parent / "cache" / "analysis"
+        self.cache_dir = ANALYSIS_CACHE_DIR
+        # Raw per-chunk LLM scores, reused across threshold/prefilter setting changes
+        self.chunk_cache_dir = self.cache_dir / "chunks"
+        self._chunk_cache_lock = threading.Lock()
+        self._chunk_cache_hits = 0
+        self._chunk_cache_writes = 0
         if self.enable_cache:
-            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            self.chunk_cache_dir.mkdir(parents=True, exist_ok=True)
 
         # Set model based on provider
         if self.provider == "ollama":
@@ -83,18 +167,38 @@ class ViralMomentAnalyzer:
             self._check_anthropic_setup()
         else:
             raise ValueError(f"Unknown AI provider: {self.provider}")
+
+        if PREFILTER_MODEL_ENABLED and ANALYSIS_PREFILTER_ENABLED:
+            self.prefilter_model = PrefilterModel.load(PREFILTER_MODEL_PATH)
+
+        if ANALYSIS_CASCADE_ENABLED and score_stage == 'final':
+            self.screen_analyzer = ViralMomentAnalyzer(
+                provider=ANALYSIS_SCREEN_PROVIDER,
+                model_name=ANALYSIS_SCREEN_MODEL,
+                enable_cache=enable_cache,
+                score_stage='screen',
+            )
+            if (self.screen_analyzer.provider, self.screen_analyzer.model_name) == (self.provider, self.model_name):
+                print("Warning: Screening model is the main model, cascade disabled")
+                self.screen_analyzer = None
+            else:
+                print(f"Cascade: screening with {self.screen_analyzer.provider}/{self.screen_analyzer.model_name}")
         
     def _check_ollama_connection(self):
-        try:
-            models = ollama.list()
-            model_names = [model['name'] for model in models['models']]
-            if self.model_name not in model_names and f"{self.model_name}:latest" not in model_names:
-                print(f"Warning: Model '{self.model_name}' not found in Ollama.")
-                print(f"Available models: {', '.join(model_names)}")
-                print(f"Please run: ollama pull {self.model_name}")
-        except Exception as e:
-            print(f"Warning: Could not connect to Ollama: {e}")
-            print("Make sure Ollama is running (ollama serve)")
+        pool = get_ollama_pool()
+        for host in pool.hosts:
+            try:
+                models = host.client.list()
+                model_names = [model['name'] for model in models['models']]
+                if self.model_name not in model_names and f"{self.model_name}:latest" not in model_names:
+                    print(f"Warning: Model '{self.model_name}' not found in Ollama at {host.host}.")
+                    print(f"Available models: {', '.join(model_names)}")
+                    print(f"Please run: ollama pull {self.model_name}")
+            except Exception as e:
+                # Routed around until the pool's next health check finds it up again
+                pool.mark_down(host)
+                print(f"Warning: Could not connect to Ollama at {host.host}: {e}")
+                print("Make sure Ollama is running (ollama serve)")
     
     def _check_openai_setup(self):
         if not openai:
@@ -103,14 +207,15 @@ class ViralMomentAnalyzer:
             raise Exception("OPENAI_API_KEY environment variable not set")
         # Set up OpenAI client
         from openai import OpenAI
-        self.openai_client = OpenAI(api_key=OPENAI_API_KEY)
+        # Retries happen in the shared rate limiter, which also needs to see 429s.
+        self.openai_client = OpenAI(api_key=OPENAI_API_KEY, max_retries=0)
     
     def _check_anthropic_setup(self):
         if not anthropic:
             raise Exception("Anthropic library not installed. Run: pip install anthropic")
         if not ANTHROPIC_API_KEY:
             raise Exception("ANTHROPIC_API_KEY environment variable not set")
-        self.anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY)
+        self.anthropic_client = anthropic.Anthropic(api_key=ANTHROPIC_API_KEY, max_retries=0)
 
     def _generate_cache_key(
         self,
@@ -118,8 +223,10 @@ class ViralMomentAnalyzer:
         chunk_duration: int,
         strategy: str,
         threshold: float,
+        video_signals: Optional[Dict] = None,
     ) -> str:
         """Generate a unique cache key based on transcript content and settings"""
+        video_signals = video_signals or {}
         # Create a deterministic representation of the transcript
         cache_data = {
             'cache_schema_version': 3,
@@ -148,6 +255,30 @@ class ViralMomentAnalyzer:
             'min_candidates': ANALYSIS_MIN_CANDIDATES,
             'expansion_batch': ANALYSIS_EXPANSION_BATCH,
             'target_moments': ANALYSIS_TARGET_MOMENTS,
+            'prefilter_model': self.prefilter_model.digest if self.prefilter_model else None,
+            'batch_scoring': ANALYSIS_BATCH_SCORING,
+            'max_batch_chunks': ANALYSIS_MAX_BATCH_CHUNKS,
+            'structured_output': LLM_STRUCTURED_OUTPUT,
+            'moment_nms_iou': MOMENT_NMS_IOU,
+            'moment_merge': MOMENT_MERGE_GAP if MOMENT_MERGE_ADJACENT else None,
+            'youtube_signals': {
+                'heatmap': video_signals.get('heatmap') or [],
+                'chapters': video_signals.get('chapters') or [],
+                'replay_weight': PREFILTER_REPLAY_WEIGHT,
+                'chapter_hints': CHUNK_CHAPTER_HINTS,
+            } if video_signals.get('heatmap') or video_signals.get('chapters') else None,
+            'moment_selection': (
+                [MOMENT_SELECTION, MOMENT_CURVE_RESOLUTION, MOMENT_CURVE_MAX_CLIPS, MOMENT_CURVE_MIN_COVERAGE,
+                 MIN_CLIP_LENGTH, MAX_CLIP_LENGTH]
+                if MOMENT_SELECTION == "curve" else MOMENT_SELECTION
+            ),
+            'cascade': {
+                'provider': self.screen_analyzer.provider,
+                'model': self.screen_analyzer.model_name,
+                'top_n': ANALYSIS_CASCADE_TOP_N,
+                'borderline': ANALYSIS_CASCADE_BORDERLINE,
+                'max_finalists': ANALYSIS_CASCADE_MAX_FINALISTS,
+            } if self.screen_analyzer else None,
         }
 
         # Create hash of the data
@@ -164,6 +295,7 @@ class ViralMomentAnalyzer:
             try:
                 with open(cache_file, 'r', encoding='utf-8') as f:
                     cached_data = json.load(f)
+                os.utime(cache_file)
                 print(f"✓ Loaded results from cache (key: {cache_key[:8]}...)")
                 return cached_data
             except Exception as e:
@@ -178,18 +310,25 @@ class ViralMomentAnalyzer:
 
         cache_file = self.cache_dir / f"{cache_key}.json"
         try:
-            with open(cache_file, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            atomic_write_json(data, cache_file)
             print(f"✓ Saved results to cache (key: {cache_key[:8]}...)")
         except Exception as e:
             print(f"Warning: Failed to save cache: {e}")
 
-    def analyze_transcript(self, transcript: Dict, chunk_duration: int = 30, strategy: str = None) -> List[Dict]:
+    def analyze_transcript(self, transcript: Dict, chunk_duration: int = 30, strategy: str = None,
+                           video_signals: Optional[Dict] = None) -> List[Dict]:
+        """Score the transcript's chunks and return viral moments, best first.
+
+        video_signals is the downloaded video's metadata (or any dict) with the
+        YouTube 'heatmap' and 'chapters' (see modules.youtube_signals): replay
+        peaks raise a chunk's prefilter rank and chapters guide the chunking.
+        """
         strategy = strategy or CHUNK_STRATEGY
         threshold = max(MIN_VIRAL_SCORE - 1.0, 4.0)
+        video_signals = video_signals or {}
 
         # Check cache first
-        cache_key = self._generate_cache_key(transcript, chunk_duration, strategy, threshold)
+        cache_key = self._generate_cache_key(transcript, chunk_duration, strategy, threshold, video_signals)
         cached_result = self._load_from_cache(cache_key)
         if cached_result is not None:
             return cached_result
@@ -198,17 +337,24 @@ class ViralMomentAnalyzer:
         if not segments:
             return []
 
+        boundaries = chapter_starts(video_signals.get('chapters')) if CHUNK_CHAPTER_HINTS else []
         if strategy == "sliding":
             chunks = self._create_sliding_chunks(segments)
+            if boundaries:
+                chunks = sorted(chunks + self._create_chapter_chunks(segments, boundaries, chunks),
+                                key=lambda chunk: chunk['start'])
         elif strategy == "smart":
-            chunks = self._create_smart_chunks(segments, chunk_duration)
+            chunks = self._create_smart_chunks(segments, chunk_duration, boundaries)
         else:  # "fixed" or unknown
-            chunks = self._create_chunks(segments, chunk_duration)
+            chunks = self._create_chunks(segments, chunk_duration, boundaries)
 
         # Get language from transcript
         language = transcript.get('language', 'en')
 
-        ranked_chunks, initial_limit = self._rank_chunks_for_analysis(chunks, language)
+        replay = None
+        if video_signals.get('heatmap'):
+            replay = replay_scores([(chunk['start'], chunk['end']) for chunk in chunks], video_signals['heatmap'])
+        ranked_chunks, initial_limit = self._rank_chunks_for_analysis(chunks, language, replay)
         total_chunks = len(chunks)
         prefilter_active = initial_limit < total_chunks
 
@@ -219,126 +365,398 @@ class ViralMomentAnalyzer:
             )
         else:
             print(f"Analyzing {total_chunks} chunks for viral potential...")
-        viral_moments = []
-        analyzed_chunks = []
+        self._chunk_cache_hits = 0
+        if self.screen_analyzer:
+            analyzed_chunks, viral_moments = self._run_cascade(
+                ranked_chunks, initial_limit, language, threshold, early_stop=prefilter_active
+            )
+        else:
+            analyzed_chunks, viral_moments = self._run_scoring_queue(
+                ranked_chunks, initial_limit, language, threshold, early_stop=prefilter_active
+            )
 
-        # Use parallel workers for API providers, sequential for local Ollama
-        max_workers = 10 if self.provider in ("openai", "anthropic") else 1
-        completed = [0]
-        progress_lock = threading.Lock()
+        if self._chunk_cache_hits:
+            print(f"Reused {self._chunk_cache_hits} cached chunk scores")
+        curve_moments = []
+        if MOMENT_SELECTION == "curve":
+            curve_moments = self._select_moments_from_curve(analyzed_chunks, transcript, threshold)
+        viral_moments = curve_moments or self._finalize_moments(viral_moments, analyzed_chunks)
 
-        def _analyze_one(chunk):
-            score, reason = self._analyze_chunk(chunk['text'], language)
-            with progress_lock:
-                completed[0] += 1
-                current = completed[0]
-            print(f"Analyzed chunk {current}/{total_chunks} (score: {score:.1f})")
-            return chunk, score, reason
+        # Save to cache before returning
+        self._save_to_cache(cache_key, viral_moments)
+        self._prune_caches()
 
-        cursor = 0
-        first_batch_size = initial_limit
-        next_batch_size = max(max_workers, ANALYSIS_EXPANSION_BATCH)
+        return viral_moments
+
+    def _run_scoring_queue(self, ranked_chunks: List[Dict], initial_limit: int, language: str,
+                           threshold: float, early_stop: bool) -> Tuple[List[Dict], List[Dict]]:
+        """Score ranked chunks with a continuously fed worker pool.
+
+        A new request is submitted as soon as a worker frees up, so one slow
+        call never idles the rest of the pool. The first initial_limit chunks
+        are always scored. With early_stop, further chunks are only submitted
+        while fewer than the target number of moments has been found; the
+        condition is re-checked after every completion and unsubmitted work is
+        dropped once it holds. Overlapping windows of one moment count as a
+        single hit. Returns (analyzed_chunks, viral_moments).
+        """
+        total_chunks = len(ranked_chunks)
+        max_workers = self._max_workers()
         target_hits = max(3, ANALYSIS_TARGET_MOMENTS)
+        next_batch_size = max(max_workers, ANALYSIS_EXPANSION_BATCH)
 
-        while cursor < len(ranked_chunks):
-            batch_size = first_batch_size if cursor == 0 else next_batch_size
-            batch = ranked_chunks[cursor:cursor + batch_size]
-            if not batch:
-                break
+        # Packs (batched requests) are formed per shortlist/expansion block, in rank order.
+        queue = deque(self._pack_chunks(ranked_chunks[:initial_limit], max_workers))
+        for offset in range(initial_limit, total_chunks, next_batch_size):
+            queue.extend(self._pack_chunks(ranked_chunks[offset:offset + next_batch_size], max_workers))
 
-            if prefilter_active:
-                print(
-                    f"Analyzing ranked chunk batch {cursor + 1}-"
-                    f"{cursor + len(batch)} of {total_chunks}..."
-                )
+        analyzed_chunks = []
+        viral_moments = []
+        # (start, end) of hits counted towards target_hits, none overlapping another
+        distinct_hits = []
+        submitted = 0
+        pending = set()
+
+        def _analyze_pack(pack):
+            if len(pack) == 1:
+                scores = [self._analyze_chunk(pack[0]['text'], language)]
+            else:
+                scores = self._analyze_chunk_batch([chunk['text'] for chunk in pack], language)
+            return [(chunk, score, reason) for chunk, (score, reason) in zip(pack, scores)]
+
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            while queue or pending:
+                while queue and len(pending) < max_workers and (
+                    not early_stop or submitted < initial_limit or len(distinct_hits) < target_hits
+                ):
+                    pack = queue.popleft()
+                    submitted += len(pack)
+                    pending.add(executor.submit(_analyze_pack, pack))
+                if not pending:
+                    break
 
-            with ThreadPoolExecutor(max_workers=max_workers) as executor:
-                futures = [executor.submit(_analyze_one, chunk) for chunk in batch]
-                for future in as_completed(futures):
+                done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
                     try:
-                        chunk, score, reason = future.result()
+                        pack_results = future.result()
                     except Exception as e:
                         print(f"Error analyzing chunk: {e}")
                         continue
 
-                    analyzed_chunks.append({
-                        'chunk': chunk,
-                        'score': score,
-                        'reason': reason,
-                    })
-
-                    # Filter: score must beat threshold (parse failures return 0.0, filtered out)
-                    if score >= threshold:
-                        viral_moment = {
-                            'start': chunk['start'],
-                            'end': chunk['end'],
-                            'duration': chunk['end'] - chunk['start'],
+                    for chunk, score, reason in pack_results:
+                        analyzed_chunks.append({
+                            'chunk': chunk,
                             'score': score,
                             'reason': reason,
-                            'text': chunk['text'][:200] + '...' if len(chunk['text']) > 200 else chunk['text']
-                        }
-                        viral_moments.append(viral_moment)
+                            'score_stage': self.score_stage,
+                        })
+
+                        # Filter: score must beat threshold (parse failures return 0.0, filtered out)
+                        if score >= threshold:
+                            viral_moments.append(self._chunk_to_moment(chunk, score, reason))
+                            start, end = chunk['start'], chunk['end']
+                            if not any(start < hit_end and end > hit_start for hit_start, hit_end in distinct_hits):
+                                distinct_hits.append((start, end))
+
+                    best = max(score for _, score, _ in pack_results)
+                    print(
+                        f"Analyzed chunk {len(analyzed_chunks)}/{total_chunks} "
+                        f"({len(pack_results)} in request, best score: {best:.1f})"
+                    )
+
+        if queue:
+            print(
+                f"Stopping after {submitted} ranked chunks; found "
+                f"{len(distinct_hits)} distinct strong candidates."
+            )
+        return analyzed_chunks, viral_moments
+
+    def _run_cascade(self, ranked_chunks: List[Dict], initial_limit: int, language: str,
+                     threshold: float, early_stop: bool) -> Tuple[List[Dict], List[Dict]]:
+        """Screen candidates with the cheap model, then re-score the finalists with this one.
+
+        Finalists are the top ANALYSIS_CASCADE_TOP_N screened chunks plus any
+        within ANALYSIS_CASCADE_BORDERLINE of the threshold, at most
+        ANALYSIS_CASCADE_MAX_FINALISTS. Only final-stage scores become moments.
+        """
+        screen = self.screen_analyzer
+        screen._chunk_cache_hits = 0
+        screened, _ = screen._run_scoring_queue(
+            ranked_chunks, initial_limit, language, threshold, early_stop=early_stop
+        )
+        if screen._chunk_cache_hits:
+            print(f"Reused {screen._chunk_cache_hits} cached screening scores")
+
+        screened.sort(key=lambda item: item['score'], reverse=True)
+        finalists = [
+            item for rank, item in enumerate(screened)
+            if rank < ANALYSIS_CASCADE_TOP_N or item['score'] >= threshold - ANALYSIS_CASCADE_BORDERLINE
+        ][:ANALYSIS_CASCADE_MAX_FINALISTS]
+        print(f"Screened {len(screened)} chunks, re-scoring {len(finalists)} finalists with {self.model_name}")
+
+        finalist_chunks = [item['chunk'] for item in finalists]
+        rescored, viral_moments = self._run_scoring_queue(
+            finalist_chunks, len(finalist_chunks), language, threshold, early_stop=False
+        )
+        # Chunks the main model did not see keep their screening score for reference
+        rescored_ids = {id(item['chunk']) for item in rescored}
+        analyzed_chunks = rescored + [item for item in screened if id(item['chunk']) not in rescored_ids]
+        return analyzed_chunks, viral_moments
+
+    def analyze_transcript_stream(self, stream, chunk_duration: int = 30,
+                                  video_signals: Optional[Dict] = None) -> List[Dict]:
+        """Score sliding windows while a TranscriptStream is still being decoded.
+
+        Each window is sent to the LLM as soon as a later segment closes it, so
+        transcription and analysis overlap. The prefilter needs every window up
+        front and is skipped here, and with it the replay-peak ranking; chapter
+        windows from video_signals are scored once the transcript is complete.
+        The result is cached like analyze_transcript's for the sliding strategy.
+        Already-cached transcripts go through analyze_transcript instead.
+        """
+        video_signals = video_signals or {}
+        if stream.transcript is not None:
+            return self.analyze_transcript(stream.transcript, chunk_duration=chunk_duration,
+                                           video_signals=video_signals)
 
-            cursor += len(batch)
+        threshold = max(MIN_VIRAL_SCORE - 1.0, 4.0)
+        language = stream.language or 'en'
+        max_workers = self._max_workers()
+        print("Analyzing sliding windows while transcription runs...")
 
-            if not prefilter_active or cursor >= len(ranked_chunks):
-                continue
+        def _analyze_one(chunk):
+            score, reason = self._analyze_chunk(chunk['text'], language)
+            print(f"Analyzed window {chunk['start']:.1f}s-{chunk['end']:.1f}s (score: {score:.1f})")
+            return chunk, score, reason
 
-            if len(viral_moments) >= target_hits:
-                print(
-                    f"Stopping after {cursor} ranked chunks; found "
-                    f"{len(viral_moments)} strong candidates."
-                )
-                break
+        viral_moments = []
+        analyzed_chunks = []
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        try:
+            chunks = []
+            futures = []
+            for chunk in self._iter_sliding_chunks(stream):
+                chunks.append(chunk)
+                futures.append(executor.submit(_analyze_one, chunk))
+
+            # The stream sets its transcript once exhausted
+            transcript = stream.transcript
+            boundaries = chapter_starts(video_signals.get('chapters')) if CHUNK_CHAPTER_HINTS else []
+            if boundaries and transcript is not None:
+                for chunk in self._create_chapter_chunks(transcript['segments'], boundaries, chunks):
+                    futures.append(executor.submit(_analyze_one, chunk))
+
+            for future in as_completed(futures):
+                try:
+                    chunk, score, reason = future.result()
+                except Exception as e:
+                    print(f"Error analyzing chunk: {e}")
+                    continue
 
-            print(
-                f"Found {len(viral_moments)} strong candidates so far; "
-                f"expanding shortlist by {min(next_batch_size, len(ranked_chunks) - cursor)} chunks..."
-            )
-        
+                analyzed_chunks.append({'chunk': chunk, 'score': score, 'reason': reason,
+                                        'score_stage': self.score_stage})
+                if score >= threshold:
+                    viral_moments.append(self._chunk_to_moment(chunk, score, reason))
+        finally:
+            # Drop queued windows if transcription failed midway.
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        curve_moments = []
+        if MOMENT_SELECTION == "curve" and transcript is not None:
+            curve_moments = self._select_moments_from_curve(analyzed_chunks, transcript, threshold)
+        viral_moments = curve_moments or self._finalize_moments(viral_moments, analyzed_chunks)
+
+        if transcript is not None and self.enable_cache:
+            cache_key = self._generate_cache_key(transcript, chunk_duration, "sliding", threshold, video_signals)
+            self._save_to_cache(cache_key, viral_moments)
+        self._prune_caches()
+        return viral_moments
+
+    def _chunk_to_moment(self, chunk: Dict, score: float, reason: str, score_stage: str = None) -> Dict:
+        return {
+            'start': chunk['start'],
+            'end': chunk['end'],
+            'duration': chunk['end'] - chunk['start'],
+            'score': score,
+            'score_stage': score_stage or self.score_stage,
+            'reason': reason,
+            'text': chunk['text'][:200] + '...' if len(chunk['text']) > 200 else chunk['text']
+        }
+
+    def _finalize_moments(self, viral_moments: List[Dict], analyzed_chunks: List[Dict]) -> List[Dict]:
         viral_moments.sort(key=lambda x: x['score'], reverse=True)
 
         # If no moments pass threshold, keep the top scored chunks anyway
         if not viral_moments and analyzed_chunks:
             print("No high-scoring moments found, selecting top chunks...")
+            # Final-stage scores first: screening scores of a cascade are not calibrated against them
             top_candidates = sorted(
                 analyzed_chunks,
-                key=lambda item: item['score'],
+                key=lambda item: (item.get('score_stage', 'final') == 'final', item['score']),
                 reverse=True
             )[:3]
 
             for candidate in top_candidates:
-                chunk = candidate['chunk']
-                score = candidate['score']
                 reason = candidate['reason'] or 'Selected as top content'
-                viral_moment = {
-                    'start': chunk['start'],
-                    'end': chunk['end'],
-                    'duration': chunk['end'] - chunk['start'],
-                    'score': score,
-                    'reason': reason,
-                    'text': chunk['text'][:200] + '...' if len(chunk['text']) > 200 else chunk['text']
-                }
-                viral_moments.append(viral_moment)
+                viral_moments.append(self._chunk_to_moment(
+                    candidate['chunk'], candidate['score'], reason, candidate.get('score_stage')
+                ))
 
             viral_moments.sort(key=lambda x: x['score'], reverse=True)
 
+        if MOMENT_MERGE_ADJACENT:
+            viral_moments = self._merge_adjacent_moments(viral_moments)
+        viral_moments = self.suppress_overlapping_moments(viral_moments)
+
         print(f"Found {len(viral_moments)} potential viral moments")
+        return viral_moments
 
-        # Save to cache before returning
-        self._save_to_cache(cache_key, viral_moments)
+    def _select_moments_from_curve(self, analyzed_chunks: List[Dict], transcript: Dict,
+                                   threshold: float) -> List[Dict]:
+        """Place moments on a per-second interest curve built from the window scores.
+
+        Overlapping window scores are blended into one curve, and the best
+        non-overlapping clips between MIN_CLIP_LENGTH and MAX_CLIP_LENGTH are chosen
+        on it, starting and ending on sentence boundaries. Uses only the scores
+        already computed: clips must lie mostly under scored windows
+        (MOMENT_CURVE_MIN_COVERAGE). Returns [] when no interval rises above the threshold.
+        """
+        # A cascade leaves screening scores on most windows; they are not on the final scale
+        scored = [item for item in analyzed_chunks if item.get('score_stage', 'final') == 'final']
+        scored = scored or analyzed_chunks
+        segments = transcript['segments']
+        if not scored or not segments:
+            return []
 
-        return viral_moments
+        boundary_index = self._build_boundary_index(transcript)
+        index = boundary_index['transcript']
+        starts = [segments[0]['start']] + [
+            segment['start'] for segment, flag in zip(segments, boundary_index['sentence_start']) if flag
+        ]
+        ends = [segments[-1]['end']] + [
+            segment['end'] for segment, flag in zip(segments, boundary_index['sentence_end']) if flag
+        ]
+        duration = max(transcript.get('duration') or 0, max(segment['end'] for segment in segments))
+
+        windows = [(item['chunk']['start'], item['chunk']['end'], item['score']) for item in scored]
+        curve = score_curve(windows, duration, MOMENT_CURVE_RESOLUTION)
+        intervals = select_intervals(
+            curve, starts, ends, MIN_CLIP_LENGTH, MAX_CLIP_LENGTH, threshold,
+            MOMENT_CURVE_MAX_CLIPS, MOMENT_CURVE_RESOLUTION,
+            covered=covered_bins(windows, duration, MOMENT_CURVE_RESOLUTION),
+            min_coverage=MOMENT_CURVE_MIN_COVERAGE,
+        )
 
-    def _rank_chunks_for_analysis(self, chunks: List[Dict], language: str) -> Tuple[List[Dict], int]:
-        """Sort chunks by a cheap heuristic so LLM calls start with the best candidates."""
+        moments = []
+        for start, end, score in intervals:
+            # The best window overlapping the clip explains it
+            overlapping = [item for item in scored if item['chunk']['start'] < end and item['chunk']['end'] > start]
+            if not overlapping:
+                # No score says anything about this span; do not borrow a reason from elsewhere
+                continue
+            best = max(overlapping, key=lambda item: item['score'])
+            text = ' '.join(segment['text'].strip() for segment in index.segments_in_range(start, end))
+            moments.append(self._chunk_to_moment(
+                {'start': start, 'end': end, 'text': text},
+                round(score, 1), best['reason'] or 'Selected on the score curve', best.get('score_stage')
+            ))
+
+        moments.sort(key=lambda x: x['score'], reverse=True)
+        if moments:
+            print(f"Placed {len(moments)} moments on the score curve")
+        return moments
+
+    def suppress_overlapping_moments(self, moments: List[Dict], iou_threshold: float = None) -> List[Dict]:
+        """Non-maximum suppression: drop moments overlapping a higher-scoring kept one.
+
+        A moment is a duplicate when its intersection-over-union with a kept moment
+        exceeds the threshold. Survivors keep their input order.
+        """
+        threshold = MOMENT_NMS_IOU if iou_threshold is None else iou_threshold
+        if threshold >= 1.0 or len(moments) < 2:
+            return list(moments)
+
+        # Kept intervals sorted by start; only those starting within `longest` before a
+        # moment can reach into it, so each check is a bisect plus a short scan.
+        kept_starts, kept_ends = [], []
+        longest = 0.0
+        keep = set()
+        for index in sorted(range(len(moments)), key=lambda i: moments[i]['score'], reverse=True):
+            start, end = moments[index]['start'], moments[index]['end']
+            duplicate = False
+            for j in range(bisect_left(kept_starts, start - longest), bisect_left(kept_starts, end)):
+                overlap = min(end, kept_ends[j]) - max(start, kept_starts[j])
+                union = max(end, kept_ends[j]) - min(start, kept_starts[j])
+                if overlap > 0 and union > 0 and overlap / union > threshold:
+                    duplicate = True
+                    break
+            if duplicate:
+                continue
+            position = bisect_right(kept_starts, start)
+            kept_starts.insert(position, start)
+            kept_ends.insert(position, end)
+            longest = max(longest, end - start)
+            keep.add(index)
+
+        if len(keep) < len(moments):
+            print(f"Suppressed {len(moments) - len(keep)} overlapping moments")
+        return [moment for index, moment in enumerate(moments) if index in keep]
+
+    def _merge_adjacent_moments(self, moments: List[Dict]) -> List[Dict]:
+        """Join runs of overlapping or nearly touching moments while they fit in MAX_CLIP_LENGTH."""
+        if len(moments) < 2:
+            return moments
+
+        groups = []
+        for moment in sorted(moments, key=lambda x: x['start']):
+            if groups:
+                group_start = groups[-1][0]['start']
+                group_end = max(item['end'] for item in groups[-1])
+                if (moment['start'] <= group_end + MOMENT_MERGE_GAP
+                        and max(group_end, moment['end']) - group_start <= MAX_CLIP_LENGTH):
+                    groups[-1].append(moment)
+                    continue
+            groups.append([moment])
+
+        merged = []
+        for group in groups:
+            # The best window speaks for the merged moment
+            moment = dict(max(group, key=lambda x: x['score']))
+            moment['start'] = group[0]['start']
+            moment['end'] = max(item['end'] for item in group)
+            moment['duration'] = moment['end'] - moment['start']
+            merged.append(moment)
+
+        if len(merged) < len(moments):
+            print(f"Merged {len(moments)} adjacent moments into {len(merged)}")
+        merged.sort(key=lambda x: x['score'], reverse=True)
+        return merged
+
+    def _rank_chunks_for_analysis(self, chunks: List[Dict], language: str,
+                                  replay: Optional[List[float]] = None) -> Tuple[List[Dict], int]:
+        """Sort chunks by a cheap heuristic so LLM calls start with the best candidates.
+
+        With a trained prefilter model, chunks are ranked by its predicted chance
+        of an LLM hit (plus the timing signals it cannot learn), and the
+        shortlist ends once the predicted hits cover the target with margin.
+        replay holds each chunk's YouTube replay peak (0-1), added with
+        PREFILTER_REPLAY_WEIGHT so audience favourites are scored first.
+        """
         total_chunks = len(chunks)
         if not ANALYSIS_PREFILTER_ENABLED or total_chunks <= ANALYSIS_MIN_CANDIDATES:
             return list(chunks), total_chunks
 
         scored_chunks = []
-        for chunk in chunks:
-            prefilter_score = self._score_chunk_for_prefilter(chunk, language)
+        probabilities = {}
+        replay = replay or [0.0] * total_chunks
+        for chunk, features, peak in zip(chunks, self._prefilter_feature_rows(chunks, language), replay):
+            if self.prefilter_model:
+                prefilter_score, probability = self._score_chunk_with_model(chunk, language, features)
+                probabilities[id(chunk)] = probability
+            else:
+                prefilter_score = self._prefilter_score(features)
+            if features is not None and peak:
+                prefilter_score = round(prefilter_score + PREFILTER_REPLAY_WEIGHT * peak, 4)
             scored_chunks.append((prefilter_score, chunk['start'], chunk))
 
         scored_chunks.sort(key=lambda item: (-item[0], item[1]))
@@ -351,6 +769,16 @@ class ViralMomentAnalyzer:
         )
         initial_limit = min(initial_limit, total_chunks)
 
+        if probabilities:
+            # Never above the heuristic shortlist; early-stop expansion covers misses
+            expected_hits = 0.0
+            needed = ANALYSIS_TARGET_MOMENTS * PREFILTER_MODEL_HIT_MARGIN
+            for rank, chunk in enumerate(ranked_chunks[:initial_limit], 1):
+                expected_hits += probabilities[id(chunk)]
+                if expected_hits >= needed:
+                    initial_limit = max(min(ANALYSIS_MIN_CANDIDATES, total_chunks), rank)
+                    break
+
         if initial_limit >= total_chunks:
             return ranked_chunks, total_chunks
 
@@ -362,28 +790,56 @@ class ViralMomentAnalyzer:
 
     def _score_chunk_for_prefilter(self, chunk: Dict, language: str) -> float:
         """Estimate engagement potential with deterministic, CPU-cheap transcript signals."""
-        text = chunk.get('text', '').strip()
-        if not text:
+        return self._prefilter_score(self._prefilter_features(chunk, language))
+
+    @staticmethod
+    def _prefilter_score(features: Optional[Dict[str, float]]) -> float:
+        if features is None:
             return -1.0
+        return round(sum(features.values()), 4)
 
-        language_key = 'fr' if str(language).lower().startswith('fr') else 'en'
-        normalized = re.sub(r"[^\w\s']", ' ', text.lower(), flags=re.UNICODE)
-        normalized = re.sub(r'\s+', ' ', normalized).strip()
-        tokens = normalized.split()
-        token_set = set(tokens)
-        duration = max(1.0, chunk['end'] - chunk['start'])
+    def _prefilter_feature_rows(self, chunks: List[Dict], language: str) -> List[Optional[Dict[str, float]]]:
+        """Prefilter features of every chunk, computed once per segment when chunks share segments."""
+        segments = []
+        seen = set()
+        for chunk in chunks:
+            for segment in chunk.get('segments', []):
+                if id(segment) not in seen:
+                    seen.add(id(segment))
+                    segments.append(segment)
 
-        score = 0.0
+        language_key = self._prefilter_language(language)
+        try:
+            engine = SegmentPrefilter(
+                segments, self.PREFILTER_KEYWORDS[language_key], self.PREFILTER_PHRASES[language_key]
+            )
+            return engine.features(chunks)
+        except ValueError:
+            # Chunks that are not plain runs of segments are scored one by one
+            return [self._prefilter_features(chunk, language) for chunk in chunks]
+
+    def _score_chunk_with_model(self, chunk: Dict, language: str,
+                                features: Optional[Dict[str, float]]) -> Tuple[float, float]:
+        """(ranking score, predicted hit probability) from the learned prefilter."""
+        if features is None:
+            return -1.0, 0.0
+        probability = self.prefilter_model.predict_proba(
+            chunk['text'], self._prefilter_language(language), features
+        )
+        return round(10.0 * probability + features['density'] + features['pauses'], 4), probability
 
-        # Higher speech density usually means fewer dead-air windows.
-        words_per_second = len(tokens) / duration
-        score += min(1.5, words_per_second * 0.9)
+    @staticmethod
+    def _prefilter_language(language: str) -> str:
+        return 'fr' if str(language).lower().startswith('fr') else 'en'
 
-        # Questions, exclamations, quotes, and numbers are cheap hook signals.
-        score += min(1.5, (text.count('?') + text.count('!')) * 0.75)
-        score += min(0.6, text.count(':') * 0.2 + text.count('"') * 0.2)
-        if re.search(r'\b\d{2,}\b|[$€£%]', text):
-            score += 0.4
+    def _prefilter_features(self, chunk: Dict, language: str) -> Optional[Dict[str, float]]:
+        """Capped heuristic signals of a chunk, in scoring order; None for an empty chunk."""
+        text = chunk.get('text', '').strip()
+        if not text:
+            return None
+
+        duration = max(1.0, chunk['end'] - chunk['start'])
+        text_features = self._prefilter_text_features(text, language)
 
         # Pauses often line up with punchlines, reveals, or clipable beats.
         medium_pauses = 0
@@ -394,28 +850,87 @@ class ViralMomentAnalyzer:
                 long_pauses += 1
             elif gap >= 0.4:
                 medium_pauses += 1
-        score += min(1.5, long_pauses * 0.75 + medium_pauses * 0.3)
 
-        keyword_hits = token_set.intersection(self.PREFILTER_KEYWORDS[language_key])
-        score += min(2.5, len(keyword_hits) * 0.45)
+        return {
+            # Higher speech density usually means fewer dead-air windows.
+            'density': min(1.5, len(self._prefilter_tokens(text)) / duration * 0.9),
+            'punctuation': text_features['punctuation'],
+            'quotes': text_features['quotes'],
+            'numbers': text_features['numbers'],
+            'pauses': min(1.5, long_pauses * 0.75 + medium_pauses * 0.3),
+            'keywords': text_features['keywords'],
+            'phrases': text_features['phrases'],
+            'question_start': text_features['question_start'],
+            'hook_end': text_features['hook_end'],
+        }
 
-        phrase_hits = 0
-        for phrase in self.PREFILTER_PHRASES[language_key]:
-            if phrase in normalized:
-                phrase_hits += 1
-        score += min(2.0, phrase_hits * 0.9)
+    @classmethod
+    def _prefilter_tokens(cls, text: str) -> List[str]:
+        return normalize_prefilter_text(text).split()
 
-        if tokens:
-            first_word = tokens[0]
-            if first_word in {'why', 'how', 'what', 'who', 'when', 'pourquoi', 'comment', 'quoi', 'qui', 'quand'}:
-                score += 0.4
+    @classmethod
+    def _prefilter_text_features(cls, text: str, language: str) -> Dict[str, float]:
+        """Prefilter signals computed from the text alone (see PREFILTER_TEXT_FEATURES)."""
+        text = text.strip()
+        language_key = cls._prefilter_language(language)
+        normalized = normalize_prefilter_text(text)
+        tokens = normalized.split()
 
-        if text.endswith(('?', '!')):
-            score += 0.25
+        # Questions, exclamations, quotes, and numbers are cheap hook signals.
+        keyword_hits = set(tokens).intersection(cls.PREFILTER_KEYWORDS[language_key])
+        phrase_hits = sum(1 for phrase in cls.PREFILTER_PHRASES[language_key] if phrase in normalized)
+
+        return {
+            'punctuation': min(1.5, (text.count('?') + text.count('!')) * 0.75),
+            'quotes': min(0.6, text.count(':') * 0.2 + text.count('"') * 0.2),
+            'numbers': 0.4 if NUMBER_PATTERN.search(text) else 0.0,
+            'keywords': min(2.5, len(keyword_hits) * 0.45),
+            'phrases': min(2.0, phrase_hits * 0.9),
+            'question_start': 0.4 if tokens and tokens[0] in QUESTION_WORDS else 0.0,
+            'hook_end': 0.25 if text.endswith(('?', '!')) else 0.0,
+        }
 
-        return round(score, 4)
+    @classmethod
+    def train_prefilter_model(cls, chunk_cache_dir: Path = None,
+                              output_path: Path = PREFILTER_MODEL_PATH) -> Optional[PrefilterModel]:
+        """Fit the learned prefilter on cached LLM chunk scores and save it to output_path."""
+        chunk_cache_dir = Path(chunk_cache_dir or ANALYSIS_CACHE_DIR / "chunks")
+        samples = []
+        for entry in iter_cached_scores(chunk_cache_dir):
+            language = cls._prefilter_language(entry.get('language', 'en'))
+            samples.append((
+                entry['text'], language, cls._prefilter_text_features(entry['text'], language), float(entry['score'])
+            ))
+
+        if len(samples) < PREFILTER_MODEL_MIN_SAMPLES:
+            print(
+                f"Only {len(samples)} cached chunk scores in {chunk_cache_dir}; "
+                f"need {PREFILTER_MODEL_MIN_SAMPLES} to train the prefilter"
+            )
+            return None
+
+        threshold = max(MIN_VIRAL_SCORE - 1.0, 4.0)
+        positives = sum(1 for *_, score in samples if score >= threshold)
+        print(f"Training prefilter on {len(samples)} cached scores ({positives} scored {threshold:.1f}+)...")
+
+        # Report held-out accuracy on every fifth sample, then fit on everything
+        held_out = samples[::5]
+        trial = PrefilterModel(cls.PREFILTER_TEXT_FEATURES, threshold=threshold).fit(
+            [sample for index, sample in enumerate(samples) if index % 5]
+        )
+        correct = sum(
+            (trial.predict_proba(text, language, features) >= 0.5) == (score >= threshold)
+            for text, language, features, score in held_out
+        )
+        print(f"Held-out accuracy: {correct / len(held_out):.1%} on {len(held_out)} chunks")
+
+        model = PrefilterModel(cls.PREFILTER_TEXT_FEATURES, threshold=threshold).fit(samples)
+        model.save(output_path)
+        print(f"✓ Saved prefilter model to {output_path}")
+        return model
     
-    def _create_chunks(self, segments: List[Dict], chunk_duration: int) -> List[Dict]:
+    def _create_chunks(self, segments: List[Dict], chunk_duration: int,
+                       boundaries: Optional[List[float]] = None) -> List[Dict]:
         chunks = []
         current_chunk = {
             'start': 0,
@@ -425,7 +940,10 @@ class ViralMomentAnalyzer:
         }
         
         for segment in segments:
-            if current_chunk['text'] and (segment['start'] - current_chunk['start']) >= chunk_duration:
+            if current_chunk['text'] and (
+                (segment['start'] - current_chunk['start']) >= chunk_duration
+                or self._chapter_break(boundaries, current_chunk, segment)
+            ):
                 chunks.append(current_chunk.copy())
                 current_chunk = {
                     'start': segment['start'],
@@ -445,47 +963,104 @@ class ViralMomentAnalyzer:
 
         return chunks
 
+    @staticmethod
+    def _chapter_break(boundaries: Optional[List[float]], chunk: Dict, segment: Dict) -> bool:
+        """Whether a chapter starts between the chunk's start and this segment (chunks under MIN_CLIP_LENGTH continue)."""
+        if not boundaries or chunk['end'] - chunk['start'] < MIN_CLIP_LENGTH:
+            return False
+        index = bisect_right(boundaries, chunk['start'])
+        return index < len(boundaries) and boundaries[index] <= segment['start']
+
+    def _create_chapter_chunks(self, segments: List[Dict], boundaries: List[float],
+                               existing: List[Dict]) -> List[Dict]:
+        """Sliding-size windows opening at chapter starts that no existing window starts near."""
+        existing_starts = sorted(chunk['start'] for chunk in existing)
+        chunks = []
+        for i, boundary in enumerate(boundaries):
+            nearby = bisect_left(existing_starts, boundary - 2.0)
+            if nearby < len(existing_starts) and existing_starts[nearby] <= boundary + 2.0:
+                continue
+            window_end = boundary + SLIDING_WINDOW_SIZE
+            if i + 1 < len(boundaries):
+                window_end = min(window_end, boundaries[i + 1])
+            chunk_segments = [
+                segment for segment in segments
+                if segment['end'] > boundary and segment['start'] < window_end
+            ]
+            if not chunk_segments or chunk_segments[-1]['end'] - chunk_segments[0]['start'] < MIN_CLIP_LENGTH:
+                continue
+            chunks.append({
+                'start': chunk_segments[0]['start'],
+                'end': chunk_segments[-1]['end'],
+                'text': ' '.join(segment['text'] for segment in chunk_segments),
+                'segments': chunk_segments
+            })
+        return chunks
+
     def _create_sliding_chunks(self, segments: List[Dict]) -> List[Dict]:
         """Create overlapping chunks using a sliding window for better coverage"""
+        return list(self._iter_sliding_chunks(segments))
+
+    def _iter_sliding_chunks(self, segments: Iterable[Dict]) -> Iterator[Dict]:
+        """Yield sliding-window chunks as soon as they are complete.
+
+        A window is closed by the first segment starting at or after its end, so
+        segments can come from a live transcription stream; the result matches
+        a pass over the full segment list.
+        """
         window = SLIDING_WINDOW_SIZE
         overlap = SLIDING_OVERLAP
         step = window - overlap
 
-        if not segments:
-            return []
-
-        total_duration = segments[-1]['end']
-        chunks = []
+        received = []
         window_start = 0.0
         first_idx = 0
         last_idx = 0
 
-        while window_start < total_duration:
+        def close_window():
+            nonlocal first_idx, last_idx
             window_end = window_start + window
 
-            while first_idx < len(segments) and segments[first_idx]['end'] <= window_start:
+            while first_idx < len(received) and received[first_idx]['end'] <= window_start:
                 first_idx += 1
 
             if last_idx < first_idx:
                 last_idx = first_idx
 
-            while last_idx < len(segments) and segments[last_idx]['start'] < window_end:
+            while last_idx < len(received) and received[last_idx]['start'] < window_end:
                 last_idx += 1
 
-            chunk_segments = segments[first_idx:last_idx]
-            if chunk_segments:
-                chunks.append({
-                    'start': chunk_segments[0]['start'],
-                    'end': chunk_segments[-1]['end'],
-                    'text': ' '.join(s['text'] for s in chunk_segments),
-                    'segments': chunk_segments
-                })
-            window_start += step
+            chunk_segments = received[first_idx:last_idx]
+            if not chunk_segments:
+                return None
+            return {
+                'start': chunk_segments[0]['start'],
+                'end': chunk_segments[-1]['end'],
+                'text': ' '.join(s['text'] for s in chunk_segments),
+                'segments': chunk_segments
+            }
 
-        return chunks
+        for segment in segments:
+            received.append(segment)
+            while segment['start'] >= window_start + window:
+                chunk = close_window()
+                if chunk:
+                    yield chunk
+                window_start += step
+
+        if not received:
+            return
 
-    def _create_smart_chunks(self, segments: List[Dict], target_duration: int) -> List[Dict]:
-        """Create chunks that break on natural sentence boundaries"""
+        total_duration = received[-1]['end']
+        while window_start < total_duration:
+            chunk = close_window()
+            if chunk:
+                yield chunk
+            window_start += step
+
+    def _create_smart_chunks(self, segments: List[Dict], target_duration: int,
+                             boundaries: Optional[List[float]] = None) -> List[Dict]:
+        """Create chunks that break on natural sentence boundaries (and chapter starts)"""
         if not segments:
             return []
 
@@ -494,6 +1069,15 @@ class ViralMomentAnalyzer:
         current_chunk = {'start': 0, 'end': 0, 'text': '', 'segments': []}
 
         for seg in segments:
+            if current_chunk['text'] and self._chapter_break(boundaries, current_chunk, seg):
+                chunks.append({
+                    'start': current_chunk['start'],
+                    'end': current_chunk['end'],
+                    'text': current_chunk['text'].strip(),
+                    'segments': list(current_chunk['segments'])
+                })
+                current_chunk = {'start': 0, 'end': 0, 'text': '', 'segments': []}
+
             if not current_chunk['text']:
                 current_chunk['start'] = seg['start']
 
@@ -525,137 +1109,425 @@ class ViralMomentAnalyzer:
         return chunks
 
     def _analyze_chunk(self, text: str, language: str = 'en') -> Tuple[float, str]:
+        cached = self._load_chunk_score(text, language)
+        if cached is not None:
+            return cached
+
         try:
-            # Use structured prompt requesting JSON response
-            if language == 'fr':
-                structured_prompt = f"""Analyse ce segment de transcription pour détecter son POTENTIEL MAXIMAL D'ENGAGEMENT sur les réseaux sociaux.
+            score, reason, parsed = self._request_chunk_score(text, language)
+        except Exception as e:
+            print(f"Error analyzing chunk: {e}")
+            return 0.0, "Analysis failed"
 
-Il s'agit d'un court extrait d'une longue vidéo YouTube. Évalue UNIQUEMENT ce segment pour son potentiel viral — ne prends pas en compte le contexte avant ou après.
+        if parsed:
+            self._save_chunk_score(text, language, score, reason)
+        return score, reason
 
-Transcription :
-{text}
+    def _chunk_cache_path(self, text: str, language: str, prompt: str = 'single') -> Path:
+        """Score cache entry for one chunk, independent of thresholds and batch sizes.
 
-Évalue les critères suivants de 0 à 10 (sois EXIGEANT — seuls les moments VRAIMENT viraux méritent plus de 7) :
+        prompt ('single' or 'batch') keeps scores from the two prompt shapes apart.
+        """
+        key_data = {
+            'text_sha256': hashlib.sha256(text.encode('utf-8')).hexdigest(),
+            'language': language,
+            'provider': self.provider,
+            'model': self.model_name,
+            'temperature': AI_TEMPERATURE,
+            'prompt_version': ANALYSIS_PROMPT_VERSION,
+            'structured_output': LLM_STRUCTURED_OUTPUT,
+            'stage': self.score_stage,
+            'prompt': prompt,
+        }
+        key = hashlib.sha256(json.dumps(key_data, sort_keys=True).encode()).hexdigest()
+        return self.chunk_cache_dir / key[:2] / f"{key}.json"
+
+    def _load_chunk_score(self, text: str, language: str, prompt: str = 'single') -> Optional[Tuple[float, str]]:
+        if not self.enable_cache:
+            return None
+
+        cache_file = self._chunk_cache_path(text, language, prompt)
+        cached = load_json_file(cache_file) if cache_file.exists() else None
+        if cached is None:
+            return None
+        try:
+            # Refresh mtime so pruning evicts least recently used entries first
+            os.utime(cache_file)
+        except OSError:
+            pass
+        with self._chunk_cache_lock:
+            self._chunk_cache_hits += 1
+        return float(cached['score']), cached['reason']
+
+    def _save_chunk_score(self, text: str, language: str, score: float, reason: str,
+                          prompt: str = 'single'):
+        if not self.enable_cache:
+            return
+
+        cache_file = self._chunk_cache_path(text, language, prompt)
+        try:
+            cache_file.parent.mkdir(parents=True, exist_ok=True)
+            atomic_write_json({
+                'score': score,
+                'reason': reason,
+                'language': language,
+                'provider': self.provider,
+                'model': self.model_name,
+                'stage': self.score_stage,
+                'prompt': prompt,
+                'text': text,
+            }, cache_file, indent=None)
+            with self._chunk_cache_lock:
+                self._chunk_cache_writes += 1
+        except Exception as e:
+            print(f"Warning: Failed to save chunk score: {e}")
+
+    def _prune_caches(self):
+        """Keep cache/analysis bounded: LRU eviction of chunk scores and whole-transcript results.
+
+        A sweep stats every cached entry, so it runs at most once per
+        ANALYSIS_CACHE_PRUNE_INTERVAL (tracked by a marker file shared by all
+        processes), or earlier after ANALYSIS_CACHE_PRUNE_WRITES new chunk scores.
+        """
+        if not self.enable_cache:
+            return
+        marker = self.cache_dir / ".last_prune"
+        try:
+            last_prune = marker.stat().st_mtime
+        except OSError:
+            last_prune = 0.0
+        if (time.time() - last_prune < ANALYSIS_CACHE_PRUNE_INTERVAL
+                and self._chunk_cache_writes < ANALYSIS_CACHE_PRUNE_WRITES):
+            return
+        with self._chunk_cache_lock:
+            self._chunk_cache_writes = 0
+        marker.touch()
+        removed = prune_cache_dir(
+            self.chunk_cache_dir,
+            max_bytes=ANALYSIS_CHUNK_CACHE_MAX_MB * 1024 * 1024,
+            max_entries=ANALYSIS_CHUNK_CACHE_MAX_ENTRIES,
+        )
+        removed += prune_cache_dir(
+            self.cache_dir,
+            max_entries=ANALYSIS_RESULT_CACHE_MAX_ENTRIES,
+            recursive=False,
+        )
+        if removed:
+            print(f"Pruned {removed} old analysis cache entries")
+
+    def _score_rubric(self, language: str) -> str:
+        if language == 'fr':
+            return """Évalue les critères suivants de 0 à 10 (sois EXIGEANT — seuls les moments VRAIMENT viraux méritent plus de 7) :
 - emotional_impact : choc, controverse, drame, indignation, excitation, admiration
 - surprise_drama : révélation inattendue, rebondissement, conflit, information explosive
 - quotability : phrase mémorable, réutilisable, parfaite pour un titre ou une légende
 - hook_power : début captivant qui retient immédiatement l'attention
 
 À PRIVILÉGIER : moments choquants, controverses, révélations, conflits, transformations spectaculaires, réactions extrêmes.
-À ÉVITER : contenu générique, transitions, explications neutres, remplissage.
+À ÉVITER : contenu générique, transitions, explications neutres, remplissage."""
+        return """Rate the following aspects from 0-10 (be STRICT — only TRULY viral moments deserve 7+):
+- emotional_impact: shocking, controversial, dramatic, rage-inducing, excitement, awe
+- surprise_drama: unexpected reveal, plot twist, explosive info, tension, conflict
+- quotability: memorable, shareable, standalone lines for captions or titles
+- hook_power: captivating start that demands attention, "wait what?", "no way!" moments
+
+PRIORITIZE: shocking moments, controversies, reveals, conflicts, transformations, extreme reactions.
+AVOID: generic content, flat explanations, transitions, filler."""
+
+    def _build_score_prompt(self, text: str, language: str = 'en') -> str:
+        """Structured single-chunk scoring prompt requesting a JSON object."""
+        rubric = self._score_rubric(language)
+        if language == 'fr':
+            return f"""Analyse ce segment de transcription pour détecter son POTENTIEL MAXIMAL D'ENGAGEMENT sur les réseaux sociaux.
+
+Il s'agit d'un court extrait d'une longue vidéo YouTube. Évalue UNIQUEMENT ce segment pour son potentiel viral — ne prends pas en compte le contexte avant ou après.
+
+Transcription :
+{text}
+
+{rubric}
 
 Réponds avec UNIQUEMENT du JSON valide dans ce format exact :
 {{"emotional_impact": 0, "surprise_drama": 0, "quotability": 0, "hook_power": 0, "overall_score": 0, "moment_type": "...", "reason": "..."}}"""
-            else:
-                structured_prompt = f"""Analyze this transcript segment for MAXIMUM ENGAGEMENT potential on social media.
+        return f"""Analyze this transcript segment for MAXIMUM ENGAGEMENT potential on social media.
 
 This is a short segment from a long YouTube video. Judge only THIS segment for viral potential — do not assume previous or following context.
 
 Transcript:
 {text}
 
-Rate the following aspects from 0-10 (be STRICT — only TRULY viral moments deserve 7+):
-- emotional_impact: shocking, controversial, dramatic, rage-inducing, excitement, awe
-- surprise_drama: unexpected reveal, plot twist, explosive info, tension, conflict
-- quotability: memorable, shareable, standalone lines for captions or titles
-- hook_power: captivating start that demands attention, "wait what?", "no way!" moments
-
-PRIORITIZE: shocking moments, controversies, reveals, conflicts, transformations, extreme reactions.
-AVOID: generic content, flat explanations, transitions, filler.
+{rubric}
 
 Respond with ONLY valid JSON in this exact format:
 {{"emotional_impact": 0, "surprise_drama": 0, "quotability": 0, "hook_power": 0, "overall_score": 0, "moment_type": "...", "reason": "..."}}"""
 
-            if self.provider == "ollama":
-                response_text = self._call_ollama(structured_prompt)
-            elif self.provider == "openai":
-                response_text = self._call_openai(structured_prompt)
-            elif self.provider == "anthropic":
-                response_text = self._call_anthropic(structured_prompt)
-            else:
-                raise ValueError(f"Unknown provider: {self.provider}")
+    def _build_batch_score_prompt(self, texts: List[str], language: str = 'en') -> str:
+        """Scoring prompt for several chunks at once; the rubric is sent only once."""
+        rubric = self._score_rubric(language)
+        segments = '\n\n'.join(f"[{i}]\n{text}" for i, text in enumerate(texts, 1))
+        item = ('{"id": 1, "emotional_impact": 0, "surprise_drama": 0, "quotability": 0, "hook_power": 0, '
+                '"overall_score": 0, "moment_type": "...", "reason": "..."}')
+        # The reply format must agree with BATCH_SCORE_SCHEMA when it is enforced
+        if LLM_STRUCTURED_OUTPUT:
+            shape = {'fr': "un objet JSON valide dont le tableau \"results\" contient",
+                     'en': 'a valid JSON object whose "results" array holds'}
+            example = f'{{"results": [{item}]}}'
+        else:
+            shape = {'fr': "un tableau JSON valide contenant", 'en': "a valid JSON array containing"}
+            example = f'[{item}]'
+        if language == 'fr':
+            return f"""Analyse chacun des {len(texts)} segments de transcription ci-dessous pour détecter son POTENTIEL MAXIMAL D'ENGAGEMENT sur les réseaux sociaux.
 
-            score = None
-            reason = "High viral potential"
+Ce sont des extraits courts et indépendants d'une longue vidéo YouTube. Évalue chaque segment SÉPARÉMENT pour son potentiel viral — ne tiens pas compte des autres segments ni du contexte avant ou après.
 
-            # Try JSON parsing first
-            try:
-                parsed = self._extract_json(response_text)
-                score = float(parsed.get('overall_score', 0))
-                reason = parsed.get('reason', 'High viral potential')[:200]
-            except (json.JSONDecodeError, ValueError, AttributeError, TypeError) as parse_err:
-                # Fall back to regex parsing
-                # Debug: log first failure to help diagnose
-                if not hasattr(self, '_parse_debug_logged'):
-                    self._parse_debug_logged = True
-                    print(f"[DEBUG] JSON parse failed ({parse_err}), raw response (first 500 chars):")
-                    print(response_text[:500])
-                    print("---")
-
-                scores = {}
-                aspect_patterns = {
-                    'emotional_impact': [
-                        r'emotional.?impact["\s:]+(\d+(?:\.\d+)?)',
-                        r'Impact [ée]motionnel\s*:\s*(\d+(?:\.\d+)?)',
-                    ],
-                    'surprise_drama': [
-                        r'surprise.?drama["\s:]+(\d+(?:\.\d+)?)',
-                        r'Surprise\s*/?\s*(?:Drama|Tension)["\s:]+(\d+(?:\.\d+)?)',
-                    ],
-                    'quotability': [
-                        r'quotability["\s:]+(\d+(?:\.\d+)?)',
-                        r'Citabilit[ée]\s*:\s*(\d+(?:\.\d+)?)',
-                    ],
-                    'hook_power': [
-                        r'hook.?power["\s:]+(\d+(?:\.\d+)?)',
-                        r"Pouvoir d'accroche\s*:\s*(\d+(?:\.\d+)?)",
-                    ],
-                }
-                for aspect, patterns in aspect_patterns.items():
-                    for pattern in patterns:
-                        match = re.search(pattern, response_text, re.IGNORECASE)
-                        if match:
-                            scores[aspect] = float(match.group(1))
-                            break
-                    else:
-                        scores[aspect] = 0.0
-
-                # Get overall score
-                overall_patterns = [
-                    r'overall.?score["\s:]+(\d+(?:\.\d+)?)',
-                    r'Score global\s*:\s*(\d+(?:\.\d+)?)',
-                    r'Overall:\s*(\d+(?:\.\d+)?)',
-                    r'Score:\s*(\d+(?:\.\d+)?)'
-                ]
-
-                for pattern in overall_patterns:
+Segments :
+{segments}
+
+Pour CHAQUE segment :
+{rubric}
+
+Réponds avec UNIQUEMENT {shape['fr']} un objet par segment, avec son id, dans ce format exact :
+{example}"""
+        return f"""Analyze each of the {len(texts)} transcript segments below for MAXIMUM ENGAGEMENT potential on social media.
+
+They are short, independent segments from a long YouTube video. Judge each segment ON ITS OWN for viral potential — do not use the other segments or assume previous or following context.
+
+Segments:
+{segments}
+
+For EACH segment:
+{rubric}
+
+Respond with ONLY {shape['en']} one object per segment, with its id, in this exact format:
+{example}"""
+
+    def _call_llm(self, prompt: str, max_tokens: Optional[int] = None, schema: Optional[Dict] = None,
+                  schema_name: str = 'response') -> str:
+        """Send a prompt through the process-wide limiter of the provider (concurrency, RPM/TPM, retries).
+
+        With LLM_STRUCTURED_OUTPUT, `schema` constrains the reply, which is
+        then always a JSON document matching it.
+        """
+        if not LLM_STRUCTURED_OUTPUT:
+            schema = None
+        if self.provider == "ollama":
+            request = lambda: self._call_ollama(prompt, max_tokens, schema)
+        elif self.provider == "openai":
+            request = lambda: self._call_openai(prompt, max_tokens, schema, schema_name)
+        elif self.provider == "anthropic":
+            request = lambda: self._call_anthropic(prompt, max_tokens, schema, schema_name)
+        else:
+            raise ValueError(f"Unknown provider: {self.provider}")
+
+        # Providers count prompt plus requested completion tokens against TPM.
+        estimated_tokens = len(prompt) // 4 + (max_tokens or 500)
+        return get_provider_limiter(self.provider).call(request, estimated_tokens)
+
+    def _max_workers(self) -> int:
+        """Worker threads per analysis; the shared limiter decides how many calls actually run."""
+        return get_provider_limiter(self.provider).max_concurrency
+
+    def _request_chunk_score(self, text: str, language: str = 'en') -> Tuple[float, str, bool]:
+        """Score one chunk with the LLM; the flag is False when the response held no usable score."""
+        response_text = self._call_llm(
+            self._build_score_prompt(text, language),
+            max_tokens=self._max_output_tokens(LLM_SCORE_MAX_TOKENS),
+            schema=self.SCORE_SCHEMA,
+            schema_name='viral_score',
+        )
+        return self._parse_score_response(response_text)
+
+    def _parse_score_response(self, response_text: str) -> Tuple[float, str, bool]:
+        score = None
+        reason = "High viral potential"
+        usable = True
+
+        # Try JSON parsing first
+        try:
+            parsed = self._extract_json(response_text)
+            score = float(parsed.get('overall_score', 0))
+            reason = parsed.get('reason', 'High viral potential')[:200]
+        except (json.JSONDecodeError, ValueError, AttributeError, TypeError) as parse_err:
+            # Fall back to regex parsing
+            # Debug: log first failure to help diagnose
+            if not hasattr(self, '_parse_debug_logged'):
+                self._parse_debug_logged = True
+                print(f"[DEBUG] JSON parse failed ({parse_err}), raw response (first 500 chars):")
+                print(response_text[:500])
+                print("---")
+
+            scores = {}
+            aspect_patterns = {
+                'emotional_impact': [
+                    r'emotional.?impact["\s:]+(\d+(?:\.\d+)?)',
+                    r'Impact [ée]motionnel\s*:\s*(\d+(?:\.\d+)?)',
+                ],
+                'surprise_drama': [
+                    r'surprise.?drama["\s:]+(\d+(?:\.\d+)?)',
+                    r'Surprise\s*/?\s*(?:Drama|Tension)["\s:]+(\d+(?:\.\d+)?)',
+                ],
+                'quotability': [
+                    r'quotability["\s:]+(\d+(?:\.\d+)?)',
+                    r'Citabilit[ée]\s*:\s*(\d+(?:\.\d+)?)',
+                ],
+                'hook_power': [
+                    r'hook.?power["\s:]+(\d+(?:\.\d+)?)',
+                    r"Pouvoir d'accroche\s*:\s*(\d+(?:\.\d+)?)",
+                ],
+            }
+            for aspect, patterns in aspect_patterns.items():
+                for pattern in patterns:
                     match = re.search(pattern, response_text, re.IGNORECASE)
                     if match:
-                        score = float(match.group(1))
+                        scores[aspect] = float(match.group(1))
                         break
+                else:
+                    scores[aspect] = 0.0
+
+            # Get overall score
+            overall_patterns = [
+                r'overall.?score["\s:]+(\d+(?:\.\d+)?)',
+                r'Score global\s*:\s*(\d+(?:\.\d+)?)',
+                r'Overall:\s*(\d+(?:\.\d+)?)',
+                r'Score:\s*(\d+(?:\.\d+)?)'
+            ]
+
+            for pattern in overall_patterns:
+                match = re.search(pattern, response_text, re.IGNORECASE)
+                if match:
+                    score = float(match.group(1))
+                    break
 
-                if score is None:
-                    non_zero = [s for s in scores.values() if s > 0]
-                    score = sum(non_zero) / len(non_zero) if non_zero else 0.0
+            if score is None:
+                # Nothing recognizable in the response: keep the score out of the cache
+                usable = any(scores.values())
+                non_zero = [s for s in scores.values() if s > 0]
+                score = sum(non_zero) / len(non_zero) if non_zero else 0.0
 
-                # Get reason
-                reason_match = re.search(r'(?:reason|raison)["\s:=]+(.+)', response_text, re.IGNORECASE | re.DOTALL)
-                if reason_match:
-                    reason = reason_match.group(1).strip().strip('"').split('\n')[0][:200]
+            # Get reason
+            reason_match = re.search(r'(?:reason|raison)["\s:=]+(.+)', response_text, re.IGNORECASE | re.DOTALL)
+            if reason_match:
+                reason = reason_match.group(1).strip().strip('"').split('\n')[0][:200]
 
-            score = min(10.0, max(0.0, score))
-            return score, reason
+        score = min(10.0, max(0.0, score))
+        return score, reason, usable
+
+    def _parse_batch_score_response(self, response_text: str, count: int) -> Dict[int, Tuple[float, str]]:
+        """Map chunk ids (1..count) to (score, reason) from a JSON array reply; bad items are skipped."""
+        cleaned = self._strip_reasoning(response_text)
+        try:
+            data = json.loads(cleaned)
+        except json.JSONDecodeError:
+            array_start, array_end = cleaned.find('['), cleaned.rfind(']')
+            if array_start < 0 or array_end < array_start:
+                return {}
+            try:
+                data = json.loads(cleaned[array_start:array_end + 1])
+            except json.JSONDecodeError:
+                return {}
+
+        # Some models wrap the array: {"results": [...]}
+        if isinstance(data, dict):
+            data = next((value for value in data.values() if isinstance(value, list)), [])
+
+        results = {}
+        for item in data if isinstance(data, list) else []:
+            try:
+                chunk_id = int(item['id'])
+                score = min(10.0, max(0.0, float(item['overall_score'])))
+            except (KeyError, TypeError, ValueError):
+                continue
+            if 1 <= chunk_id <= count:
+                results[chunk_id] = (score, str(item.get('reason') or 'High viral potential')[:200])
+        return results
+
+    def _analyze_chunk_batch(self, texts: List[str], language: str = 'en') -> List[Tuple[float, str]]:
+        """Score several chunks with one LLM request, reusing cached scores.
+
+        Chunks missing from the reply (or all of them, if the request fails)
+        are scored again with single-chunk prompts.
+        """
+        results = [self._load_chunk_score(text, language, 'batch') for text in texts]
+        pending = [i for i, result in enumerate(results) if result is None]
+
+        if len(pending) > 1:
+            pending_texts = [texts[i] for i in pending]
+            try:
+                response_text = self._call_llm(
+                    self._build_batch_score_prompt(pending_texts, language),
+                    max_tokens=self._batch_max_tokens(len(pending)),
+                    schema=self.BATCH_SCORE_SCHEMA,
+                    schema_name='viral_scores',
+                )
+                replies = self._parse_batch_score_response(response_text, len(pending))
+            except Exception as e:
+                print(f"Batched scoring failed, falling back to single prompts: {e}")
+                replies = {}
+
+            for chunk_id, i in enumerate(pending, 1):
+                if chunk_id in replies:
+                    score, reason = replies[chunk_id]
+                    results[i] = (score, reason)
+                    self._save_chunk_score(texts[i], language, score, reason, 'batch')
+            missing = len(pending) - len(replies)
+            if replies and missing:
+                print(f"Batched reply missed {missing}/{len(pending)} chunks, scoring them one by one")
+
+        return [
+            result if result is not None else self._analyze_chunk(texts[i], language)
+            for i, result in enumerate(results)
+        ]
+
+    def _batch_max_tokens(self, count: int) -> int:
+        return self._max_output_tokens(ANALYSIS_BATCH_TOKENS_PER_CHUNK * count + 50)
+
+    def _is_reasoning_model(self) -> bool:
+        return self.provider == "openai" and self.model_name.startswith(('gpt-5', 'o1', 'o3', 'o4'))
+
+    def _max_output_tokens(self, reply_tokens: int) -> int:
+        """Output cap sized to the expected reply, plus the thinking budget of reasoning models."""
+        if self._is_reasoning_model():
+            return reply_tokens + LLM_REASONING_TOKENS
+        return reply_tokens
+
+    def _pack_chunks(self, chunks: List[Dict], max_workers: int) -> List[List[Dict]]:
+        """Group chunks into batched-scoring requests that fit the provider's context window.
+
+        Packs never exceed ANALYSIS_MAX_BATCH_CHUNKS and are kept small enough
+        that every worker still gets a request.
+        """
+        if not ANALYSIS_BATCH_SCORING or len(chunks) <= 1:
+            return [[chunk] for chunk in chunks]
+
+        max_chunks = min(ANALYSIS_MAX_BATCH_CHUNKS, -(-len(chunks) // max_workers))
+        # Rough 4 characters per token; the rubric and reply format take a fixed share.
+        budget = LLM_CONTEXT_TOKENS.get(self.provider, 8192) - ANALYSIS_BATCH_PROMPT_TOKENS
+
+        packs = []
+        current = []
+        used = 0
+        for chunk in chunks:
+            cost = len(chunk['text']) // 4 + ANALYSIS_BATCH_TOKENS_PER_CHUNK
+            if current and (len(current) >= max_chunks or used + cost > budget):
+                packs.append(current)
+                current = []
+                used = 0
+            current.append(chunk)
+            used += cost
+        if current:
+            packs.append(current)
+        return packs
+
+    def _strip_reasoning(self, text: str) -> str:
+        """Drop thinking/reasoning blocks that some models emit before their answer."""
+        cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
+        cleaned = re.sub(r'<reasoning>.*?</reasoning>', '', cleaned, flags=re.DOTALL)
+        return cleaned.strip()
 
-        except Exception as e:
-            print(f"Error analyzing chunk: {e}")
-            return 0.0, "Analysis failed"
-    
     def _extract_json(self, text: str) -> dict:
         """Robustly extract a JSON object from LLM output (handles thinking blocks, markdown, etc.)"""
         # Strip thinking/reasoning blocks that some models produce
-        cleaned = re.sub(r'<think>.*?</think>', '', text, flags=re.DOTALL)
-        cleaned = re.sub(r'<reasoning>.*?</reasoning>', '', cleaned, flags=re.DOTALL)
-        cleaned = cleaned.strip()
+        cleaned = self._strip_reasoning(text)
 
         # Try direct parse first
         try:
@@ -694,20 +1566,34 @@ Respond with ONLY valid JSON in this exact format:
 
         raise ValueError("No JSON object found in response")
 
-    def _call_ollama(self, prompt: str) -> str:
-        response = ollama.chat(
+    def _call_ollama(self, prompt: str, max_tokens: Optional[int] = None, schema: Optional[Dict] = None) -> str:
+        options = {'temperature': AI_TEMPERATURE, 'num_ctx': OLLAMA_NUM_CTX}
+        kwargs = {}
+        if schema:
+            kwargs['format'] = schema
+            # Only cap generation when the reply is constrained; free-form replies may think first
+            if max_tokens:
+                options['num_predict'] = max_tokens
+        response = get_ollama_pool().chat(
             model=self.model_name,
             messages=[{'role': 'user', 'content': prompt}],
-            options={'temperature': AI_TEMPERATURE}
+            options=options,
+            **kwargs
         )
         return response['message']['content']
     
-    def _call_openai(self, prompt: str) -> str:
+    def _call_openai(self, prompt: str, max_tokens: Optional[int] = None, schema: Optional[Dict] = None,
+                     schema_name: str = 'response') -> str:
         kwargs = {
             'model': self.model_name,
             'messages': [{'role': 'user', 'content': prompt}],
-            'max_completion_tokens': 2000,
+            'max_completion_tokens': max_tokens or 2000,
         }
+        if schema:
+            kwargs['response_format'] = {
+                'type': 'json_schema',
+                'json_schema': {'name': schema_name, 'schema': schema, 'strict': True},
+            }
         # Some models (e.g. gpt-5-mini) only support default temperature
         if AI_TEMPERATURE != 1.0:
             kwargs['temperature'] = AI_TEMPERATURE
@@ -721,18 +1607,34 @@ Respond with ONLY valid JSON in this exact format:
                 raise
         return response.choices[0].message.content
     
-    def _call_anthropic(self, prompt: str) -> str:
+    def _call_anthropic(self, prompt: str, max_tokens: Optional[int] = None, schema: Optional[Dict] = None,
+                        schema_name: str = 'response') -> str:
+        kwargs = {}
+        if schema:
+            # Forcing a single tool makes the reply its validated input object
+            kwargs['tools'] = [{
+                'name': schema_name,
+                'description': 'Record the answer.',
+                'input_schema': schema,
+            }]
+            kwargs['tool_choice'] = {'type': 'tool', 'name': schema_name}
         response = self.anthropic_client.messages.create(
             model=self.model_name,
             messages=[{'role': 'user', 'content': prompt}],
             temperature=AI_TEMPERATURE,
-            max_tokens=500
+            max_tokens=max_tokens or 500,
+            **kwargs
         )
+        for block in response.content:
+            if getattr(block, 'type', None) == 'tool_use':
+                return json.dumps(block.input)
         return response.content[0].text
     
     def refine_moments(self, moments: List[Dict], transcript: Dict) -> List[Dict]:
         """Refine moments to ensure complete sentences and coherent context"""
         refined_moments = []
+        # Built once; every moment below is refined with binary searches.
+        boundary_index = self._build_boundary_index(transcript)
         
         for moment in moments:
             # Store original times for subtitle alignment
@@ -743,7 +1645,8 @@ Respond with ONLY valid JSON in this exact format:
             start_time, end_time = self._find_sentence_boundaries(
                 transcript, 
                 moment['start'], 
-                moment['end']
+                moment['end'],
+                boundary_index
             )
             
             # The _find_sentence_boundaries method already handles duration constraints
@@ -752,64 +1655,90 @@ Respond with ONLY valid JSON in this exact format:
             moment['duration'] = end_time - start_time
             
             # Add context information for better understanding
-            moment['context'] = self._get_clip_context(transcript, start_time, end_time)
+            moment['context'] = self._get_clip_context(boundary_index['transcript'], start_time, end_time)
             
             refined_moments.append(moment)
         
-        return refined_moments
+        # Expanded to sentence boundaries, neighbouring moments can now cover the same speech
+        return self.suppress_overlapping_moments(refined_moments)
     
-    def _snap_to_word_boundary(self, transcript: Dict, time: float, boundary_type: str) -> float:
+    def _build_boundary_index(self, transcript: Dict) -> Dict:
+        """Precompute snap targets and sentence flags for one transcript in a single pass.
+
+        'start_times'/'end_times' are the sorted word starts/ends (segment bounds
+        for segments without words); 'sentence_start'/'sentence_end' hold the
+        _is_sentence_start/_is_sentence_end result of every segment.
+        """
+        index = build_transcript_index(transcript)
+        segments = index['segments']
+        start_times = []
+        end_times = []
+        sentence_start = []
+        sentence_end = []
+
+        for i, segment in enumerate(segments):
+            if segment.get('words'):
+                start_times.extend(word['start'] for word in segment['words'])
+                end_times.extend(word['end'] for word in segment['words'])
+            else:
+                start_times.append(segment['start'])
+                end_times.append(segment['end'])
+            text = segment['text'].strip()
+            sentence_start.append(self._is_sentence_start(text, i, segments))
+            sentence_end.append(self._is_sentence_end(text, i, segments))
+
+        start_times.sort()
+        end_times.sort()
+        return {
+            'transcript': index,
+            'start_times': start_times,
+            'end_times': end_times,
+            'sentence_start': sentence_start,
+            'sentence_end': sentence_end,
+        }
+
+    def _snap_to_word_boundary(self, transcript: Dict, time: float, boundary_type: str,
+                               boundary_index: Optional[Dict] = None) -> float:
         """Snap a time to the nearest word boundary to avoid cutting words"""
+        if boundary_index is None:
+            boundary_index = self._build_boundary_index(transcript)
+        # Word starts for start boundaries, word ends for end boundaries
+        times = boundary_index['start_times' if boundary_type == 'start' else 'end_times']
+
+        position = bisect_left(times, time)
         best_time = time
-        min_distance = float('inf')
-        
-        # Look through all segments
-        for segment in transcript['segments']:
-            # Check segment boundaries
-            if boundary_type == 'start':
-                # For start boundary, prefer word starts
-                if 'words' in segment and segment['words']:
-                    for word in segment['words']:
-                        word_start = word['start']
-                        distance = abs(word_start - time)
-                        if distance < min_distance and distance < 0.5:  # Within 0.5 seconds
-                            min_distance = distance
-                            best_time = word_start
-                else:
-                    # Fallback to segment start
-                    seg_start = segment['start']
-                    distance = abs(seg_start - time)
-                    if distance < min_distance and distance < 0.5:
-                        min_distance = distance
-                        best_time = seg_start
-            else:
-                # For end boundary, prefer word ends
-                if 'words' in segment and segment['words']:
-                    for word in segment['words']:
-                        word_end = word['end']
-                        distance = abs(word_end - time)
-                        if distance < min_distance and distance < 0.5:  # Within 0.5 seconds
-                            min_distance = distance
-                            best_time = word_end
-                else:
-                    # Fallback to segment end
-                    seg_end = segment['end']
-                    distance = abs(seg_end - time)
-                    if distance < min_distance and distance < 0.5:
-                        min_distance = distance
-                        best_time = seg_end
-        
+        min_distance = 0.5  # Only snap within 0.5 seconds
+        # On a tie the earlier boundary wins, as in transcript order.
+        for candidate in times[max(0, position - 1):position + 1]:
+            distance = abs(candidate - time)
+            if distance < min_distance:
+                min_distance = distance
+                best_time = candidate
+
         return best_time
     
-    def _find_sentence_boundaries(self, transcript: Dict, start_time: float, end_time: float) -> Tuple[float, float]:
+    def _find_sentence_boundaries(self, transcript: Dict, start_time: float, end_time: float,
+                                  boundary_index: Optional[Dict] = None) -> Tuple[float, float]:
         """Find natural sentence boundaries for coherent clips with adaptive duration"""
-        segments = transcript['segments']
+        if boundary_index is None:
+            boundary_index = self._build_boundary_index(transcript)
+        index = boundary_index['transcript']
+        segments = index['segments']
+        sentence_start = boundary_index['sentence_start']
+        sentence_end = boundary_index['sentence_end']
 
         # Find segments that overlap with our time range
-        relevant_segments = []
-        for i, segment in enumerate(segments):
-            if segment['end'] >= start_time - 8 and segment['start'] <= end_time + 8:
-                relevant_segments.append((i, segment))
+        window_start = start_time - 8
+        window_end = end_time + 8
+        if index.segments_sorted:
+            hi = bisect_right(index.segment_starts, window_end)
+            lo = bisect_left(index.segment_max_ends, window_start, 0, hi)
+        else:
+            lo, hi = 0, len(segments)
+        relevant_segments = [
+            (i, segments[i]) for i in range(lo, hi)
+            if segments[i]['end'] >= window_start and segments[i]['start'] <= window_end
+        ]
 
         if not relevant_segments:
             return start_time, end_time
@@ -839,10 +1768,9 @@ Respond with ONLY valid JSON in this exact format:
         new_start = start_time
         for i in range(start_segment_idx, -1, -1):
             idx, seg = relevant_segments[i]
-            text = seg['text'].strip()
 
             # Check if this segment starts a new sentence/thought
-            if self._is_sentence_start(text, idx, segments):
+            if sentence_start[idx]:
                 new_start = seg['start']
                 break
 
@@ -857,13 +1785,12 @@ Respond with ONLY valid JSON in this exact format:
 
         for i in range(end_segment_idx, len(relevant_segments)):
             idx, seg = relevant_segments[i]
-            text = seg['text'].strip()
 
             # Calculate current duration
             current_duration = seg['end'] - new_start
 
             # Check if this segment ends a sentence/thought
-            if self._is_sentence_end(text, idx, segments):
+            if sentence_end[idx]:
                 # Only use this end if it creates a reasonable duration
                 if MIN_CLIP_LENGTH <= current_duration <= MAX_CLIP_LENGTH:
                     new_end = seg['end']
@@ -884,8 +1811,7 @@ Respond with ONLY valid JSON in this exact format:
                 # Try to end at previous segment if it was a sentence boundary
                 if i > end_segment_idx:
                     prev_idx, prev_seg = relevant_segments[i-1]
-                    prev_text = prev_seg['text'].strip()
-                    if self._is_sentence_end(prev_text, prev_idx, segments):
+                    if sentence_end[prev_idx]:
                         new_end = prev_seg['end']
                         found_natural_end = True
                 break
@@ -895,8 +1821,8 @@ Respond with ONLY valid JSON in this exact format:
         final_end = min(transcript['duration'], new_end)
 
         # Snap to word boundaries to avoid cutting mid-word
-        final_start = self._snap_to_word_boundary(transcript, final_start, 'start')
-        final_end = self._snap_to_word_boundary(transcript, final_end, 'end')
+        final_start = self._snap_to_word_boundary(transcript, final_start, 'start', boundary_index)
+        final_end = self._snap_to_word_boundary(transcript, final_end, 'end', boundary_index)
 
         # Adaptive duration handling
         duration = final_end - final_start
@@ -915,8 +1841,8 @@ Respond with ONLY valid JSON in this exact format:
                 final_start = max(0, final_start - start_extension)
 
             # Re-snap after extension
-            final_start = self._snap_to_word_boundary(transcript, final_start, 'start')
-            final_end = self._snap_to_word_boundary(transcript, final_end, 'end')
+            final_start = self._snap_to_word_boundary(transcript, final_start, 'start', boundary_index)
+            final_end = self._snap_to_word_boundary(transcript, final_end, 'end', boundary_index)
 
         elif duration > MAX_CLIP_LENGTH:
             # If too long, trim to MAX_CLIP_LENGTH, preferring to keep the core moment
@@ -929,8 +1855,8 @@ Respond with ONLY valid JSON in this exact format:
             final_end -= end_trim
 
             # Re-snap after trimming
-            final_start = self._snap_to_word_boundary(transcript, final_start, 'start')
-            final_end = self._snap_to_word_boundary(transcript, final_end, 'end')
+            final_start = self._snap_to_word_boundary(transcript, final_start, 'start', boundary_index)
+            final_end = self._snap_to_word_boundary(transcript, final_end, 'end', boundary_index)
 
         # If we found a natural ending and the clip is within bounds, prefer it
         # even if it's not exactly at the boundaries
@@ -1032,26 +1958,15 @@ Respond with ONLY valid JSON:
 {{"title": "Catchy title (max 80 chars)", "description": "2-3 sentence description with relevant #hashtags"}}"""
 
             try:
-                if self.provider == "ollama":
-                    response_text = self._call_ollama(prompt)
-                elif self.provider == "openai":
-                    response_text = self._call_openai(prompt)
-                elif self.provider == "anthropic":
-                    response_text = self._call_anthropic(prompt)
-                else:
-                    raise ValueError(f"Unknown provider: {self.provider}")
+                response_text = self._call_llm(
+                    prompt,
+                    max_tokens=self._max_output_tokens(LLM_METADATA_MAX_TOKENS),
+                    schema=self.METADATA_SCHEMA,
+                    schema_name='clip_metadata',
+                )
 
-                # Try JSON parsing
                 try:
-                    json_text = response_text.strip()
-                    if '```' in json_text:
-                        json_match = re.search(r'```(?:json)?\s*(\{.*?\})\s*```', json_text, re.DOTALL)
-                        if json_match:
-                            json_text = json_match.group(1)
-                    brace_match = re.search(r'\{[^{}]*\}', json_text, re.DOTALL)
-                    if brace_match:
-                        json_text = brace_match.group(0)
-                    parsed = json.loads(json_text)
+                    parsed = self._extract_json(response_text)
                     moment['title'] = parsed.get('title', reason[:80])[:80]
                     moment['description'] = parsed.get('description', reason)[:500]
                 except (json.JSONDecodeError, ValueError, AttributeError):
@@ -1067,15 +1982,9 @@ Respond with ONLY valid JSON:
 
     def _get_clip_context(self, transcript: Dict, start_time: float, end_time: float) -> str:
         """Get the full text content of a clip for context"""
-        segments = transcript['segments']
-        clip_text = []
-        
-        for segment in segments:
-            # Include segments that overlap with our clip
-            if segment['start'] < end_time and segment['end'] > start_time:
-                clip_text.append(segment['text'].strip())
-        
-        return ' '.join(clip_text)
+        # Include segments that overlap with our clip
+        segments = build_transcript_index(transcript).segments_in_range(start_time, end_time)
+        return ' '.join(segment['text'].strip() for segment in segments)
 
 
 if __name__ == "__main__":
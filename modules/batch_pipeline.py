@@ -0,0 +1,93 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+
+from config import BATCH_MAX_IN_FLIGHT
+
+# (name, function(state) -> state, worker count)
+Stage = Tuple[str, Callable[[Dict[str, Any]], Dict[str, Any]], int]
+
+
+class BatchPipeline:
+    """Runs many items through ordered stages, each stage with its own worker pool.
+
+    Consecutive items overlap: while one video is transcribed the next ones
+    download and the previous one renders. Sources are pulled lazily, with at
+    most max_in_flight items between the first and the last stage. A failing
+    stage ends that item only; its result records the stage and the error.
+    """
+
+    def __init__(self, stages: List[Stage], max_in_flight: int = BATCH_MAX_IN_FLIGHT,
+                 on_result: Optional[Callable[[Dict[str, Any]], None]] = None):
+        if not stages:
+            raise ValueError("At least one stage is required")
+        self.stages = stages
+        self.max_in_flight = max(1, max_in_flight)
+        self.on_result = on_result
+
+    def run(self, sources: Iterable[Any]) -> List[Dict[str, Any]]:
+        """Process every source; returns one result per source, in source order.
+
+        A result is {'source', 'status': 'ok' | 'failed', 'state', 'stage', 'error'},
+        where 'stage' names the failed stage and 'state' is the last successful state.
+        """
+        executors = [
+            ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=f"batch-{name}")
+            for name, _, workers in self.stages
+        ]
+        slots = threading.Semaphore(self.max_in_flight)
+        results: Dict[int, Dict[str, Any]] = {}
+        lock = threading.Lock()
+
+        def finish(index, result):
+            with lock:
+                results[index] = result
+            if self.on_result:
+                try:
+                    self.on_result(result)
+                except Exception as e:
+                    print(f"Warning: batch result callback failed: {e}")
+            slots.release()
+
+        def advance(index, source, state, stage_index):
+            if stage_index == len(self.stages):
+                finish(index, {'source': source, 'status': 'ok', 'state': state, 'stage': None, 'error': None})
+                return
+            name, function, _ = self.stages[stage_index]
+            future = executors[stage_index].submit(function, state)
+
+            def done(completed):
+                try:
+                    next_state = completed.result()
+                except Exception as e:
+                    finish(index, {'source': source, 'status': 'failed', 'state': state,
+                                   'stage': name, 'error': str(e)})
+                    return
+                advance(index, source, next_state, stage_index + 1)
+
+            future.add_done_callback(done)
+
+        submitted = 0
+        iterator = iter(sources)
+        try:
+            while True:
+                # Take a slot before pulling the next source, so expansion stays lazy
+                slots.acquire()
+                try:
+                    source = next(iterator)
+                except StopIteration:
+                    slots.release()
+                    break
+                except BaseException:
+                    slots.release()
+                    raise
+                advance(submitted, source, {'source': source}, 0)
+                submitted += 1
+        finally:
+            # Wait for everything already started, even if expanding the sources failed
+            for _ in range(self.max_in_flight):
+                slots.acquire()
+            for executor in executors:
+                executor.shutdown(wait=True)
+
+        return [results[index] for index in range(submitted)]
@@ -2,73 +2,73 @@ import os
 import json
 from pathlib import Path
 import yt_dlp
-from typing import Dict, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 import re
 
-from config import DOWNLOADS_DIR, VIDEO_QUALITY, MAX_VIDEO_SIZE_MB
-from utils.helpers import cleanup_downloads
+from config import DOWNLOADS_DIR, VIDEO_QUALITY, MAX_VIDEO_SIZE_MB, VIDEO_RANGE_PADDING
+from modules.youtube_signals import extract_signals
+from utils.download_store import DownloadStore
 
 
 class YouTubeDownloader:
     def __init__(self, output_dir: Path = DOWNLOADS_DIR):
         self.output_dir = output_dir
         self.output_dir.mkdir(exist_ok=True)
-        # Auto-clean downloads older than 24 hours
-        cleaned = cleanup_downloads(self.output_dir)
+        # Downloads are reused by video id and format; disk use is capped by LRU eviction
+        self.store = DownloadStore(self.output_dir)
+        # Files outside the store (uploads, older downloads) only expire by age
+        cleaned = self.store.sweep_untracked()
         if cleaned:
-            print(f"Cleaned up {cleaned} old download(s)")
+            print(f"Cleaned up {cleaned} old untracked download(s)")
         
     def _sanitize_filename(self, filename: str) -> str:
         filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
         filename = filename.strip('. ')
         return filename[:200]  
     
-    def download(self, url: str, quality: str = VIDEO_QUALITY, progress_callback=None) -> Dict[str, any]:
+    def download(self, url: str, quality: str = VIDEO_QUALITY, progress_callback=None,
+                 lease: bool = False) -> Dict[str, any]:
+        """Download (or reuse) the video; with lease, its files are kept from eviction until release."""
         video_id = self._extract_video_id(url)
         if not video_id:
             raise ValueError("Invalid YouTube URL")
-        
-        # Parse desired height (e.g., "720p" -> 720). Allow "auto" to skip constraint.
-        try:
-            target_height = int(quality.lower().replace('p', '')) if quality and quality.lower() != 'auto' else None
-        except Exception:
-            target_height = None
 
-        # Robust format chain: try separate streams first, fall back to muxed.
-        # merge_output_format ensures ffmpeg merges into mp4 when needed.
-        if target_height:
-            format_expr = (
-                f"bestvideo[height<=?{target_height}]+bestaudio/best[height<=?{target_height}]/"
-                f"bestvideo+bestaudio/best"
-            )
-        else:
-            format_expr = "bestvideo+bestaudio/best"
+        format_key = self._format_expr(quality)
+        cached = self._reuse(video_id, format_key, progress_callback, lease)
+        if cached is not None:
+            return cached
 
-        ydl_opts = {
-            'format': format_expr,
-            'merge_output_format': 'mp4',
-            'outtmpl': str(self.output_dir / '%(title)s_%(id)s.%(ext)s'),
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-            'ignoreerrors': False,
-            'no_playlist': True,
-            # Use alternative clients to avoid YouTube 403 errors
-            'extractor_args': {
-                'youtube': {
-                    'player_client': ['ios,mweb'],
-                },
-            },
-        }
+        metadata = self._fetch_video(url, video_id, quality, progress_callback)
+        self._remember(video_id, format_key, metadata, lease)
+        return metadata
+
+    def release(self, video_id: Optional[str]):
+        """End a lease taken by download or download_audio (no-op for local files without an id)."""
+        if video_id:
+            self.store.release(video_id)
 
+    def lookup(self, url: str, quality: str = VIDEO_QUALITY) -> Optional[Dict[str, Any]]:
+        """Metadata of an already downloaded video at this quality, or None."""
+        video_id = self._extract_video_id(url)
+        return self.store.get(video_id, self._format_expr(quality)) if video_id else None
+
+    def _reuse(self, video_id: str, format_key: str, progress_callback=None,
+               lease: bool = False) -> Optional[Dict[str, Any]]:
+        cached = self.store.get(video_id, format_key, lease=lease)
+        if cached is None:
+            return None
+        print(f"Reusing download: {Path(cached['filepath']).name}")
         if progress_callback:
-            def _hook(d):
-                if d['status'] == 'downloading':
-                    total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
-                    downloaded = d.get('downloaded_bytes', 0)
-                    pct = (downloaded / total * 100) if total else 0
-                    progress_callback(pct, downloaded, total)
-            ydl_opts['progress_hooks'] = [_hook]
+            size = Path(cached['filepath']).stat().st_size
+            progress_callback(100.0, size, size)
+        return cached
+
+    def _remember(self, video_id: str, format_key: str, metadata: Dict[str, Any], lease: bool = False):
+        filepath = Path(metadata['filepath'])
+        self.store.put(video_id, format_key, metadata, [filepath, filepath.with_suffix('.json')], lease=lease)
+
+    def _fetch_video(self, url: str, video_id: str, quality: str, progress_callback=None) -> Dict[str, Any]:
+        ydl_opts = self._ydl_options(self._format_expr(quality), progress_callback=progress_callback)
 
         try:
             with yt_dlp.YoutubeDL(ydl_opts) as ydl:
@@ -77,15 +77,7 @@ class YouTubeDownloader:
                 duration = info_meta.get('duration', 0)
 
                 info_dict = ydl.extract_info(url, download=True)
-                filename = ydl.prepare_filename(info_dict)
-                filepath = Path(filename)
-
-                if not filepath.exists():
-                    possible_files = list(self.output_dir.glob(f"*{video_id}*"))
-                    if possible_files:
-                        filepath = possible_files[0]
-                    else:
-                        raise FileNotFoundError(f"Downloaded file not found: {filename}")
+                filepath = self._downloaded_path(ydl, info_dict, f"_{video_id}")
 
                 metadata = {
                     'video_id': video_id,
@@ -96,6 +88,7 @@ class YouTubeDownloader:
                     'uploader': info_dict.get('uploader', ''),
                     'view_count': info_dict.get('view_count', 0),
                     'like_count': info_dict.get('like_count', 0),
+                    **extract_signals(info_dict),
                     'filepath': str(filepath),
                     'url': url
                 }
@@ -123,14 +116,7 @@ class YouTubeDownloader:
                     title = info_meta.get('title', 'Unknown')
                     duration = info_meta.get('duration', 0)
                     info_dict = ydl.extract_info(url, download=True)
-                    filename = ydl.prepare_filename(info_dict)
-                    filepath = Path(filename)
-                    if not filepath.exists():
-                        possible_files = list(self.output_dir.glob(f"*{video_id}*"))
-                        if possible_files:
-                            filepath = possible_files[0]
-                        else:
-                            raise FileNotFoundError(f"Downloaded file not found: {filename}")
+                    filepath = self._downloaded_path(ydl, info_dict, f"_{video_id}")
                     metadata = {
                         'video_id': video_id,
                         'title': title,
@@ -140,6 +126,7 @@ class YouTubeDownloader:
                         'uploader': info_dict.get('uploader', ''),
                         'view_count': info_dict.get('view_count', 0),
                         'like_count': info_dict.get('like_count', 0),
+                        **extract_signals(info_dict),
                         'filepath': str(filepath),
                         'url': url
                     }
@@ -152,7 +139,228 @@ class YouTubeDownloader:
         except Exception as e:
             raise Exception(f"Unexpected error: {str(e)}")
 
-    
+
+    def _format_expr(self, quality: str) -> str:
+        # Parse desired height (e.g., "720p" -> 720). Allow "auto" to skip constraint.
+        try:
+            target_height = int(quality.lower().replace('p', '')) if quality and quality.lower() != 'auto' else None
+        except Exception:
+            target_height = None
+
+        # Robust format chain: try separate streams first, fall back to muxed.
+        # merge_output_format ensures ffmpeg merges into mp4 when needed.
+        if target_height:
+            return (
+                f"bestvideo[height<=?{target_height}]+bestaudio/best[height<=?{target_height}]/"
+                f"bestvideo+bestaudio/best"
+            )
+        return "bestvideo+bestaudio/best"
+
+    def _ydl_options(self, format_expr: str, outtmpl: str = '%(title)s_%(id)s.%(ext)s',
+                     progress_callback=None, progress_hooks: Optional[List[Callable]] = None) -> Dict[str, Any]:
+        ydl_opts = {
+            'format': format_expr,
+            'merge_output_format': 'mp4',
+            'outtmpl': str(self.output_dir / outtmpl),
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': False,
+            'ignoreerrors': False,
+            'no_playlist': True,
+            # Use alternative clients to avoid YouTube 403 errors
+            'extractor_args': {
+                'youtube': {
+                    'player_client': ['ios,mweb'],
+                },
+            },
+        }
+
+        if progress_callback:
+            def _hook(d):
+                if d['status'] == 'downloading':
+                    total = d.get('total_bytes') or d.get('total_bytes_estimate') or 0
+                    downloaded = d.get('downloaded_bytes', 0)
+                    pct = (downloaded / total * 100) if total else 0
+                    progress_callback(pct, downloaded, total)
+            ydl_opts['progress_hooks'] = [_hook]
+        if progress_hooks:
+            ydl_opts['progress_hooks'] = ydl_opts.get('progress_hooks', []) + list(progress_hooks)
+        return ydl_opts
+
+    def _downloaded_path(self, ydl, info_dict: Dict, name_suffix: str) -> Path:
+        """The file yt-dlp wrote, whose name ends in name_suffix plus one extension."""
+        filepath = Path(ydl.prepare_filename(info_dict))
+        if filepath.exists():
+            return filepath
+        # Merged or post-processed outputs can end up with another extension
+        pattern = re.compile(rf".*{re.escape(name_suffix)}\.\w+")
+        possible_files = sorted(
+            path for path in self.output_dir.glob(f"*{name_suffix}.*")
+            if pattern.fullmatch(path.name) and path.suffix not in ('.json', '.part')
+        )
+        if possible_files:
+            return possible_files[0]
+        raise FileNotFoundError(f"Downloaded file not found: {filepath}")
+
+    def download_audio(self, url: str, progress_callback=None,
+                       progress_hooks: Optional[List[Callable]] = None, lease: bool = False) -> Dict[str, Any]:
+        """Download only the audio stream, enough to transcribe and analyze.
+
+        The video itself is fetched later with download_ranges, for the selected
+        moments only, or alongside (see modules.progressive_ingest). Raw yt-dlp
+        progress_hooks see every status dict. The returned metadata has 'audio_only': True.
+        A lease covers the ranges later downloaded for the same video as well.
+        """
+        video_id = self._extract_video_id(url)
+        if not video_id:
+            raise ValueError("Invalid YouTube URL")
+
+        cached = self._reuse(video_id, 'audio', progress_callback, lease)
+        if cached is not None:
+            return cached
+
+        ydl_opts = self._ydl_options(
+            'bestaudio/best', outtmpl='%(title)s_%(id)s.audio.%(ext)s',
+            progress_callback=progress_callback, progress_hooks=progress_hooks
+        )
+        del ydl_opts['merge_output_format']
+
+        try:
+            with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                info_dict = ydl.extract_info(url, download=True)
+                filepath = self._downloaded_path(ydl, info_dict, f"_{video_id}.audio")
+        except Exception as e:
+            raise Exception(f"Audio download failed: {str(e)}")
+
+        metadata = {
+            'video_id': video_id,
+            'title': info_dict.get('title', 'Unknown'),
+            'duration': info_dict.get('duration', 0),
+            'description': info_dict.get('description', ''),
+            'upload_date': info_dict.get('upload_date', ''),
+            'uploader': info_dict.get('uploader', ''),
+            'view_count': info_dict.get('view_count', 0),
+            'like_count': info_dict.get('like_count', 0),
+            **extract_signals(info_dict),
+            'filepath': str(filepath),
+            'url': url,
+            'audio_only': True,
+        }
+        with open(filepath.with_suffix('.json'), 'w', encoding='utf-8') as f:
+            json.dump(metadata, f, indent=2, ensure_ascii=False)
+        self._remember(video_id, 'audio', metadata, lease)
+        return metadata
+
+    def plan_ranges(self, spans: List[Tuple[float, float]], padding: float = VIDEO_RANGE_PADDING,
+                    duration: float = 0) -> List[Tuple[float, float]]:
+        """Pad (start, end) spans and merge the ones that overlap, sorted by start."""
+        merged = []
+        for start, end in sorted(spans):
+            start = max(0.0, start - padding)
+            end = min(duration, end + padding) if duration else end + padding
+            if merged and start <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def download_ranges(self, url: str, spans: List[Tuple[float, float]], quality: str = VIDEO_QUALITY,
+                        padding: float = VIDEO_RANGE_PADDING, duration: float = 0) -> List[Dict[str, Any]]:
+        """Download only the given time spans of the video, plus padding.
+
+        Returns one {'start', 'end', 'filepath'} dict per downloaded range; times
+        inside a range file are relative to its 'start'
+        (see VideoProcessor.extract_clips_from_ranges).
+        """
+        video_id = self._extract_video_id(url)
+        if not video_id:
+            raise ValueError("Invalid YouTube URL")
+
+        ranges = []
+        for start, end in self.plan_ranges(spans, padding, duration):
+            tag = f"{int(start * 1000)}-{int(end * 1000)}"
+            format_key = f"{self._format_expr(quality)}|{tag}"
+            cached = self.store.get(video_id, format_key)
+            if cached is not None:
+                ranges.append(cached)
+                continue
+
+            ydl_opts = self._ydl_options(self._format_expr(quality), outtmpl=f'%(title)s_%(id)s.{tag}.%(ext)s')
+            # Re-encode around the cuts so each file starts exactly at `start`
+            ydl_opts['download_ranges'] = yt_dlp.utils.download_range_func(None, [(start, end)])
+            ydl_opts['force_keyframes_at_cuts'] = True
+            try:
+                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+                    info_dict = ydl.extract_info(url, download=True)
+                    filepath = self._downloaded_path(ydl, info_dict, f"_{video_id}.{tag}")
+            except Exception as e:
+                raise Exception(f"Range download failed ({start:.1f}s-{end:.1f}s): {str(e)}")
+            ranges.append({'start': start, 'end': end, 'filepath': str(filepath)})
+            self.store.put(video_id, format_key, ranges[-1], [filepath])
+
+        total = sum(item['end'] - item['start'] for item in ranges)
+        print(f"Downloaded {len(ranges)} video range(s), {total:.0f}s in total")
+        return ranges
+
+    def iter_batch_urls(self, source: str,
+                        on_error: Optional[Callable[[str, Exception], None]] = None) -> Iterator[str]:
+        """Video URLs of a playlist or channel URL, or of a manifest file with one URL per line.
+
+        Entries are fetched page by page as they are consumed; nested playlists
+        (channel tabs) are expanded and repeated videos are skipped. With
+        on_error, a source that cannot be expanded is passed to on_error(url, error)
+        and the remaining sources are still expanded; otherwise the error is raised.
+        """
+        seen = set()
+        manifest = Path(source)
+        if manifest.is_file():
+            with open(manifest, 'r', encoding='utf-8') as f:
+                lines = [line.strip() for line in f]
+            urls = (line for line in lines if line and not line.startswith('#'))
+        else:
+            urls = iter([source])
+
+        for url in urls:
+            try:
+                for video_url in self._expand_url(url):
+                    video_id = self._extract_video_id(video_url)
+                    if video_id in seen:
+                        continue
+                    seen.add(video_id)
+                    yield video_url
+            except Exception as e:
+                if on_error is None:
+                    raise
+                on_error(url, e)
+
+    def _expand_url(self, url: str) -> Iterator[str]:
+        if re.search(r'(?:watch\?v=|youtu\.be/|/shorts/|/embed/|/live/)[0-9A-Za-z_-]{11}', url) and 'list=' not in url:
+            yield url
+            return
+
+        ydl_opts = {
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': 'in_playlist',
+            'lazy_playlist': True,
+            'ignoreerrors': True,
+        }
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            info = ydl.extract_info(url, download=False)
+            if not info:
+                raise Exception(f"Could not expand batch source: {url}")
+            if info.get('_type') not in ('playlist', 'multi_video'):
+                yield info.get('webpage_url') or url
+                return
+            for entry in info.get('entries') or []:
+                if not entry:
+                    continue
+                if entry.get('_type') == 'playlist' or entry.get('ie_key') == 'YoutubeTab':
+                    # Channel tabs (videos, shorts, ...) are playlists themselves
+                    yield from self._expand_url(entry.get('url') or entry.get('webpage_url'))
+                elif entry.get('id'):
+                    yield f"https://www.youtube.com/watch?v={entry['id']}"
+
     def _extract_video_id(self, url: str) -> Optional[str]:
         patterns = [
             r'(?:v=|\/)([0-9A-Za-z_-]{11}).*',
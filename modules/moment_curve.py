@@ -0,0 +1,127 @@
+from typing import List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def _accumulate(windows: Sequence[Tuple[float, float, float]], duration: float,
+                resolution: float) -> Tuple[np.ndarray, np.ndarray]:
+    """Per-bin sums of (coverage * score) and of coverage over all windows."""
+    bins = max(1, int(np.ceil(duration / resolution)))
+    totals = np.zeros(bins)
+    coverage = np.zeros(bins)
+    edges = np.arange(bins + 1) * resolution
+    for start, end, score in windows:
+        first = max(0, int(start // resolution))
+        last = min(bins, int(np.ceil(end / resolution)))
+        if last <= first:
+            continue
+        overlap = np.minimum(edges[first + 1:last + 1], end) - np.maximum(edges[first:last], start)
+        overlap = np.clip(overlap, 0.0, None) / resolution
+        totals[first:last] += overlap * score
+        coverage[first:last] += overlap
+    return totals, coverage
+
+
+def score_curve(windows: Sequence[Tuple[float, float, float]], duration: float,
+                resolution: float = 1.0) -> np.ndarray:
+    """Interest per `resolution` seconds from overlapping (start, end, score) windows.
+
+    Each bin takes the coverage-weighted mean score of the windows over it,
+    weighted by how much of the bin each window covers. Bins no scored window
+    reaches (e.g. skipped by the prefilter) stay at 0: nothing is known about them.
+    """
+    totals, coverage = _accumulate(windows, duration, resolution)
+    curve = np.zeros(len(totals))
+    covered = coverage > 0
+    curve[covered] = totals[covered] / coverage[covered]
+    return curve
+
+
+def covered_bins(windows: Sequence[Tuple[float, float, float]], duration: float,
+                 resolution: float = 1.0) -> np.ndarray:
+    """Boolean mask of the score_curve bins that at least one scored window reaches."""
+    return _accumulate(windows, duration, resolution)[1] > 0
+
+
+def select_intervals(curve: np.ndarray, starts: Sequence[float], ends: Sequence[float],
+                     min_length: float, max_length: float, baseline: float, max_count: int,
+                     resolution: float = 1.0, covered: Optional[np.ndarray] = None,
+                     min_coverage: float = 0.0) -> List[Tuple[float, float, float]]:
+    """Best non-overlapping intervals for a score curve as (start, end, mean score), by start.
+
+    Candidates pair every allowed start with every allowed end between
+    min_length and max_length later. An interval is worth the area of the
+    curve above `baseline` (prefix sums make each one O(1)); a dynamic program
+    over candidates sorted by end picks at most max_count of them with the
+    largest total, so clips grow only while the content stays interesting.
+    With a `covered` mask (see covered_bins), intervals with less than
+    min_coverage of their length under scored windows are not candidates.
+    """
+    starts = np.unique(np.asarray(starts, dtype=np.float64))
+    ends = np.unique(np.asarray(ends, dtype=np.float64))
+    if not len(starts) or not len(ends) or max_count < 1:
+        return []
+
+    # Area under the piecewise-constant curve up to any time
+    grid = np.arange(len(curve) + 1) * resolution
+    area = np.concatenate([[0.0], np.cumsum(curve) * resolution])
+
+    def area_until(times):
+        return np.interp(times, grid, area)
+
+    # Every end within [start + min_length, start + max_length] of each start
+    lo = np.searchsorted(ends, starts + min_length, side='left')
+    hi = np.searchsorted(ends, starts + max_length, side='right')
+    counts = np.maximum(hi - lo, 0)
+    if not counts.sum():
+        return []
+    cand_starts = np.repeat(starts, counts)
+    offsets = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    cand_ends = ends[np.repeat(lo, counts) + offsets]
+    lengths = cand_ends - cand_starts
+    gains = area_until(cand_ends) - area_until(cand_starts) - baseline * lengths
+
+    keep = gains > 0
+    if covered is not None:
+        covered_area = np.concatenate([[0.0], np.cumsum(covered) * resolution])
+        covered_length = np.interp(cand_ends, grid, covered_area) - np.interp(cand_starts, grid, covered_area)
+        keep &= covered_length >= min_coverage * lengths
+    cand_starts, cand_ends, gains = cand_starts[keep], cand_ends[keep], gains[keep]
+    if not len(gains):
+        return []
+    order = np.argsort(cand_ends, kind='stable')
+    cand_starts, cand_ends, gains = cand_starts[order], cand_ends[order], gains[order]
+
+    # best[c][i]: largest total of at most c intervals among the first i candidates;
+    # previous[i]: how many candidates end before candidate i starts
+    count = len(gains)
+    previous = np.searchsorted(cand_ends, cand_starts, side='right')
+    best = [np.zeros(count + 1)]
+    for _ in range(max_count):
+        take = best[-1][previous] + gains
+        row = np.empty(count + 1)
+        row[0] = 0.0
+        row[1:] = np.maximum.accumulate(np.maximum(best[-1][1:], take))
+        best.append(row)
+        if row[-1] <= best[-2][-1]:
+            break
+
+    chosen = []
+    level, position = len(best) - 1, count
+    while level > 0 and position > 0:
+        if best[level][position] == best[level][position - 1]:
+            position -= 1
+        elif best[level][position] == best[level - 1][position]:
+            level -= 1
+        else:
+            index = position - 1
+            chosen.append(index)
+            position = previous[index]
+            level -= 1
+
+    intervals = []
+    for index in sorted(chosen, key=lambda i: cand_starts[i]):
+        start, end = float(cand_starts[index]), float(cand_ends[index])
+        mean = float((area_until(end) - area_until(start)) / (end - start))
+        intervals.append((start, end, mean))
+    return intervals
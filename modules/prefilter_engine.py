@@ -0,0 +1,240 @@
+import re
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional
+
+import numpy as np
+
+NUMBER_PATTERN = re.compile(r'\b\d{2,}\b|[$€£%]')
+QUESTION_WORDS = frozenset({'why', 'how', 'what', 'who', 'when', 'pourquoi', 'comment', 'quoi', 'qui', 'quand'})
+_NON_WORD = re.compile(r"[^\w\s']", re.UNICODE)
+_SPACES = re.compile(r'\s+')
+
+# Segment separator of the joined transcript: not a word character, not whitespace, and
+# kept by normalization, so matches never cross it unless a pattern allows it.
+_SEPARATOR = '\x00'
+_NON_WORD_KEEP_SEPARATOR = re.compile(r"[^\w\s'\x00]", re.UNICODE)
+_TOKEN = re.compile(r'[^\s\x00]+')
+_NUMBER_CANDIDATE = re.compile(r'\d\d|[$€£%]')
+
+
+def normalize_prefilter_text(text: str) -> str:
+    """Lowercase, punctuation to spaces, single spaces; what keywords and phrases are matched on."""
+    return _SPACES.sub(' ', _NON_WORD.sub(' ', text.lower())).strip()
+
+
+@lru_cache(maxsize=1)
+def _whitespace_codepoints() -> np.ndarray:
+    # Every str.isspace() character (what \s and str.split() use) is below U+3001
+    return np.array([code for code in range(0x3001) if chr(code).isspace()], dtype=np.uint32)
+
+
+def _prefix(values: np.ndarray) -> np.ndarray:
+    """Prefix sums along the first axis with a leading zero row: window [i, j) is sums[j] - sums[i]."""
+    sums = np.zeros((len(values) + 1,) + values.shape[1:], dtype=np.int64)
+    np.cumsum(values, axis=0, out=sums[1:])
+    return sums
+
+
+def _codepoints(text: str) -> np.ndarray:
+    return np.frombuffer(text.encode('utf-32-le'), dtype=np.uint32)
+
+
+def _piece_bounds(codepoints: np.ndarray, count: int):
+    """[begin, end) offsets of the `count` separator-joined pieces."""
+    separators = np.flatnonzero(codepoints == 0)
+    if len(separators) != count - 1:
+        raise ValueError("Segment text contains the separator character")
+    ends = np.append(separators, len(codepoints)).astype(np.int64)
+    begins = np.insert(separators + 1, 0, 0).astype(np.int64)
+    return begins, ends
+
+
+class SegmentPrefilter:
+    """Heuristic prefilter features for many chunks of one transcript at once.
+
+    The segment texts are joined once, and normalization, tokenization, counting
+    and phrase matching run over the whole transcript as a few regex and NumPy
+    passes. Per-segment results become prefix-sum arrays, so a chunk (a
+    contiguous run of segments whose text is their ' '-join) costs a few array
+    lookups, and its features are identical to scoring the chunk text alone.
+    """
+
+    def __init__(self, segments: List[Dict], keywords: Iterable[str], phrases: Iterable[str]):
+        self.segments = segments
+        self.positions = {id(segment): index for index, segment in enumerate(segments)}
+        count = len(segments)
+        indices = np.arange(count, dtype=np.int64)
+        whitespace = _whitespace_codepoints()
+
+        raw = _SEPARATOR.join(segment['text'] for segment in segments)
+        normalized = _NON_WORD_KEEP_SEPARATOR.sub(' ', raw.lower())
+        raw_codes = _codepoints(raw)
+        normalized_codes = _codepoints(normalized)
+        raw_begins, raw_ends = _piece_bounds(raw_codes, count) if count else (indices, indices)
+        self.text_begins, self.text_ends = (
+            _piece_bounds(normalized_codes, count) if count else (indices, indices)
+        )
+
+        def per_segment(mask, begins):
+            """Count of True characters in each piece."""
+            pieces = np.searchsorted(begins, np.flatnonzero(mask), side='right') - 1
+            return np.bincount(pieces, minlength=count).astype(np.int64)
+
+        def segment_of(offset, begins):
+            return int(np.searchsorted(begins, offset, side='right')) - 1
+
+        # Raw-text signals
+        raw_space = np.isin(raw_codes, whitespace) | (raw_codes == 0)
+        self.punctuation_sums = _prefix(per_segment((raw_codes == ord('?')) | (raw_codes == ord('!')), raw_begins))
+        self.colon_sums = _prefix(per_segment(raw_codes == ord(':'), raw_begins))
+        self.quote_sums = _prefix(per_segment(raw_codes == ord('"'), raw_begins))
+
+        # Only segments with a digit pair or a currency sign can match NUMBER_PATTERN
+        has_number = np.zeros(count, dtype=bool)
+        for match in _NUMBER_CANDIDATE.finditer(raw):
+            index = segment_of(match.start(), raw_begins)
+            if not has_number[index] and NUMBER_PATTERN.search(segments[index]['text']):
+                has_number[index] = True
+        self.number_sums = _prefix(has_number)
+
+        # Last non-space character of each segment: blank segments have none, hooks end in '?'/'!'
+        last_visible = np.maximum.accumulate(np.where(raw_space, -1, np.arange(len(raw_codes))))
+        last_in_segment = last_visible[np.maximum(raw_ends - 1, 0)] if len(raw_codes) else np.full(count, -1)
+        non_blank = last_in_segment >= raw_begins
+        self.blank_sums = _prefix(~non_blank)
+        hook_codes = raw_codes[np.maximum(last_in_segment, 0)] if len(raw_codes) else np.zeros(count, dtype=np.uint32)
+        self.hook_end = non_blank & ((hook_codes == ord('?')) | (hook_codes == ord('!')))
+        self.previous_text_segment = np.maximum.accumulate(np.where(non_blank, indices, -1)) if count \
+            else indices
+
+        # Normalized-text signals: tokens are runs of non-space, non-separator characters
+        token_chars = ~(np.isin(normalized_codes, whitespace) | (normalized_codes == 0))
+        token_starts = token_chars & ~np.concatenate([[False], token_chars[:-1]])
+        token_counts = per_segment(token_starts, self.text_begins)
+        self.token_sums = _prefix(token_counts)
+        has_tokens = token_counts > 0
+        self.next_token_segment = np.append(
+            np.minimum.accumulate(np.where(has_tokens, indices, count)[::-1])[::-1], count
+        )
+
+        tokens = _TOKEN.findall(normalized)
+        if len(tokens) != int(token_counts.sum()):
+            raise ValueError("Token boundaries disagree")
+        token_segments = np.repeat(indices, token_counts)
+        first_tokens = self.token_sums[:-1]
+        self.question_start = np.array([
+            bool(has_tokens[index]) and tokens[first_tokens[index]] in QUESTION_WORDS for index in range(count)
+        ], dtype=bool)
+
+        # Distinct keywords per chunk: per-keyword presence counts, summed over the chunk
+        keyword_ids = {keyword: index for index, keyword in enumerate(sorted(keywords))}
+        presence = np.zeros((count, max(1, len(keyword_ids))), dtype=np.int64)
+        if keyword_ids:
+            token_ids = [keyword_ids.get(token, -1) for token in tokens]
+            token_ids = np.array(token_ids, dtype=np.int64)
+            hits = token_ids >= 0
+            presence[token_segments[hits], token_ids[hits]] = 1
+        self.keyword_sums = _prefix(presence)
+
+        # Phrases match the chunk's collapsed text, so in the joined text any whitespace
+        # (and segment separators) may stand between their words. Each phrase is one
+        # literal-led pattern scanned over the whole transcript (overlaps included),
+        # which CPython's regex engine does far faster than a single alternation.
+        self.phrases = sorted(set(phrases))
+        self.phrase_starts = []
+        self.phrase_min_ends = []
+        for phrase in self.phrases:
+            pattern = re.compile(r'[\s\x00]+'.join(re.escape(word) for word in phrase.split(' ')))
+            occurrences = []
+            match = pattern.search(normalized)
+            while match:
+                occurrences.append((match.start(), match.end()))
+                match = pattern.search(normalized, match.start() + 1)
+            starts = np.array([start for start, _ in occurrences], dtype=np.int64)
+            ends = np.array([end for _, end in occurrences], dtype=np.int64)
+            # Earliest end among occurrences from k on: one lies inside [a, b) iff it is <= b
+            self.phrase_starts.append(starts)
+            self.phrase_min_ends.append(np.minimum.accumulate(ends[::-1])[::-1] if len(ends) else ends)
+
+        starts = np.array([segment['start'] for segment in segments], dtype=np.float64)
+        ends = np.array([segment['end'] for segment in segments], dtype=np.float64)
+        gaps = starts[1:] - ends[:-1] if count else np.zeros(0)
+        self.long_pause_sums = _prefix(gaps >= 0.8)
+        self.medium_pause_sums = _prefix((gaps >= 0.4) & (gaps < 0.8))
+
+    def chunk_bounds(self, chunk: Dict) -> Optional[tuple]:
+        """(first, last) segment indices of a chunk, or None if it is not a run of these segments."""
+        chunk_segments = chunk.get('segments') or []
+        if not chunk_segments:
+            return None
+        first = self.positions.get(id(chunk_segments[0]))
+        last = self.positions.get(id(chunk_segments[-1]))
+        if first is None or last is None or last - first + 1 != len(chunk_segments):
+            return None
+        if ' '.join(segment['text'] for segment in chunk_segments).strip() != chunk.get('text', '').strip():
+            return None
+        return first, last
+
+    def features(self, chunks: List[Dict]) -> List[Optional[Dict[str, float]]]:
+        """Feature dicts matching ViralMomentAnalyzer._prefilter_features, None for empty chunks.
+
+        Raises ValueError if a chunk is not a contiguous run of the segments.
+        """
+        bounds = [self.chunk_bounds(chunk) for chunk in chunks]
+        if any(bound is None for bound in bounds):
+            raise ValueError("Chunk does not map to a contiguous run of segments")
+        if not chunks:
+            return []
+
+        first = np.array([bound[0] for bound in bounds], dtype=np.int64)
+        last = np.array([bound[1] for bound in bounds], dtype=np.int64)
+        end = last + 1
+        durations = np.maximum(1.0, np.array([chunk['end'] - chunk['start'] for chunk in chunks], dtype=np.float64))
+
+        def window(sums):
+            return sums[end] - sums[first]
+
+        # Same expressions, in the same order, as the per-chunk heuristic (bit-identical floats)
+        density = np.minimum(1.5, window(self.token_sums) / durations * 0.9)
+        punctuation = np.minimum(1.5, window(self.punctuation_sums) * 0.75)
+        quotes = np.minimum(0.6, window(self.colon_sums) * 0.2 + window(self.quote_sums) * 0.2)
+        numbers = np.where(window(self.number_sums) > 0, 0.4, 0.0)
+        long_pauses = self.long_pause_sums[last] - self.long_pause_sums[first]
+        medium_pauses = self.medium_pause_sums[last] - self.medium_pause_sums[first]
+        pauses = np.minimum(1.5, long_pauses * 0.75 + medium_pauses * 0.3)
+        keyword_hits = ((self.keyword_sums[end] - self.keyword_sums[first]) > 0).sum(axis=1)
+        keywords = np.minimum(2.5, keyword_hits * 0.45)
+
+        text_first = self.next_token_segment[first]
+        has_tokens = text_first <= last
+        span_start = self.text_begins[first]
+        span_end = self.text_ends[last]
+        phrase_hits = np.zeros(len(chunks), dtype=np.int64)
+        for starts, min_ends in zip(self.phrase_starts, self.phrase_min_ends):
+            if len(starts):
+                following = np.searchsorted(starts, span_start, side='left')
+                inside = min_ends[np.minimum(following, len(starts) - 1)] <= span_end
+                phrase_hits += ((following < len(starts)) & inside).astype(np.int64)
+        phrases = np.minimum(2.0, phrase_hits * 0.9)
+
+        question_start = np.where(
+            has_tokens & self.question_start[np.minimum(text_first, len(self.segments) - 1)], 0.4, 0.0
+        )
+        hook_end = np.where(self.hook_end[np.maximum(self.previous_text_segment[last], 0)], 0.25, 0.0)
+        empty = window(self.blank_sums) == end - first
+
+        columns = {
+            'density': density.tolist(),
+            'punctuation': punctuation.tolist(),
+            'quotes': quotes.tolist(),
+            'numbers': numbers.tolist(),
+            'pauses': pauses.tolist(),
+            'keywords': keywords.tolist(),
+            'phrases': phrases.tolist(),
+            'question_start': question_start.tolist(),
+            'hook_end': hook_end.tolist(),
+        }
+        return [
+            None if empty[index] else {name: values[index] for name, values in columns.items()}
+            for index in range(len(chunks))
+        ]
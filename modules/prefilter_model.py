@@ -0,0 +1,133 @@
+import hashlib
+import json
+import re
+import zlib
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from config import PREFILTER_MODEL_HASH_BITS
+
+
+def _tokenize(text: str) -> List[str]:
+    normalized = re.sub(r"[^\w\s']", ' ', text.lower(), flags=re.UNICODE)
+    return normalized.split()
+
+
+class PrefilterModel:
+    """Logistic regression predicting whether the LLM will score a chunk as viral.
+
+    Inputs are hashed word unigrams and bigrams plus the named dense features
+    of the heuristic prefilter (see ViralMomentAnalyzer._prefilter_text_features).
+    Trained on CPU with numpy from cached LLM chunk scores.
+    """
+
+    def __init__(self, feature_names: Sequence[str], hash_bits: int = PREFILTER_MODEL_HASH_BITS,
+                 threshold: float = 6.0):
+        self.feature_names = list(feature_names)
+        self.hash_bits = hash_bits
+        self.threshold = threshold
+        self.weights = np.zeros((1 << hash_bits) + len(self.feature_names), dtype=np.float64)
+        self.bias = 0.0
+        self.trained_on = 0
+
+    def _row(self, text: str, language: str, features: Dict[str, float]) -> Tuple[np.ndarray, np.ndarray]:
+        """Sparse feature row as (indices, values)."""
+        tokens = _tokenize(text)
+        grams = [f"lang={language}"] + tokens + [f"{a} {b}" for a, b in zip(tokens, tokens[1:])]
+        mask = (1 << self.hash_bits) - 1
+        hashed = np.fromiter((zlib.crc32(gram.encode('utf-8')) & mask for gram in grams), dtype=np.int64)
+        # Binary n-gram presence, scaled so long chunks do not dominate the dense features
+        hashed = np.unique(hashed)
+        hashed_values = np.full(len(hashed), 1.0 / np.sqrt(max(1, len(hashed))))
+
+        offset = 1 << self.hash_bits
+        dense_indices = np.arange(offset, offset + len(self.feature_names), dtype=np.int64)
+        dense_values = np.array([float(features.get(name, 0.0)) for name in self.feature_names])
+        return np.concatenate([hashed, dense_indices]), np.concatenate([hashed_values, dense_values])
+
+    @property
+    def digest(self) -> str:
+        """Identifies the trained weights, e.g. in analysis cache keys."""
+        return hashlib.sha256(self.weights.tobytes() + repr(float(self.bias)).encode()).hexdigest()[:16]
+
+    def predict_proba(self, text: str, language: str, features: Dict[str, float]) -> float:
+        indices, values = self._row(text, language, features)
+        logit = self.bias + float(self.weights[indices] @ values)
+        return float(1.0 / (1.0 + np.exp(-np.clip(logit, -30, 30))))
+
+    def fit(self, samples: List[Tuple[str, str, Dict[str, float], float]], epochs: int = 300,
+            learning_rate: float = 0.5, l2: float = 1e-4) -> 'PrefilterModel':
+        """Full-batch gradient descent on (text, language, features, llm_score) samples."""
+        rows = [self._row(text, language, features) for text, language, features, _ in samples]
+        labels = np.array([1.0 if score >= self.threshold else 0.0 for *_, score in samples])
+        if not len(rows):
+            raise ValueError("No training samples")
+
+        lengths = np.array([len(indices) for indices, _ in rows])
+        row_ids = np.repeat(np.arange(len(rows)), lengths)
+        indices = np.concatenate([indices for indices, _ in rows])
+        values = np.concatenate([values for _, values in rows])
+        count = len(rows)
+
+        # Class-balanced weights: viral chunks are usually a small minority
+        positives = labels.sum()
+        sample_weights = np.where(
+            labels == 1.0,
+            count / (2.0 * max(positives, 1.0)),
+            count / (2.0 * max(count - positives, 1.0)),
+        )
+
+        for _ in range(epochs):
+            logits = self.bias + np.bincount(row_ids, weights=self.weights[indices] * values, minlength=count)
+            predictions = 1.0 / (1.0 + np.exp(-np.clip(logits, -30, 30)))
+            residual = (predictions - labels) * sample_weights / count
+            gradient = np.bincount(indices, weights=values * residual[row_ids], minlength=len(self.weights))
+            self.weights -= learning_rate * (gradient + l2 * self.weights)
+            self.bias -= learning_rate * float(residual.sum())
+
+        self.trained_on = count
+        return self
+
+    def save(self, path: Path):
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        meta = {
+            'feature_names': self.feature_names,
+            'hash_bits': self.hash_bits,
+            'threshold': self.threshold,
+            'trained_on': self.trained_on,
+        }
+        tmp_path = path.with_suffix('.tmp.npz')
+        np.savez_compressed(tmp_path, weights=self.weights, bias=self.bias, meta=json.dumps(meta))
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, path: Path) -> Optional['PrefilterModel']:
+        path = Path(path)
+        if not path.exists():
+            return None
+        try:
+            with np.load(path) as data:
+                meta = json.loads(str(data['meta']))
+                model = cls(meta['feature_names'], meta['hash_bits'], meta['threshold'])
+                model.weights = data['weights']
+                model.bias = float(data['bias'])
+                model.trained_on = meta.get('trained_on', 0)
+            return model
+        except Exception as e:
+            print(f"Warning: Could not load prefilter model {path}: {e}")
+            return None
+
+
+def iter_cached_scores(chunk_cache_dir: Path) -> Iterator[Dict]:
+    """Final-stage chunk scores (with their text) from the analyzer's chunk cache."""
+    for cache_file in Path(chunk_cache_dir).rglob('*.json'):
+        try:
+            with open(cache_file, 'r', encoding='utf-8') as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            continue
+        if entry.get('text') and 'score' in entry and entry.get('stage', 'final') == 'final':
+            yield entry
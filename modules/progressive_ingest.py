@@ -0,0 +1,69 @@
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from config import VIDEO_QUALITY
+from modules.downloader import YouTubeDownloader
+from modules.transcriber import VideoTranscriber
+from utils.progressive_audio import ProgressivePCM
+
+
+def download_and_transcribe(downloader: YouTubeDownloader, transcriber: VideoTranscriber, url: str,
+                            quality: str = VIDEO_QUALITY, progress_callback=None,
+                            transcribe_progress: Optional[Callable[[float, float], None]] = None,
+                            lease: bool = False) -> Tuple[Dict[str, Any], Dict[str, Any]]:
+    """Download a video while its audio is transcribed, returning (video metadata, transcript).
+
+    The audio-only stream is downloaded next to the video and decoded as it
+    arrives (ProgressivePCM); VideoTranscriber.transcribe_progressive works
+    through it span by span on this thread. progress_callback receives the
+    video download progress, as for YouTubeDownloader.download. Once both are
+    done, the transcript and the decoded audio are cached for the video file.
+    lease is passed to YouTubeDownloader.download for the video.
+    """
+    pcm = ProgressivePCM()
+    results: Dict[str, Any] = {}
+    errors: Dict[str, Exception] = {}
+
+    def fetch_audio():
+        try:
+            results['audio'] = downloader.download_audio(url, progress_hooks=[pcm.hook])
+            if not pcm.started:
+                pcm.start(results['audio']['filepath'])
+            pcm.download_finished()
+        except Exception as e:
+            errors['audio'] = e
+            pcm.fail(e)
+
+    def fetch_video():
+        try:
+            results['video'] = downloader.download(url, quality, progress_callback=progress_callback, lease=lease)
+        except Exception as e:
+            errors['video'] = e
+
+    threads = [threading.Thread(target=fetch_audio, daemon=True), threading.Thread(target=fetch_video, daemon=True)]
+    for thread in threads:
+        thread.start()
+
+    try:
+        transcript = transcriber.transcribe_progressive(pcm, progress_callback=transcribe_progress)
+        for thread in threads:
+            thread.join()
+        if 'video' in errors:
+            raise errors['video']
+        if 'audio' in errors:
+            raise errors['audio']
+
+        video_data = results['video']
+        transcriber.store_transcript(video_data['filepath'], transcript)
+        pcm.publish(video_data['filepath'])
+        return video_data, transcript
+    except Exception:
+        if lease:
+            # The caller never sees the video, so its lease is dropped here
+            for thread in threads:
+                thread.join()
+            if 'video' in results:
+                downloader.release(results['video']['video_id'])
+        raise
+    finally:
+        pcm.close()
@@ -7,6 +7,7 @@ import re
 
 from config import SUBTITLE_STYLE, VERTICAL_SUBTITLE_STYLE, OUTPUTS_DIR, SUBTITLE_TEMPLATES
 from modules.transcriber import VideoTranscriber
+from utils.transcript_index import build_transcript_index
 from utils.video_metadata import get_video_info
 
 
@@ -33,12 +34,152 @@ class SubtitleGenerator:
         self.output_dir.mkdir(exist_ok=True)
         self.transcriber = VideoTranscriber()
         
+    def _resolve_style_settings(self, style_template: str, vertical_format: bool) -> Dict:
+        """Get subtitle style settings from a template, falling back to the default styles."""
+        if style_template in SUBTITLE_TEMPLATES:
+            template = SUBTITLE_TEMPLATES[style_template]
+            return template['vertical'] if vertical_format else template['horizontal']
+
+        style = VERTICAL_SUBTITLE_STYLE if vertical_format else SUBTITLE_STYLE
+        return {
+            'fontsize': style['fontsize'],
+            'color': 'white' if style['color'] == 'white' else 'black',
+            'stroke_color': 'black' if style['stroke_color'] == 'black' else 'white',
+            'stroke_width': style['stroke_width'],
+            'position': style['position'][1] if isinstance(style['position'], tuple) else style['position']
+        }
+
+    def create_subtitle_file(self, transcript: Dict, clip_start_time: float, clip_duration: float,
+                             vertical_format: bool = True, style_template: str = "Classic",
+                             language: str = "en", video_width: int = 1080,
+                             video_height: int = 1920) -> str:
+        """Write a clip-relative ASS file for [clip_start_time, clip_start_time + clip_duration].
+
+        The caller owns the returned temporary file and must delete it.
+        """
+        style_settings = self._resolve_style_settings(style_template, vertical_format)
+
+        # Get words for the entire clip duration
+        words = self.transcriber.get_words_in_range(
+            transcript,
+            clip_start_time,
+            clip_start_time + clip_duration
+        )
+
+        # Use transcript's detected language if available
+        actual_language = transcript.get('language', language)
+
+        # Group words intelligently
+        max_words = style_settings.get('max_words', 3)
+        word_groups = self._group_words(words, max_words, actual_language)
+
+        # Optional Submagic-like smart emojis
+        if style_settings.get('smart_emojis', False):
+            emoji_density = float(style_settings.get('emoji_density', 0.4))
+            word_groups = self._add_smart_emojis(
+                word_groups,
+                language=actual_language,
+                density=emoji_density,
+            )
+
+        return self._create_ass_file(word_groups, style_settings, clip_start_time,
+                                     video_width=video_width, video_height=video_height)
+
+    def render_subtitled_clip(self, processor, video_path: str, transcript: Dict,
+                              start_time: float, end_time: float,
+                              output_name: Optional[str] = None, vertical_format: bool = True,
+                              style_template: str = "Classic", language: str = "en") -> str:
+        """Cut, reframe and burn subtitles from the source video in one ffmpeg pass.
+
+        `processor` is the VideoProcessor that performs the cut; its output directory is used.
+        """
+        video_path = Path(video_path)
+        if not video_path.exists():
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        if output_name:
+            output_name = f"{output_name}_subtitled"
+        else:
+            output_name = f"{video_path.stem}_clip_{int(start_time)}_{int(end_time)}_subtitled"
+
+        ass_file = None
+        try:
+            video_width, video_height = processor.get_output_dimensions(str(video_path), vertical_format)
+            ass_file = self.create_subtitle_file(
+                transcript,
+                start_time,
+                end_time - start_time,
+                vertical_format=vertical_format,
+                style_template=style_template,
+                language=language,
+                video_width=video_width,
+                video_height=video_height,
+            )
+            return processor.extract_clip(
+                str(video_path),
+                start_time,
+                end_time,
+                output_name,
+                vertical_format=vertical_format,
+                subtitle_file=ass_file,
+            )
+        except Exception as e:
+            raise Exception(f"Error rendering subtitled clip: {str(e)}")
+        finally:
+            if ass_file and os.path.exists(ass_file):
+                os.unlink(ass_file)
+
+    def render_subtitled_clips(self, processor, video_path: str, transcript: Dict,
+                               clips: List[Dict], vertical_format: bool = True,
+                               style_template: str = "Classic", language: str = "en",
+                               ranges: Optional[List[Dict]] = None) -> List[Dict]:
+        """Render several subtitled clips from one source with VideoProcessor.extract_clips_batch.
+
+        `clips` holds dicts with 'start', 'end' and 'output_name'. With `ranges`
+        (YouTubeDownloader.download_ranges), clips are cut from those partial
+        files instead of `video_path`. Returns one {'path', 'error'} dict per clip, in order.
+        """
+        if ranges:
+            video_path = ranges[0]['filepath']
+        video_width, video_height = processor.get_output_dimensions(str(video_path), vertical_format)
+        # One index serves the word lookups of every clip.
+        transcript = build_transcript_index(transcript)
+        jobs = []
+        try:
+            for clip in clips:
+                ass_file = self.create_subtitle_file(
+                    transcript,
+                    clip['start'],
+                    clip['end'] - clip['start'],
+                    vertical_format=vertical_format,
+                    style_template=style_template,
+                    language=language,
+                    video_width=video_width,
+                    video_height=video_height,
+                )
+                jobs.append({
+                    'start': clip['start'],
+                    'end': clip['end'],
+                    'output_name': f"{clip['output_name']}_subtitled",
+                    'subtitle_file': ass_file,
+                })
+            if ranges:
+                return processor.extract_clips_from_ranges(ranges, jobs, vertical_format=vertical_format)
+            return processor.extract_clips_batch(str(video_path), jobs, vertical_format=vertical_format)
+        finally:
+            for job in jobs:
+                if os.path.exists(job['subtitle_file']):
+                    os.unlink(job['subtitle_file'])
+
     def add_subtitles(self, video_path: str, transcript: Dict,
                      start_time: float, end_time: float,
                      output_name: Optional[str] = None, vertical_format: bool = True,
                      clip_start_time: Optional[float] = None, style_template: str = "Classic",
                      language: str = "en") -> str:
-        """Fast subtitle generation using FFmpeg subtitles filter"""
+        """Burn subtitles onto an already extracted clip (second encode pass).
+
+        Prefer render_subtitled_clip when the source video is still available.
+        """
         video_path = Path(video_path)
         if not video_path.exists():
             raise FileNotFoundError(f"Video file not found: {video_path}")
@@ -57,53 +198,23 @@ class SubtitleGenerator:
             video_width = int(video_info.get('width', 1080))
             video_height = int(video_info.get('height', 1920))
             
-            # Get subtitle style from template
-            if style_template in SUBTITLE_TEMPLATES:
-                template = SUBTITLE_TEMPLATES[style_template]
-                style_settings = template['vertical'] if vertical_format else template['horizontal']
-            else:
-                # Fallback to default styles
-                style = VERTICAL_SUBTITLE_STYLE if vertical_format else SUBTITLE_STYLE
-                style_settings = {
-                    'fontsize': style['fontsize'],
-                    'color': 'white' if style['color'] == 'white' else 'black',
-                    'stroke_color': 'black' if style['stroke_color'] == 'black' else 'white',
-                    'stroke_width': style['stroke_width'],
-                    'position': style['position'][1] if isinstance(style['position'], tuple) else style['position']
-                }
-            
             # If clip_start_time is provided, use it as the offset
             if clip_start_time is not None:
                 video_offset = clip_start_time
             else:
                 video_offset = start_time
             
-            # Get words for the entire clip duration
-            words = self.transcriber.get_words_in_range(
-                transcript, 
-                video_offset, 
-                video_offset + duration
-            )
-            
-            # Use transcript's detected language if available
-            actual_language = transcript.get('language', language)
-            
-            # Group words intelligently
-            max_words = style_settings.get('max_words', 3)
-            word_groups = self._group_words(words, max_words, actual_language)
-
-            # Optional Submagic-like smart emojis
-            if style_settings.get('smart_emojis', False):
-                emoji_density = float(style_settings.get('emoji_density', 0.4))
-                word_groups = self._add_smart_emojis(
-                    word_groups,
-                    language=actual_language,
-                    density=emoji_density,
-                )
-            
             # Create subtitle file in ASS format
-            ass_file = self._create_ass_file(word_groups, style_settings, video_offset,
-                                             video_width=video_width, video_height=video_height)
+            ass_file = self.create_subtitle_file(
+                transcript,
+                video_offset,
+                duration,
+                vertical_format=vertical_format,
+                style_template=style_template,
+                language=language,
+                video_width=video_width,
+                video_height=video_height,
+            )
             
             # Use FFmpeg with subtitles filter
             input_stream = ffmpeg.input(str(video_path))
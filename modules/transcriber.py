@@ -1,6 +1,8 @@
+import itertools
 import json
+from concurrent.futures import ProcessPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, Iterable, List, Optional
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
 from config import (
     TRANSCRIPTS_DIR,
@@ -14,7 +16,81 @@ from config import (
     WHISPER_BEST_OF,
     WHISPER_TEMPERATURE,
     WHISPER_VAD_FILTER,
+    WHISPER_PARALLEL_WORKERS,
+    WHISPER_PARALLEL_CPU_THREADS,
+    WHISPER_PARALLEL_MIN_SPAN,
+    WHISPER_PARALLEL_SEARCH_WINDOW,
+    AUDIO_SAMPLE_RATE,
+    PROGRESSIVE_TRANSCRIBE_SPAN,
 )
+from utils.audio_cache import detect_silences, get_decoded_audio_path, open_pcm
+from utils.transcript_index import TranscriptIndex
+from utils.transcript_store import TranscriptStore
+
+# Per-process state of parallel transcription workers (see _init_parallel_worker).
+_worker_model = None
+_worker_serializer = None
+
+
+def _faster_whisper_options(language: Optional[str]) -> Dict[str, Any]:
+    return {
+        'language': language,
+        'task': WHISPER_TASK,
+        'beam_size': WHISPER_BEAM_SIZE,
+        'best_of': WHISPER_BEST_OF,
+        'temperature': WHISPER_TEMPERATURE,
+        'word_timestamps': True,
+        'condition_on_previous_text': False,
+        'vad_filter': WHISPER_VAD_FILTER,
+    }
+
+
+def _init_parallel_worker(model_name: str, cpu_threads: int):
+    """Load one WhisperModel per worker process with a bounded thread count."""
+    global _worker_model, _worker_serializer
+    from faster_whisper import WhisperModel
+
+    _worker_model = WhisperModel(
+        model_name,
+        device=WHISPER_DEVICE,
+        compute_type=WHISPER_COMPUTE_TYPE,
+        cpu_threads=cpu_threads,
+    )
+    _worker_serializer = object.__new__(VideoTranscriber)
+
+
+def _detect_span_language(pcm_path: str, start_sample: int, end_sample: int) -> str:
+    # Language detection runs eagerly inside transcribe(); segments are never consumed.
+    audio = open_pcm(pcm_path)[start_sample:end_sample]
+    _, info = _worker_model.transcribe(audio, **_faster_whisper_options(None))
+    return getattr(info, 'language', None) or 'unknown'
+
+
+def _transcribe_span(pcm_path: str, start_sample: int, end_sample: int,
+                     language: Optional[str]) -> List[Dict[str, Any]]:
+    # Workers memory-map the shared PCM file, so no audio is pickled between processes.
+    audio = open_pcm(pcm_path)[start_sample:end_sample]
+    segments, _ = _worker_model.transcribe(audio, **_faster_whisper_options(language))
+    return _worker_serializer._serialize_faster_whisper_segments(segments)
+
+
+class TranscriptStream:
+    """Serialized transcript segments, yielded while Whisper is still decoding.
+
+    `language` and `duration` (seconds of audio) are known up front; `transcript`
+    holds the complete transcript dict once the stream has been exhausted
+    (immediately for cached transcripts).
+    """
+
+    def __init__(self, segments: Iterable[Dict[str, Any]], language: str, duration: float,
+                 transcript: Optional[Dict[str, Any]] = None):
+        self._segments = segments
+        self.language = language
+        self.duration = duration
+        self.transcript = transcript
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return iter(self._segments)
 
 
 class VideoTranscriber:
@@ -24,11 +100,12 @@ class VideoTranscriber:
         self.model = None
         self.transcripts_dir = TRANSCRIPTS_DIR
         self.transcripts_dir.mkdir(exist_ok=True)
+        self.store = TranscriptStore(self.transcripts_dir)
 
-    def _cache_signature(self, language: Optional[str]) -> Dict[str, Any]:
+    def _cache_signature(self, language: Optional[str], progressive: bool = False) -> Dict[str, Any]:
         """Return cache signature for transcript compatibility checks."""
-        return {
-            'version': 3,
+        signature = {
+            'version': 4,
             'backend': self.backend,
             'model': self.model_name,
             'device': WHISPER_DEVICE,
@@ -41,6 +118,15 @@ class VideoTranscriber:
             'language': language if language else "auto",
             'word_timestamps': True,
         }
+        if progressive or not self._use_parallel_transcription():
+            # Serial and progressive transcription work through the same silence-cut spans
+            signature['progressive_span'] = PROGRESSIVE_TRANSCRIBE_SPAN
+        else:
+            signature['parallel_workers'] = WHISPER_PARALLEL_WORKERS
+        return signature
+
+    def _use_parallel_transcription(self) -> bool:
+        return self.backend == "faster-whisper" and WHISPER_PARALLEL_WORKERS > 1
 
     def _is_compatible_cached_transcript(self, transcript_data: Dict, language: Optional[str]) -> bool:
         """Check if cached transcript matches the current transcription settings."""
@@ -98,61 +184,323 @@ class VideoTranscriber:
         if not video_path.exists():
             raise FileNotFoundError(f"Video file not found: {video_path}")
 
-        transcript_path = self.transcripts_dir / f"{video_path.stem}_transcript.json"
+        transcript_path = self._transcript_cache_path(video_path, language)
 
-        if transcript_path.exists() and not force:
-            with open(transcript_path, 'r', encoding='utf-8') as f:
-                cached = json.load(f)
-            if self._is_compatible_cached_transcript(cached, language):
+        if not force:
+            cached = self._load_cached_transcript(video_path, language)
+            if cached is not None:
                 return cached
 
-        self._load_model()
-
         try:
             whisper_language = language if language else WHISPER_LANGUAGE
-
-            if self.backend == "faster-whisper":
-                transcript_data = self._transcribe_with_faster_whisper(video_path, whisper_language)
+            # Decode once to the shared 16 kHz PCM cache; Whisper reads the samples
+            # instead of demuxing and decoding the whole container itself.
+            pcm_path = get_decoded_audio_path(str(video_path))
+            audio = open_pcm(pcm_path)
+
+            if (
+                self._use_parallel_transcription()
+                and len(audio) >= 2 * WHISPER_PARALLEL_MIN_SPAN * AUDIO_SAMPLE_RATE
+            ):
+                transcript_data = self._transcribe_parallel(video_path, whisper_language, pcm_path, audio)
             else:
-                transcript_data = self._transcribe_with_openai_whisper(video_path, whisper_language)
+                # Span by span from the memory map: only one span is ever converted to float32
+                transcript_data = self.transcribe_progressive(audio, language)
+                transcript_data['video_path'] = str(video_path)
 
             transcript_data['transcriber'] = self._cache_signature(language)
-
-            with open(transcript_path, 'w', encoding='utf-8') as f:
-                json.dump(transcript_data, f, indent=2, ensure_ascii=False)
+            self._save_transcript(transcript_path, transcript_data)
 
             return transcript_data
 
         except Exception as e:
             raise Exception(f"Transcription failed: {str(e)}")
 
-    def _transcribe_with_faster_whisper(self, video_path: Path, language: Optional[str]) -> Dict[str, Any]:
-        segments, info = self.model.transcribe(
-            str(video_path),
-            language=language,
-            task=WHISPER_TASK,
-            beam_size=WHISPER_BEAM_SIZE,
-            best_of=WHISPER_BEST_OF,
-            temperature=WHISPER_TEMPERATURE,
-            word_timestamps=True,
-            condition_on_previous_text=False,
-            vad_filter=WHISPER_VAD_FILTER,
-        )
+    def _transcript_cache_path(self, video_path: Path, language: Optional[str]) -> Path:
+        return self.store.path_for(str(video_path), self._cache_signature(language))
+
+    def _load_cached_transcript(self, video_path: Path, language: Optional[str]) -> Optional[Dict[str, Any]]:
+        """Cached transcript for video_path, falling back to one made by transcribe_progressive."""
+        for signature in (self._cache_signature(language), self._cache_signature(language, progressive=True)):
+            cached = self.store.load(str(video_path), signature)
+            if cached is not None:
+                return cached
+        return None
+
+    def _save_transcript(self, transcript_path: Path, transcript_data: Dict[str, Any]):
+        self.store.save(transcript_path, transcript_data)
 
-        raw_segments = list(segments)
-        processed_segments = self._serialize_faster_whisper_segments(raw_segments)
+    def transcribe_stream(self, video_path: str, force: bool = False, language: str = None,
+                          progress_callback: Optional[Callable[[float, float], None]] = None) -> TranscriptStream:
+        """Transcribe lazily, yielding serialized segments as faster-whisper decodes them.
+
+        Segments are appended to a `.partial.jsonl` file next to the transcript
+        cache while decoding; the regular cache file is written once the stream
+        is exhausted. progress_callback(decoded_seconds, total_seconds) is called
+        after each segment. Backends or modes without lazy decoding (openai-whisper,
+        parallel spans) transcribe fully first and then replay the segments.
+        """
+        video_path = Path(video_path)
+        if not video_path.exists():
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+
+        transcript_path = self._transcript_cache_path(video_path, language)
+        cached = None if force else self._load_cached_transcript(video_path, language)
+
+        if cached is None and (self.backend != "faster-whisper" or self._use_parallel_transcription()):
+            cached = self.transcribe(str(video_path), force=force, language=language)
+
+        if cached is not None:
+            duration = float(cached.get('duration', 0) or 0)
+
+            def replay():
+                for segment in cached['segments']:
+                    if progress_callback:
+                        progress_callback(segment['end'], duration)
+                    yield segment
+
+            return TranscriptStream(replay(), cached.get('language', 'unknown'), duration, transcript=cached)
+
+        self._load_model()
+        whisper_language = language if language else WHISPER_LANGUAGE
+        audio = open_pcm(get_decoded_audio_path(str(video_path)))
+        spans = self._iter_spans(audio, whisper_language)
+        try:
+            # The first span is started right away: it detects the language
+            first_span = next(spans, None)
+        except Exception as e:
+            raise Exception(f"Transcription failed: {str(e)}")
+
+        total_duration = audio.duration
+        partial_path = transcript_path.with_name(f"{transcript_path.stem}.partial.jsonl")
+
+        def span_segments():
+            if first_span is None:
+                return
+            for offset, _, segments, _ in itertools.chain([first_span], spans):
+                for segment in segments:
+                    yield offset, segment
+
+        def decode():
+            processed_segments = []
+            try:
+                with open(partial_path, 'w', encoding='utf-8') as partial_file:
+                    for offset, span_segment in span_segments():
+                        segment = self._shift_segment(span_segment, offset, len(processed_segments))
+                        partial_file.write(json.dumps(segment, ensure_ascii=False) + '\n')
+                        partial_file.flush()
+                        processed_segments.append(segment)
+                        if progress_callback:
+                            progress_callback(segment['end'], total_duration)
+                        yield segment
+            except Exception as e:
+                raise Exception(f"Transcription failed: {str(e)}")
+
+            transcript_data = {
+                'video_path': str(video_path),
+                'language': stream.language,
+                'duration': processed_segments[-1]['end'] if processed_segments else 0,
+                'segments': processed_segments,
+                'full_text': ' '.join(segment['text'] for segment in processed_segments).strip(),
+                'transcriber': self._cache_signature(language),
+            }
+            self._save_transcript(transcript_path, transcript_data)
+            partial_path.unlink(missing_ok=True)
+            stream.transcript = transcript_data
+
+        stream = TranscriptStream(decode(), (first_span[3] if first_span else None) or 'unknown', total_duration)
+        return stream
+
+    def store_transcript(self, video_path: str, transcript_data: Dict[str, Any]):
+        """Cache a transcript made elsewhere (e.g. transcribe_progressive) for video_path."""
+        transcript_data['video_path'] = str(video_path)
+        self._save_transcript(self.store.path_for(str(video_path), transcript_data['transcriber']), transcript_data)
+
+    def transcribe_progressive(self, pcm, language: str = None,
+                               progress_callback: Optional[Callable[[float, float], None]] = None) -> Dict[str, Any]:
+        """Transcribe a ProgressivePCM span by span while it is still being decoded.
+
+        A complete PCMSamples works too; transcribe uses that to keep only one
+        span in memory as float32.
+
+        Spans of PROGRESSIVE_TRANSCRIBE_SPAN seconds end at the silence nearest
+        to their nominal end, chosen from the audio alone, so the transcript does
+        not depend on download speed. The first span fixes the language for the
+        rest. progress_callback(transcribed_seconds, expected_seconds) follows
+        each span. The result has no 'video_path' until store_transcript.
+        """
+        self._load_model()
+        whisper_language = language if language else WHISPER_LANGUAGE
+        span_results = []
+        for offset, end, segments, whisper_language in self._iter_spans(pcm, whisper_language):
+            span_results.append((offset, list(segments)))
+            if progress_callback:
+                progress_callback(end, max(pcm.duration, end))
+
+        processed_segments = self._stitch_span_segments(span_results)
+        return {
+            'video_path': '',
+            'language': whisper_language or 'unknown',
+            'duration': processed_segments[-1]['end'] if processed_segments else 0,
+            'segments': processed_segments,
+            'full_text': ' '.join(segment['text'] for segment in processed_segments).strip(),
+            'transcriber': self._cache_signature(language, progressive=True),
+        }
+
+    def _iter_spans(self, pcm, language: Optional[str]
+                    ) -> Iterator[Tuple[float, float, Iterable[Dict[str, Any]], Optional[str]]]:
+        """Transcribe pcm in silence-cut spans, yielding (start s, end s, segments, language) per span.
+
+        Segment times are relative to the span; faster-whisper segments are
+        decoded lazily while they are consumed. Without a language, the first
+        span's detected language is used for the rest.
+        """
+        rate = pcm.sample_rate
+        span = int(PROGRESSIVE_TRANSCRIBE_SPAN * rate)
+        window = int(min(WHISPER_PARALLEL_SEARCH_WINDOW, PROGRESSIVE_TRANSCRIBE_SPAN / 4) * rate)
+
+        start = 0
+        while True:
+            nominal = start + span
+            available = pcm.wait_for(nominal + window)
+            last = available < nominal + window
+            end = available if last else self._progressive_cut(pcm, nominal, window)
+            if end <= start:
+                return
+
+            audio = pcm.read(start, end)
+            try:
+                if self.backend == "faster-whisper":
+                    raw_segments, info = self.model.transcribe(audio, **_faster_whisper_options(language))
+                    segments = (
+                        self._serialize_faster_whisper_segment(raw_segment, index)
+                        for index, raw_segment in enumerate(raw_segments)
+                    )
+                    detected = getattr(info, 'language', None)
+                else:
+                    result = self._transcribe_with_openai_whisper(Path(), language, audio)
+                    segments, detected = result['segments'], result['language']
+            except Exception as e:
+                raise Exception(f"Transcription failed: {str(e)}")
+            language = language or detected
+            yield start / rate, end / rate, segments, language
+
+            if last:
+                return
+            start = end
+
+    def _progressive_cut(self, pcm, nominal: int, window: int) -> int:
+        """Sample index of the silence midpoint nearest to `nominal`, within `window` samples."""
+        rate = pcm.sample_rate
+        offset = nominal - window
+        midpoints = [
+            offset + int((silence_start + silence_end) / 2 * rate)
+            for silence_start, silence_end in detect_silences(pcm.read(offset, nominal + window), rate)
+        ]
+        return min(midpoints, key=lambda point: abs(point - nominal)) if midpoints else nominal
+
+    def _plan_transcription_spans(self, silences: List[Tuple[float, float]], total_duration: float,
+                                  span_count: int) -> List[Tuple[float, float]]:
+        """Split [0, total_duration] into span_count spans, cutting inside silences when possible.
+
+        Each nominal cut (an even split) moves to the midpoint of the nearest
+        silence within WHISPER_PARALLEL_SEARCH_WINDOW, so no word straddles a seam.
+        """
+        midpoints = [(start + end) / 2 for start, end in silences]
+        cuts = []
+        previous_cut = 0.0
+        for index in range(1, span_count):
+            nominal = total_duration * index / span_count
+            nearby = [
+                point for point in midpoints
+                if abs(point - nominal) <= WHISPER_PARALLEL_SEARCH_WINDOW and point > previous_cut
+            ]
+            cut = min(nearby, key=lambda point: abs(point - nominal)) if nearby else nominal
+            if cut <= previous_cut or cut >= total_duration:
+                continue
+            cuts.append(round(cut, 3))
+            previous_cut = cut
+
+        bounds = [0.0] + cuts + [total_duration]
+        return list(zip(bounds[:-1], bounds[1:]))
+
+    def _stitch_span_segments(self, span_results: List[Tuple[float, List[Dict[str, Any]]]]) -> List[Dict[str, Any]]:
+        """Shift per-span segments/words by their span offset and renumber ids globally."""
+        stitched = []
+        for offset, segments in span_results:
+            for segment in segments:
+                stitched.append(self._shift_segment(segment, offset, len(stitched)))
+        return stitched
+
+    @staticmethod
+    def _shift_segment(segment: Dict[str, Any], offset: float, index: int) -> Dict[str, Any]:
+        return {
+            'id': index,
+            'start': round(segment['start'] + offset, 3),
+            'end': round(segment['end'] + offset, 3),
+            'text': segment['text'],
+            'words': [
+                {
+                    **word,
+                    'start': round(word['start'] + offset, 3),
+                    'end': round(word['end'] + offset, 3),
+                }
+                for word in segment.get('words', [])
+            ],
+        }
+
+    def _transcribe_parallel(self, video_path: Path, language: Optional[str], pcm_path: Path,
+                             audio: Any) -> Dict[str, Any]:
+        """Transcribe silence-aligned spans of the decoded audio in a process pool."""
+        total_duration = len(audio) / AUDIO_SAMPLE_RATE
+        span_count = max(2, min(
+            WHISPER_PARALLEL_WORKERS,
+            int(total_duration // WHISPER_PARALLEL_MIN_SPAN),
+        ))
+        spans = self._plan_transcription_spans(detect_silences(audio), total_duration, span_count)
+        sample_ranges = [
+            (int(start * AUDIO_SAMPLE_RATE), int(end * AUDIO_SAMPLE_RATE))
+            for start, end in spans
+        ]
+
+        with ProcessPoolExecutor(
+            max_workers=min(WHISPER_PARALLEL_WORKERS, len(spans)),
+            initializer=_init_parallel_worker,
+            initargs=(self.model_name, WHISPER_PARALLEL_CPU_THREADS),
+        ) as executor:
+            if not language:
+                # Detect once so every span is decoded in the same language.
+                first_start, first_end = sample_ranges[0]
+                language = executor.submit(
+                    _detect_span_language,
+                    str(pcm_path),
+                    first_start,
+                    min(first_end, first_start + 30 * AUDIO_SAMPLE_RATE),
+                ).result()
+
+            futures = [
+                executor.submit(_transcribe_span, str(pcm_path), start_sample, end_sample, language)
+                for start_sample, end_sample in sample_ranges
+            ]
+            span_results = [
+                (start, future.result())
+                for (start, _), future in zip(spans, futures)
+            ]
+
+        processed_segments = self._stitch_span_segments(span_results)
 
         return {
             'video_path': str(video_path),
-            'language': getattr(info, 'language', 'unknown') or 'unknown',
+            'language': language or 'unknown',
             'duration': processed_segments[-1]['end'] if processed_segments else 0,
             'segments': processed_segments,
             'full_text': ' '.join(segment['text'] for segment in processed_segments).strip(),
         }
 
-    def _transcribe_with_openai_whisper(self, video_path: Path, language: Optional[str]) -> Dict[str, Any]:
+    def _transcribe_with_openai_whisper(self, video_path: Path, language: Optional[str],
+                                        audio: Any = None) -> Dict[str, Any]:
         result = self.model.transcribe(
-            str(video_path),
+            audio if audio is not None else str(video_path),
             language=language,
             task=WHISPER_TASK,
             verbose=False,
@@ -181,25 +529,28 @@ class VideoTranscriber:
         processed_segments = []
 
         for index, segment in enumerate(segments):
-            processed_segment = {
-                'id': getattr(segment, 'id', index),
-                'start': self._to_float(getattr(segment, 'start', 0.0), default=0.0),
-                'end': self._to_float(getattr(segment, 'end', 0.0), default=0.0),
-                'text': (getattr(segment, 'text', '') or '').strip(),
-                'words': [],
-            }
+            processed_segments.append(self._serialize_faster_whisper_segment(segment, index))
 
-            for word in getattr(segment, 'words', None) or []:
-                processed_segment['words'].append({
-                    'word': (getattr(word, 'word', '') or '').strip(),
-                    'start': self._to_float(getattr(word, 'start', 0.0), default=0.0),
-                    'end': self._to_float(getattr(word, 'end', 0.0), default=0.0),
-                    'probability': self._to_float(getattr(word, 'probability', 1.0), default=1.0),
-                })
+        return processed_segments
 
-            processed_segments.append(processed_segment)
+    def _serialize_faster_whisper_segment(self, segment: Any, index: int) -> Dict[str, Any]:
+        processed_segment = {
+            'id': getattr(segment, 'id', index),
+            'start': self._to_float(getattr(segment, 'start', 0.0), default=0.0),
+            'end': self._to_float(getattr(segment, 'end', 0.0), default=0.0),
+            'text': (getattr(segment, 'text', '') or '').strip(),
+            'words': [],
+        }
 
-        return processed_segments
+        for word in getattr(segment, 'words', None) or []:
+            processed_segment['words'].append({
+                'word': (getattr(word, 'word', '') or '').strip(),
+                'start': self._to_float(getattr(word, 'start', 0.0), default=0.0),
+                'end': self._to_float(getattr(word, 'end', 0.0), default=0.0),
+                'probability': self._to_float(getattr(word, 'probability', 1.0), default=1.0),
+            })
+
+        return processed_segment
 
     def _to_float(self, value: Any, default: float) -> float:
         if value is None:
@@ -230,7 +581,11 @@ class VideoTranscriber:
 
         return processed_segments
 
+    # The range helpers accept a plain transcript dict (linear scan) or a
+    # TranscriptIndex built once for repeated queries (bisect).
     def get_text_at_time(self, transcript: Dict, time: float) -> Optional[Dict]:
+        if isinstance(transcript, TranscriptIndex):
+            return transcript.text_at(time)
         for segment in transcript['segments']:
             if segment['start'] <= time <= segment['end']:
                 for word in segment.get('words', []):
@@ -244,6 +599,8 @@ class VideoTranscriber:
         return None
 
     def get_segments_in_range(self, transcript: Dict, start_time: float, end_time: float) -> List[Dict]:
+        if isinstance(transcript, TranscriptIndex):
+            return transcript.segments_in_range(start_time, end_time)
         segments = []
         for segment in transcript['segments']:
             if segment['start'] < end_time and segment['end'] > start_time:
@@ -251,6 +608,8 @@ class VideoTranscriber:
         return segments
 
     def get_words_in_range(self, transcript: Dict, start_time: float, end_time: float) -> List[Dict]:
+        if isinstance(transcript, TranscriptIndex):
+            return transcript.words_in_range(start_time, end_time)
         words = []
         segments = self.get_segments_in_range(transcript, start_time, end_time)
 
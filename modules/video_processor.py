@@ -1,9 +1,17 @@
+import json
+import tempfile
 import ffmpeg
+from bisect import bisect_left
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 
-from config import OUTPUTS_DIR, VIDEO_CODEC, AUDIO_CODEC, CLIP_BUFFER_SECONDS
-from utils.video_metadata import get_video_info as load_video_info
+from config import (
+    OUTPUTS_DIR, VIDEO_CODEC, AUDIO_CODEC, CLIP_BUFFER_SECONDS, VERTICAL_OUTPUT_SIZE,
+    BATCH_EXTRACT_ENABLED, BATCH_EXTRACT_MAX_GAP, BATCH_EXTRACT_MAX_OVERLAP,
+    BATCH_EXTRACT_MAX_OUTPUTS, BATCH_EXTRACT_WORKERS, SMART_CUT_ENABLED, SMART_CUT_TOLERANCE,
+)
+from utils.video_metadata import get_keyframe_times, get_parameter_sets, get_video_info as load_video_info
 
 
 class VideoProcessor:
@@ -11,8 +19,239 @@ class VideoProcessor:
         self.output_dir = output_dir
         self.output_dir.mkdir(exist_ok=True)
         
+    def _vertical_crop(self, width: int, height: int) -> Tuple[int, int, int, int]:
+        """Return (width, height, x, y) of the centered 9:16 crop for a source frame."""
+        target_aspect = 9 / 16
+        current_aspect = width / height
+
+        if current_aspect > target_aspect:
+            # Video is wider than 9:16, crop width
+            new_width = int(height * target_aspect)
+            new_height = height
+            x_offset = (width - new_width) // 2
+            y_offset = 0
+        else:
+            # Video is taller than 9:16, crop height
+            new_width = width
+            new_height = int(width / target_aspect)
+            x_offset = 0
+            y_offset = (height - new_height) // 2
+
+        return new_width, new_height, x_offset, y_offset
+
+    def get_output_dimensions(self, video_path: str, vertical_format: bool = True) -> Tuple[int, int]:
+        """Frame size of clips rendered from video_path (needed to lay out subtitles up front)."""
+        if vertical_format:
+            return VERTICAL_OUTPUT_SIZE
+        video_info = load_video_info(str(video_path))
+        return int(video_info.get('width', 1920)), int(video_info.get('height', 1080))
+
+    def _apply_video_filters(self, video, video_path: Path, vertical_format: bool,
+                             subtitle_file: Optional[str] = None):
+        """Crop/scale for vertical output and burn subtitles on a video stream."""
+        if vertical_format:
+            # Probe once per source file and reuse cached metadata across clips.
+            video_info = load_video_info(str(video_path))
+            new_width, new_height, x_offset, y_offset = self._vertical_crop(
+                int(video_info['width']),
+                int(video_info['height']),
+            )
+            video = ffmpeg.filter(video, 'crop', new_width, new_height, x_offset, y_offset)
+            video = ffmpeg.filter(video, 'scale', *VERTICAL_OUTPUT_SIZE)
+
+        if subtitle_file:
+            # Burning subtitles in the same graph avoids a second decode/encode pass.
+            video = ffmpeg.filter(video, 'ass', subtitle_file)
+
+        return video
+
+    def _output_kwargs(self) -> Dict:
+        return {
+            'vcodec': VIDEO_CODEC,
+            'acodec': AUDIO_CODEC,
+            'preset': 'medium',
+            'crf': 23,
+            'movflags': 'faststart',
+            'b:a': '128k',
+        }
+
+    # ffprobe profile names -> libx264 -profile:v values
+    X264_PROFILES = {
+        'Constrained Baseline': 'baseline',
+        'Baseline': 'baseline',
+        'Main': 'main',
+        'High': 'high',
+        'High 10': 'high10',
+        'High 4:2:2': 'high422',
+        'High 4:4:4 Predictive': 'high444',
+    }
+
+    # SPS/PPS fields that only describe the stream or the NAL wrapping, not how
+    # slices decode; everything else must be identical on both sides of the seam.
+    SEAM_IGNORED_FIELDS = ('forbidden_zero_bit', 'nal_ref_idc', 'nal_unit_type', 'rbsp_')
+
+    @classmethod
+    def _seam_fields(cls, parameter_sets: Dict[str, Dict[str, int]]) -> Dict[str, int]:
+        """Decoding-relevant SPS/PPS fields, flattened as 'sps.name' / 'pps.name'."""
+        fields = {}
+        for name in ('sps', 'pps'):
+            in_vui = False
+            for field, value in parameter_sets.get(name, {}).items():
+                in_vui = in_vui or field == 'vui_parameters_present_flag'
+                # Of the VUI only the reorder/DPB limits change how frames are output
+                if in_vui and field not in ('max_num_reorder_frames', 'max_dec_frame_buffering'):
+                    continue
+                if not field.startswith(cls.SEAM_IGNORED_FIELDS):
+                    fields[f"{name}.{field}"] = value
+        return fields
+
+    @staticmethod
+    def _head_encoder_kwargs(parameter_sets: Dict[str, Dict[str, int]]) -> Optional[Dict]:
+        """libx264 options that reproduce the source's SPS/PPS, or None if they can't."""
+        sps, pps = parameter_sets.get('sps'), parameter_sets.get('pps')
+        if not sps or not pps or 'entropy_coding_mode_flag' not in pps:
+            return None
+        reorder = sps.get('max_num_reorder_frames', 0 if sps.get('pic_order_cnt_type') == 2 else 2)
+        x264_params = {
+            'cabac': pps['entropy_coding_mode_flag'],
+            # x264 derives max_num_ref_frames itself; --ref sets the default active refs
+            'ref': pps.get('num_ref_idx_l0_default_active_minus1', 0) + 1,
+            '8x8dct': pps.get('transform_8x8_mode_flag', 0),
+            'weightp': 2 if pps.get('weighted_pred_flag') else 0,
+            'weightb': 1 if pps.get('weighted_bipred_idc') else 0,
+            # psy-rd at the medium preset lowers the written offset by 2
+            'chroma-qp-offset': pps.get('chroma_qp_index_offset', 0) + 2,
+            # x264 writes 0, 1 or 2 reorder frames for none, plain or pyramid B-frames
+            'bframes': 0 if reorder == 0 else 3,
+            'b-pyramid': 'none' if reorder == 1 else 'normal',
+        }
+        return {
+            'x264-params': ':'.join(f"{key}={value}" for key, value in x264_params.items()),
+            # x264 writes the rate factor as the PPS initial QP
+            'crf': min(max(26 + pps.get('pic_init_qp_minus26', 0), 0), 51),
+        }
+
+    def _seam_decodes_cleanly(self, output_path: Path, seam_time: float) -> bool:
+        """Decode the clip up to a second past the seam and report any decoder error."""
+        try:
+            _, errors = ffmpeg.run(
+                ffmpeg.input(str(output_path), v='error', xerror=None)
+                .output('-', format='null', map='0:v:0', t=seam_time + 1.0),
+                capture_stdout=True, capture_stderr=True,
+            )
+        except ffmpeg.Error as e:
+            errors = e.stderr
+        errors = (errors or b'').decode(errors='replace').strip()
+        if errors:
+            print(f"Smart cut seam failed to decode: {errors[:200]}")
+        return not errors
+
+    def _smart_cut(self, video_path: Path, start_time: float, end_time: float,
+                   output_path: Path) -> bool:
+        """Cut a horizontal clip re-encoding only the partial GOP before the first keyframe.
+
+        Frames from the first keyframe at/after start_time are stream-copied and
+        audio is copied when the source is already AAC. The head is encoded with
+        the source's profile, level, pixel format, track timescale and the x264
+        options that reproduce its SPS/PPS (entropy coder, refs, B-frames...),
+        since the copied frames are decoded with the head's parameter sets.
+        Returns False when the source does not allow it (non-H.264 video, an
+        unknown profile, no keyframe inside the clip, a head whose parameter
+        sets differ from the source, a seam that fails to decode), so the
+        caller can fall back to a full re-encode.
+        """
+        video_info = load_video_info(str(video_path))
+        if video_info.get('video_codec') != 'h264':
+            return False
+        profile = self.X264_PROFILES.get(video_info.get('video_profile'))
+        if profile is None:
+            return False
+
+        keyframes = get_keyframe_times(str(video_path))
+        keyframe_index = bisect_left(keyframes, start_time - SMART_CUT_TOLERANCE)
+        if keyframe_index >= len(keyframes):
+            return False
+        keyframe = keyframes[keyframe_index]
+        if keyframe >= end_time - SMART_CUT_TOLERANCE:
+            # The whole clip sits before the next keyframe: nothing to copy.
+            return False
+
+        # Every part and the output share the source's track timescale
+        time_base = video_info.get('video_time_base', '')
+        timescale = {'video_track_timescale': time_base[2:]} if time_base.startswith('1/') else {}
+
+        with tempfile.TemporaryDirectory(dir=str(self.output_dir)) as temp_dir:
+            temp_dir = Path(temp_dir)
+            parts = []
+
+            if keyframe - start_time > SMART_CUT_TOLERANCE:
+                source_sets = get_parameter_sets(str(video_path))
+                encoder_kwargs = self._head_encoder_kwargs(source_sets)
+                if encoder_kwargs is None:
+                    return False
+                head_path = temp_dir / "head.mp4"
+                head = ffmpeg.input(str(video_path), ss=start_time, t=keyframe - start_time).video
+                head_kwargs = {'vcodec': VIDEO_CODEC, 'preset': 'medium', 'profile:v': profile, **encoder_kwargs, **timescale}
+                if video_info.get('video_level'):
+                    head_kwargs['level'] = f"{video_info['video_level'] / 10:.1f}"
+                if video_info.get('pix_fmt'):
+                    head_kwargs['pix_fmt'] = video_info['pix_fmt']
+                ffmpeg.run(
+                    ffmpeg.output(head, str(head_path), **head_kwargs),
+                    overwrite_output=True, quiet=True,
+                )
+                head_info = load_video_info(str(head_path))
+                mismatched = [
+                    key for key in ('video_profile', 'video_level', 'pix_fmt', 'width', 'height')
+                    if head_info.get(key) != video_info.get(key)
+                ]
+                source_fields = self._seam_fields(source_sets)
+                head_fields = self._seam_fields(get_parameter_sets(str(head_path)))
+                mismatched += sorted(
+                    key for key in source_fields.keys() | head_fields.keys()
+                    if head_fields.get(key) != source_fields.get(key)
+                )
+                if mismatched:
+                    print(f"Smart cut head does not match the source ({', '.join(mismatched)}), re-encoding instead")
+                    return False
+                parts.append(head_path)
+
+            tail_path = temp_dir / "tail.mp4"
+            tail = ffmpeg.input(str(video_path), ss=keyframe, t=end_time - keyframe).video
+            ffmpeg.run(
+                ffmpeg.output(tail, str(tail_path), vcodec='copy', **timescale),
+                overwrite_output=True, quiet=True,
+            )
+            parts.append(tail_path)
+
+            concat_list = temp_dir / "parts.txt"
+            concat_list.write_text(''.join(f"file '{part.name}'\n" for part in parts))
+
+            video = ffmpeg.input(str(concat_list), f='concat', safe=0).video
+            audio = ffmpeg.input(str(video_path), ss=start_time, t=end_time - start_time).audio
+            audio_kwargs = {'acodec': 'copy'}
+            if video_info.get('audio_codec') != 'aac':
+                audio_kwargs = {'acodec': AUDIO_CODEC, 'b:a': '128k'}
+            ffmpeg.run(
+                ffmpeg.output(
+                    video, audio,
+                    str(output_path),
+                    vcodec='copy',
+                    movflags='faststart',
+                    **audio_kwargs,
+                    **timescale
+                ),
+                overwrite_output=True, quiet=True,
+            )
+
+        if not output_path.exists():
+            return False
+        return len(parts) == 1 or self._seam_decodes_cleanly(output_path, keyframe - start_time)
+
     def extract_clip(self, video_path: str, start_time: float, end_time: float, 
-                    output_name: Optional[str] = None, vertical_format: bool = True) -> str:
+                    output_name: Optional[str] = None, vertical_format: bool = True,
+                    subtitle_file: Optional[str] = None) -> str:
+        """Cut, reframe and (optionally) burn an ASS subtitle file in a single ffmpeg run."""
         video_path = Path(video_path)
         if not video_path.exists():
             raise FileNotFoundError(f"Video file not found: {video_path}")
@@ -25,63 +264,36 @@ class VideoProcessor:
             output_filename = f"{video_path.stem}_clip_{int(start_time)}_{int(end_time)}.mp4"
         
         output_path = self.output_dir / output_filename
+
+        if SMART_CUT_ENABLED and not vertical_format and not subtitle_file:
+            # Nothing changes visually, so avoid re-encoding frames we can copy.
+            try:
+                if self._smart_cut(video_path, start_time, end_time, output_path):
+                    return str(output_path)
+            except Exception as e:
+                # Fall back to a full re-encode below
+                if isinstance(e, ffmpeg.Error) and e.stderr:
+                    e = e.stderr.decode(errors='replace').strip().splitlines()[-1]
+                print(f"Smart cut failed for {output_filename}, re-encoding: {e}")
         
         try:
-            # Extract clip segment
-            
+            # Input seeking resets timestamps to 0, so subtitle events are clip-relative.
             input_stream = ffmpeg.input(str(video_path), ss=start_time, t=duration)
-            
-            if vertical_format:
-                # Probe once per source file and reuse cached metadata across clips.
-                video_info = load_video_info(str(video_path))
-                width = int(video_info['width'])
-                height = int(video_info['height'])
-                
-                # Calculate 9:16 crop (vertical format for social media)
-                target_aspect = 9 / 16
-                current_aspect = width / height
-                
-                if current_aspect > target_aspect:
-                    # Video is wider than 9:16, crop width
-                    new_width = int(height * target_aspect)
-                    new_height = height
-                    x_offset = (width - new_width) // 2
-                    y_offset = 0
-                else:
-                    # Video is taller than 9:16, crop height
-                    new_width = width
-                    new_height = int(width / target_aspect)
-                    x_offset = 0
-                    y_offset = (height - new_height) // 2
-                
-                # Split input into video and audio streams
-                video = input_stream.video
-                audio = input_stream.audio
-                
-                # Apply crop and scale filters to video only
-                video = ffmpeg.filter(video, 'crop', new_width, new_height, x_offset, y_offset)
-                video = ffmpeg.filter(video, 'scale', 1080, 1920)
-                
-                # Combine video and audio streams
-                stream = ffmpeg.output(
-                    video, audio,
-                    str(output_path),
-                    vcodec=VIDEO_CODEC,
-                    acodec=AUDIO_CODEC,
-                    preset='medium',
-                    crf=23,
-                    **{'b:a': '128k'}
-                )
-            else:
-                stream = ffmpeg.output(
-                    input_stream,
-                    str(output_path),
-                    vcodec=VIDEO_CODEC,
-                    acodec=AUDIO_CODEC,
-                    preset='medium',
-                    crf=23,
-                    **{'b:a': '128k'}
-                )
+
+            # Filter video only; audio is passed straight to the encoder.
+            video = self._apply_video_filters(
+                input_stream.video,
+                video_path,
+                vertical_format,
+                subtitle_file=subtitle_file,
+            )
+            audio = input_stream.audio
+
+            stream = ffmpeg.output(
+                video, audio,
+                str(output_path),
+                **self._output_kwargs()
+            )
             
             ffmpeg.run(stream, overwrite_output=True, quiet=True)
             
@@ -97,37 +309,217 @@ class VideoProcessor:
         except Exception as e:
             raise Exception(f"Error extracting clip: {str(e)}")
     
+    def _plan_extraction_groups(self, jobs: List[Dict]) -> List[List[int]]:
+        """Group job indices that can share one decode of the source.
+
+        Jobs are swept in start order; a job joins the current group when the
+        source gap to it is short (decoding the gap is cheaper than a new
+        process + seek). Groups whose clips overlap heavily are split back into
+        single jobs: their outputs would all be encoded inside one process,
+        which is slower than encoding them in parallel processes.
+        """
+        order = sorted(range(len(jobs)), key=lambda i: (jobs[i]['start'], jobs[i]['end']))
+
+        groups = []
+        current = []
+        current_end = 0.0
+        for index in order:
+            job = jobs[index]
+            if (
+                current
+                and job['start'] - current_end <= BATCH_EXTRACT_MAX_GAP
+                and len(current) < BATCH_EXTRACT_MAX_OUTPUTS
+            ):
+                current.append(index)
+                current_end = max(current_end, job['end'])
+            else:
+                if current:
+                    groups.append(current)
+                current = [index]
+                current_end = job['end']
+        if current:
+            groups.append(current)
+
+        planned = []
+        for group in groups:
+            span = max(jobs[i]['end'] for i in group) - min(jobs[i]['start'] for i in group)
+            covered = sum(jobs[i]['end'] - jobs[i]['start'] for i in group)
+            if len(group) > 1 and span > 0 and covered / span > BATCH_EXTRACT_MAX_OVERLAP:
+                planned.extend([index] for index in group)
+            else:
+                planned.append(group)
+        return planned
+
+    def _extract_group(self, video_path: Path, jobs: List[Dict], vertical_format: bool) -> List[Dict]:
+        """Render several clips from one ffmpeg process using split + trim branches."""
+        group_start = min(job['start'] for job in jobs)
+        group_end = max(job['end'] for job in jobs)
+        output_paths = [self.output_dir / f"{job['output_name']}.mp4" for job in jobs]
+
+        input_stream = ffmpeg.input(str(video_path), ss=group_start, t=group_end - group_start)
+        # Reframing is identical for every clip, so do it once before splitting.
+        video = self._apply_video_filters(input_stream.video, video_path, vertical_format)
+        video_branches = video.filter_multi_output('split', len(jobs))
+        audio_branches = input_stream.audio.filter_multi_output('asplit', len(jobs))
+
+        outputs = []
+        for branch, (job, output_path) in enumerate(zip(jobs, output_paths)):
+            clip_start = job['start'] - group_start
+            clip_end = job['end'] - group_start
+            branch_video = (
+                video_branches.stream(branch)
+                .trim(start=clip_start, end=clip_end)
+                .setpts('PTS-STARTPTS')
+            )
+            if job.get('subtitle_file'):
+                branch_video = ffmpeg.filter(branch_video, 'ass', job['subtitle_file'])
+            branch_audio = (
+                audio_branches.stream(branch)
+                .filter('atrim', start=clip_start, end=clip_end)
+                .filter('asetpts', 'PTS-STARTPTS')
+            )
+            outputs.append(ffmpeg.output(
+                branch_video, branch_audio,
+                str(output_path),
+                **self._output_kwargs()
+            ))
+
+        ffmpeg.run(ffmpeg.merge_outputs(*outputs), overwrite_output=True, quiet=True)
+
+        results = []
+        for output_path in output_paths:
+            if output_path.exists():
+                results.append({'path': str(output_path), 'error': None})
+            else:
+                results.append({'path': None, 'error': "Output file was not created"})
+        return results
+
+    def _extract_single_job(self, video_path: Path, job: Dict, vertical_format: bool) -> Dict:
+        try:
+            path = self.extract_clip(
+                str(video_path),
+                job['start'],
+                job['end'],
+                job['output_name'],
+                vertical_format=vertical_format,
+                subtitle_file=job.get('subtitle_file'),
+            )
+            return {'path': path, 'error': None}
+        except Exception as e:
+            return {'path': None, 'error': str(e)}
+
+    def extract_clips_batch(self, video_path: str, jobs: List[Dict], vertical_format: bool = True,
+                            max_workers: int = BATCH_EXTRACT_WORKERS) -> List[Dict]:
+        """Extract many clips from one source, sharing decodes between nearby clips.
+
+        Each job is a dict with 'start', 'end', 'output_name' and an optional
+        'subtitle_file'. Returns one {'path', 'error'} dict per job, in job order;
+        a failed clip never aborts the others.
+        """
+        video_path = Path(video_path)
+        if not video_path.exists():
+            raise FileNotFoundError(f"Video file not found: {video_path}")
+        if not jobs:
+            return []
+
+        if SMART_CUT_ENABLED and not vertical_format:
+            # Stream-copied clips are cheaper one by one than through a shared decode.
+            shared = [index for index, job in enumerate(jobs) if job.get('subtitle_file')]
+        else:
+            shared = list(range(len(jobs)))
+        shared_set = set(shared)
+        solo = [[index] for index in range(len(jobs)) if index not in shared_set]
+
+        if BATCH_EXTRACT_ENABLED and shared:
+            planned = self._plan_extraction_groups([jobs[index] for index in shared])
+            groups = [[shared[position] for position in group] for group in planned] + solo
+        else:
+            groups = [[index] for index in shared] + solo
+
+        results: List[Optional[Dict]] = [None] * len(jobs)
+
+        def run_group(group):
+            if len(group) == 1:
+                return group, [self._extract_single_job(video_path, jobs[group[0]], vertical_format)]
+            try:
+                return group, self._extract_group(video_path, [jobs[i] for i in group], vertical_format)
+            except Exception:
+                # Fall back to one process per clip so each failure is reported individually.
+                return group, [self._extract_single_job(video_path, jobs[i], vertical_format) for i in group]
+
+        with ThreadPoolExecutor(max_workers=max(1, min(max_workers, len(groups)))) as executor:
+            for group, group_results in executor.map(run_group, groups):
+                for index, result in zip(group, group_results):
+                    results[index] = result
+
+        return results
+
+    def extract_clips_from_ranges(self, ranges: List[Dict], jobs: List[Dict],
+                                  vertical_format: bool = True) -> List[Dict]:
+        """extract_clips_batch over partial downloads (YouTubeDownloader.download_ranges).
+
+        Each job is cut from the range file covering it, with its times shifted
+        to that file. Returns one {'path', 'error'} dict per job, in job order.
+        """
+        results: List[Optional[Dict]] = [None] * len(jobs)
+        by_range = {}
+        for index, job in enumerate(jobs):
+            covering = next(
+                (item for item in ranges if item['start'] <= job['start'] and job['end'] <= item['end']), None
+            )
+            if covering is None:
+                results[index] = {
+                    'path': None,
+                    'error': f"No downloaded range covers {job['start']:.1f}s-{job['end']:.1f}s",
+                }
+                continue
+            by_range.setdefault(covering['filepath'], (covering, []))[1].append(index)
+
+        for range_path, (covering, indices) in by_range.items():
+            shifted = [
+                {**jobs[i], 'start': jobs[i]['start'] - covering['start'], 'end': jobs[i]['end'] - covering['start']}
+                for i in indices
+            ]
+            try:
+                range_results = self.extract_clips_batch(range_path, shifted, vertical_format=vertical_format)
+            except Exception as e:
+                range_results = [{'path': None, 'error': str(e)} for _ in indices]
+            for index, result in zip(indices, range_results):
+                results[index] = result
+
+        return results
+
     def extract_multiple_clips(self, video_path: str, moments: List[Dict], 
                              prefix: str = "viral_clip") -> List[str]:
+        jobs = [
+            {
+                'start': moment['start'],
+                'end': moment['end'],
+                'output_name': f"{prefix}_{i+1}_score_{moment['score']:.1f}",
+            }
+            for i, moment in enumerate(moments)
+        ]
+        results = self.extract_clips_batch(video_path, jobs)
+
         output_paths = []
-        
-        for i, moment in enumerate(moments):
-            try:
-                output_name = f"{prefix}_{i+1}_score_{moment['score']:.1f}"
-                output_path = self.extract_clip(
-                    video_path,
-                    moment['start'],
-                    moment['end'],
-                    output_name
-                )
-                output_paths.append(output_path)
-                
-                metadata_path = Path(output_path).with_suffix('.json')
-                import json
-                with open(metadata_path, 'w') as f:
-                    json.dump({
-                        'original_video': str(video_path),
-                        'start_time': moment['start'],
-                        'end_time': moment['end'],
-                        'duration': moment['duration'],
-                        'score': moment['score'],
-                        'reason': moment['reason'],
-                        'text_preview': moment.get('text', '')
-                    }, f, indent=2)
-                    
-            except Exception as e:
+        for moment, result in zip(moments, results):
+            if result['error']:
                 # Failed to extract clip
                 continue
+            output_path = result['path']
+            output_paths.append(output_path)
+
+            metadata_path = Path(output_path).with_suffix('.json')
+            with open(metadata_path, 'w') as f:
+                json.dump({
+                    'original_video': str(video_path),
+                    'start_time': moment['start'],
+                    'end_time': moment['end'],
+                    'duration': moment['duration'],
+                    'score': moment['score'],
+                    'reason': moment['reason'],
+                    'text_preview': moment.get('text', '')
+                }, f, indent=2)
         
         return output_paths
     
@@ -0,0 +1,64 @@
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+def extract_signals(info_dict: Dict[str, Any]) -> Dict[str, List[Dict[str, Any]]]:
+    """The 'heatmap' (most replayed) and 'chapters' of a yt-dlp info dict, for the video metadata.
+
+    Heatmap markers become {'start', 'end', 'value'} with value in [0, 1] (1 is
+    the most replayed moment); chapters become {'start', 'end', 'title'}.
+    Either list is empty when YouTube does not provide it.
+    """
+    heatmap = [
+        {
+            'start': float(marker['start_time']),
+            'end': float(marker['end_time']),
+            'value': float(marker.get('value') or 0.0),
+        }
+        for marker in info_dict.get('heatmap') or []
+        if marker.get('start_time') is not None and marker.get('end_time') is not None
+    ]
+    chapters = [
+        {
+            'start': float(chapter['start_time']),
+            'end': float(chapter['end_time']),
+            'title': chapter.get('title') or '',
+        }
+        for chapter in info_dict.get('chapters') or []
+        if chapter.get('start_time') is not None and chapter.get('end_time') is not None
+    ]
+    return {'heatmap': heatmap, 'chapters': chapters}
+
+
+def replay_scores(spans: Sequence[Tuple[float, float]], heatmap: Optional[List[Dict[str, float]]]) -> List[float]:
+    """How far each (start, end) span peaks above the video's typical replay level, in [0, 1].
+
+    The peak is the highest heatmap marker overlapping the span, measured from
+    the median marker (0) to the most replayed one (1). Without a heatmap every
+    span scores 0.
+    """
+    if not heatmap:
+        return [0.0] * len(spans)
+    starts = np.array([marker['start'] for marker in heatmap])
+    ends = np.array([marker['end'] for marker in heatmap])
+    values = np.array([marker['value'] for marker in heatmap])
+    median = float(np.median(values))
+    spread = float(values.max()) - median
+    if spread <= 0:
+        return [0.0] * len(spans)
+
+    scores = []
+    for start, end in spans:
+        overlapping = (starts < end) & (ends > start)
+        if not overlapping.any():
+            scores.append(0.0)
+            continue
+        peak = float(values[overlapping].max())
+        scores.append(max(0.0, (peak - median) / spread))
+    return scores
+
+
+def chapter_starts(chapters: Optional[List[Dict[str, Any]]]) -> List[float]:
+    """Sorted chapter start times after the beginning of the video, usable as chunk boundaries."""
+    return sorted({chapter['start'] for chapter in chapters or [] if chapter['start'] > 0})
@@ -1,3 +1,5 @@
+import json
+
 import pytest
 
 pytest.importorskip("ollama")
@@ -85,3 +87,658 @@ def test_prefilter_ranks_hook_heavy_chunk_first():
 
     assert hook_score > bland_score
     assert ranked[0] is hook_chunk
+
+
+def test_streamed_sliding_windows_close_before_the_transcript_ends():
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    segments = _build_segments(count=20, duration=3.0)
+    delivered = []
+
+    def live_segments():
+        for segment in segments:
+            delivered.append(segment)
+            yield segment
+
+    chunks = analyzer._iter_sliding_chunks(live_segments())
+    first = next(chunks)
+
+    assert first["start"] == 0.0
+    assert len(delivered) < len(segments)
+    assert [first] + list(chunks) == _naive_sliding_chunks(segments, window=45, overlap=15)
+
+
+class _FakeTranscriptStream:
+    def __init__(self, segments):
+        self.segments = segments
+        self.language = "en"
+        self.transcript = None
+
+    def __iter__(self):
+        yield from self.segments
+        # Like TranscriptStream, the full transcript is set once the segments run out
+        self.transcript = {
+            "language": self.language,
+            "duration": self.segments[-1]["end"],
+            "segments": self.segments,
+            "full_text": " ".join(segment["text"] for segment in self.segments),
+        }
+
+
+def test_stream_analysis_scores_every_window(monkeypatch):
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    analyzer.provider = "ollama"
+    analyzer.enable_cache = False
+    segments = _build_segments(count=20, duration=3.0)
+    monkeypatch.setattr(
+        analyzer,
+        "_analyze_chunk",
+        lambda text, language: (9.0, "hook") if "segment 10" in text else (2.0, ""),
+    )
+
+    moments = analyzer.analyze_transcript_stream(_FakeTranscriptStream(segments))
+
+    assert moments
+    assert all(moment["score"] == 9.0 for moment in moments)
+    assert all(moment["start"] <= 30.0 < moment["end"] for moment in moments)
+
+
+def test_stream_analysis_scores_chapters_and_caches_the_result(monkeypatch, tmp_path):
+    from modules import analyzer as analyzer_module
+
+    monkeypatch.setattr(analyzer_module, "CHUNK_CHAPTER_HINTS", True)
+    monkeypatch.setattr(analyzer_module, "CHUNK_STRATEGY", "sliding")
+    analyzer = _cached_analyzer(tmp_path)
+    analyzer.score_stage = "final"
+    analyzer.prefilter_model = None
+    analyzer.screen_analyzer = None
+    segments = _build_segments(count=20, duration=3.0)
+    signals = {"chapters": [{"start": 0.0, "title": "Intro"}, {"start": 21.0, "title": "Main"}]}
+    scored = []
+
+    def score(text, language):
+        scored.append(text)
+        return (9.0, "hook") if "segment 10" in text else (2.0, "")
+
+    monkeypatch.setattr(analyzer, "_analyze_chunk", score)
+    stream = _FakeTranscriptStream(segments)
+
+    moments = analyzer.analyze_transcript_stream(stream, video_signals=signals)
+
+    # The chapter at 21s opens a window of its own next to the sliding ones
+    assert [text for text in scored if text.startswith("segment 7 ")]
+    calls = len(scored)
+    assert analyzer.analyze_transcript(stream.transcript, video_signals=signals) == moments
+    assert len(scored) == calls
+
+
+def _naive_snap(transcript, time, boundary_type):
+    best_time = time
+    min_distance = float("inf")
+    key = "start" if boundary_type == "start" else "end"
+    for segment in transcript["segments"]:
+        candidates = [word[key] for word in segment["words"]] if segment.get("words") else [segment[key]]
+        for candidate in candidates:
+            distance = abs(candidate - time)
+            if distance < min_distance and distance < 0.5:
+                min_distance = distance
+                best_time = candidate
+    return best_time
+
+
+def test_boundary_index_matches_linear_snapping_and_sentence_checks():
+    import random
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    rng = random.Random(5)
+    segments = []
+    current = 0.0
+    for index in range(120):
+        words = []
+        for word_index in range(rng.randint(0, 4)):
+            words.append({"word": "w", "start": round(current, 2), "end": round(current + 0.3, 2)})
+            current += rng.choice([0.3, 0.4, 0.5])
+        end = round(current + 0.2, 2)
+        text = rng.choice(["Hello there.", "and then", "What now?", "so, okay,", "But wait"])
+        segments.append({"start": words[0]["start"] if words else round(current, 2), "end": end, "text": text, "words": words})
+        current = end + rng.choice([0.0, 0.6, 1.0])
+    transcript = {"duration": current, "segments": segments}
+
+    boundary_index = analyzer._build_boundary_index(transcript)
+
+    for i, segment in enumerate(segments):
+        assert boundary_index["sentence_start"][i] == analyzer._is_sentence_start(segment["text"], i, segments)
+        assert boundary_index["sentence_end"][i] == analyzer._is_sentence_end(segment["text"], i, segments)
+    for _ in range(500):
+        time = round(rng.uniform(-1.0, current + 1.0), 2)
+        for boundary_type in ("start", "end"):
+            expected = _naive_snap(transcript, time, boundary_type)
+            assert analyzer._snap_to_word_boundary(transcript, time, boundary_type, boundary_index) == expected
+
+
+def _cached_analyzer(tmp_path, model_name="llama3.2:latest"):
+    import threading
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    analyzer.provider = "ollama"
+    analyzer.model_name = model_name
+    analyzer.enable_cache = True
+    analyzer.cache_dir = tmp_path
+    analyzer.chunk_cache_dir = tmp_path / "chunks"
+    analyzer._chunk_cache_lock = threading.Lock()
+    analyzer._chunk_cache_hits = 0
+    analyzer._chunk_cache_writes = 0
+    return analyzer
+
+
+def test_chunk_scores_are_cached_per_text_and_model(monkeypatch, tmp_path):
+    calls = []
+
+    def fake_request(text, language):
+        calls.append(text)
+        if "broken" in text:
+            raise RuntimeError("provider down")
+        return 8.0, "strong hook", True
+
+    analyzer = _cached_analyzer(tmp_path)
+    monkeypatch.setattr(analyzer, "_request_chunk_score", fake_request)
+
+    assert analyzer._analyze_chunk("same window", "en") == (8.0, "strong hook")
+    assert analyzer._analyze_chunk("same window", "en") == (8.0, "strong hook")
+    assert analyzer._analyze_chunk("broken window", "en") == (0.0, "Analysis failed")
+    assert analyzer._analyze_chunk("broken window", "en") == (0.0, "Analysis failed")
+    assert calls == ["same window", "broken window", "broken window"]
+    assert analyzer._chunk_cache_hits == 1
+
+    other_model = _cached_analyzer(tmp_path, model_name="qwen3:8b")
+    monkeypatch.setattr(other_model, "_request_chunk_score", fake_request)
+    other_model._analyze_chunk("same window", "en")
+    assert calls[-1] == "same window"
+
+
+
+def test_uncached_chunks_are_scored_through_the_provider_call(monkeypatch, tmp_path):
+    responses = iter([
+        '{"overall_score": 7.5, "reason": "sharp punchline"}',
+        "no score in here",
+    ])
+    analyzer = _cached_analyzer(tmp_path)
+    monkeypatch.setattr(analyzer, "_call_ollama", lambda prompt, *args, **kwargs: next(responses))
+
+    assert analyzer._analyze_chunk("scored window", "en") == (7.5, "sharp punchline")
+    assert analyzer._analyze_chunk("scored window", "en") == (7.5, "sharp punchline")
+    assert analyzer._chunk_cache_hits == 1
+
+    # Unparseable replies still score (0.0) but are not cached
+    assert analyzer._analyze_chunk("garbled window", "en")[0] == 0.0
+    assert not analyzer._chunk_cache_path("garbled window", "en").exists()
+
+def test_cache_pruning_evicts_least_recently_used_files(tmp_path):
+    import os
+
+    from utils.helpers import prune_cache_dir
+
+    for index in range(5):
+        path = tmp_path / "shard" / f"{index}.json"
+        path.parent.mkdir(exist_ok=True)
+        path.write_text("x" * 100)
+        os.utime(path, (1000 + index, 1000 + index))
+
+    assert prune_cache_dir(tmp_path, max_entries=3) == 2
+    assert sorted(path.name for path in tmp_path.rglob("*.json")) == ["2.json", "3.json", "4.json"]
+    assert prune_cache_dir(tmp_path, max_bytes=150) == 2
+    assert [path.name for path in tmp_path.rglob("*.json")] == ["4.json"]
+
+
+def test_analysis_cache_is_swept_only_occasionally(monkeypatch, tmp_path):
+    from modules import analyzer as analyzer_module
+
+    sweeps = []
+    monkeypatch.setattr(analyzer_module, "prune_cache_dir", lambda cache_dir, **kwargs: sweeps.append(cache_dir) or 0)
+    monkeypatch.setattr(analyzer_module, "ANALYSIS_CACHE_PRUNE_WRITES", 3)
+    analyzer = _cached_analyzer(tmp_path)
+    analyzer.score_stage = "final"
+
+    analyzer._prune_caches()
+    assert len(sweeps) == 2
+    analyzer._prune_caches()
+    assert len(sweeps) == 2
+
+    for index in range(3):
+        analyzer._save_chunk_score(f"chunk {index}", "en", 5.0, "")
+    analyzer._prune_caches()
+    assert len(sweeps) == 4
+    analyzer._prune_caches()
+    assert len(sweeps) == 4
+
+
+def test_single_prompt_scores_are_parsed_and_cached(monkeypatch, tmp_path):
+    prompts = []
+    analyzer = _cached_analyzer(tmp_path)
+
+    def fake_call(prompt, max_tokens=None, **kwargs):
+        prompts.append(prompt)
+        return '{"overall_score": 7.5, "reason": "big reveal"}'
+
+    monkeypatch.setattr(analyzer, "_call_llm", fake_call)
+
+    assert analyzer._analyze_chunk("the secret is out", "en") == (7.5, "big reveal")
+    assert analyzer._analyze_chunk("the secret is out", "en") == (7.5, "big reveal")
+    assert len(prompts) == 1
+    assert "the secret is out" in prompts[0]
+
+
+def test_batched_scoring_falls_back_for_missing_ids(monkeypatch, tmp_path):
+    prompts = []
+    analyzer = _cached_analyzer(tmp_path)
+
+    def fake_call(prompt, max_tokens=None, **kwargs):
+        prompts.append(prompt)
+        if "[1]" in prompt:
+            return (
+                '<think>scoring</think>[{"id": 1, "overall_score": 8, "reason": "hook"},'
+                ' {"id": 3, "overall_score": 11, "reason": "wild"}, {"id": "x"}]'
+            )
+        return '{"overall_score": 4, "reason": "flat"}'
+
+    monkeypatch.setattr(analyzer, "_call_llm", fake_call)
+
+    results = analyzer._analyze_chunk_batch(["alpha", "beta", "gamma"], "en")
+
+    assert results == [(8.0, "hook"), (4.0, "flat"), (10.0, "wild")]
+    assert len(prompts) == 2
+    assert prompts[0].count("PRIORITIZE") == 1
+    # Batched scores and the single-prompt fallback are each cached under their own prompt.
+    assert analyzer._analyze_chunk_batch(["alpha", "beta", "gamma"], "en") == results
+    assert len(prompts) == 2
+    assert analyzer._analyze_chunk("beta", "en") == (4.0, "flat")
+    assert len(prompts) == 2
+    assert analyzer._analyze_chunk("alpha", "en") == (4.0, "flat")
+    assert len(prompts) == 3
+
+
+def test_batch_prompt_format_matches_the_enforced_schema(monkeypatch):
+    import json
+
+    from modules import analyzer as analyzer_module
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    schema = ViralMomentAnalyzer.BATCH_SCORE_SCHEMA
+    for language in ("en", "fr"):
+        monkeypatch.setattr(analyzer_module, "LLM_STRUCTURED_OUTPUT", True)
+        example = json.loads(analyzer._build_batch_score_prompt(["a", "b"], language).splitlines()[-1])
+        assert set(example) == set(schema["required"])
+        assert set(example["results"][0]) == set(schema["properties"]["results"]["items"]["required"])
+
+        monkeypatch.setattr(analyzer_module, "LLM_STRUCTURED_OUTPUT", False)
+        assert isinstance(json.loads(analyzer._build_batch_score_prompt(["a", "b"], language).splitlines()[-1]), list)
+
+
+def test_chunk_packing_respects_worker_count_and_context(monkeypatch):
+    from modules import analyzer as analyzer_module
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    analyzer.provider = "ollama"
+    chunks = [{"text": "word " * 100} for _ in range(20)]
+
+    assert [len(pack) for pack in analyzer._pack_chunks(chunks, max_workers=1)] == [8, 8, 4]
+    assert [len(pack) for pack in analyzer._pack_chunks(chunks, max_workers=10)] == [2] * 10
+
+    monkeypatch.setitem(analyzer_module.LLM_CONTEXT_TOKENS, "ollama", 2000)
+    assert [len(pack) for pack in analyzer._pack_chunks(chunks, max_workers=1)] == [2] * 10
+
+
+def _queue_analyzer(monkeypatch, scorer, workers=3):
+    from modules import analyzer as analyzer_module
+
+    monkeypatch.setattr(analyzer_module, "ANALYSIS_BATCH_SCORING", False)
+    monkeypatch.setattr(analyzer_module, "ANALYSIS_TARGET_MOMENTS", 5)
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    analyzer.provider = "openai"
+    monkeypatch.setattr(analyzer, "_max_workers", lambda: workers)
+    monkeypatch.setattr(analyzer, "_analyze_chunk", scorer)
+    return analyzer
+
+
+def test_scoring_queue_stops_expanding_once_target_is_met(monkeypatch):
+    chunks = [{"start": float(i), "end": i + 1.0, "text": f"chunk {i}"} for i in range(40)]
+    hits = {"chunk 2", "chunk 5", "chunk 12", "chunk 13", "chunk 14"}
+    analyzer = _queue_analyzer(monkeypatch, lambda text, language: (9.0, "hit") if text in hits else (1.0, ""))
+
+    analyzed, moments = analyzer._run_scoring_queue(chunks, 10, "en", threshold=6.0, early_stop=True)
+
+    analyzed_texts = {item["chunk"]["text"] for item in analyzed}
+    assert {f"chunk {i}" for i in range(15)} <= analyzed_texts
+    assert len(analyzed) <= 17
+    assert len(moments) == 5
+
+
+def test_scoring_queue_counts_overlapping_hits_as_one_moment(monkeypatch):
+    # Sliding windows 0-2, 1-3, ... : five hits on consecutive windows are one moment.
+    chunks = [{"start": float(i), "end": i + 2.0, "text": f"chunk {i}"} for i in range(40)]
+    hits = {f"chunk {i}" for i in range(5)}
+    analyzer = _queue_analyzer(monkeypatch, lambda text, language: (9.0, "hit") if text in hits else (1.0, ""))
+
+    analyzed, moments = analyzer._run_scoring_queue(chunks, 10, "en", threshold=6.0, early_stop=True)
+
+    assert len(moments) == 5
+    assert len(analyzed) == 40
+
+
+def test_scoring_queue_keeps_workers_busy_past_a_slow_call(monkeypatch):
+    import threading
+
+    expansion_started = threading.Event()
+    waited = []
+
+    def scorer(text, language):
+        index = int(text.split()[1])
+        if index == 0:
+            # A barrier-synchronized loop would never start the expansion while this call runs.
+            waited.append(expansion_started.wait(timeout=2.0))
+        elif index >= 3:
+            expansion_started.set()
+        return 1.0, ""
+
+    chunks = [{"start": float(i), "end": i + 1.0, "text": f"chunk {i}"} for i in range(8)]
+    analyzer = _queue_analyzer(monkeypatch, scorer)
+
+    analyzed, _ = analyzer._run_scoring_queue(chunks, 3, "en", threshold=6.0, early_stop=True)
+
+    assert waited == [True]
+    assert len(analyzed) == 8
+
+
+def test_cascade_rescores_top_and_borderline_chunks(monkeypatch):
+    from modules import analyzer as analyzer_module
+
+    monkeypatch.setattr(analyzer_module, "ANALYSIS_CASCADE_TOP_N", 2)
+    monkeypatch.setattr(analyzer_module, "ANALYSIS_CASCADE_BORDERLINE", 1.5)
+    chunks = [{"start": float(i), "end": i + 1.0, "text": f"chunk {i}"} for i in range(10)]
+    screen_scores = {"chunk 3": 9.0, "chunk 7": 8.0, "chunk 1": 5.0, "chunk 4": 4.0}
+    final_texts = []
+
+    def final_score(text, language):
+        final_texts.append(text)
+        return (7.5, "confirmed") if text == "chunk 1" else (3.0, "meh")
+
+    screen = _queue_analyzer(monkeypatch, lambda text, language: (screen_scores.get(text, 1.0), "screen"))
+    screen.score_stage = "screen"
+    analyzer = _queue_analyzer(monkeypatch, final_score)
+    analyzer.model_name = "big-model"
+    analyzer.screen_analyzer = screen
+
+    analyzed, moments = analyzer._run_cascade(chunks, len(chunks), "en", threshold=6.0, early_stop=False)
+
+    # Top 2 plus chunk 1, which is within 1.5 of the threshold; chunk 4 is not.
+    assert sorted(final_texts) == ["chunk 1", "chunk 3", "chunk 7"]
+    assert [(m["text"], m["score_stage"]) for m in moments] == [("chunk 1", "final")]
+    stages = {item["chunk"]["text"]: item["score_stage"] for item in analyzed}
+    assert len(stages) == 10
+    assert stages["chunk 3"] == "final" and stages["chunk 4"] == "screen"
+
+
+def test_structured_output_requests_per_provider(monkeypatch, tmp_path):
+    from types import SimpleNamespace
+
+    from modules import analyzer as analyzer_module
+
+    reply = '{"emotional_impact": 8, "surprise_drama": 7, "quotability": 6, "hook_power": 9, ' \
+            '"overall_score": 8, "moment_type": "reveal", "reason": "big reveal"}'
+    requests = {}
+
+    class _FakePool:
+        def chat(self, **kwargs):
+            requests["ollama"] = kwargs
+            return {'message': {'content': reply}}
+
+    def _create_openai(**kwargs):
+        requests["openai"] = kwargs
+        return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=reply))])
+
+    def _create_anthropic(**kwargs):
+        requests["anthropic"] = kwargs
+        return SimpleNamespace(content=[SimpleNamespace(type="tool_use", input=json.loads(reply))])
+
+    monkeypatch.setattr(analyzer_module, "get_ollama_pool", lambda: _FakePool())
+    analyzer = _cached_analyzer(tmp_path)
+    analyzer.enable_cache = False
+    analyzer.openai_client = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=_create_openai)))
+    analyzer.anthropic_client = SimpleNamespace(messages=SimpleNamespace(create=_create_anthropic))
+
+    for provider, model in (("ollama", "llama3.2:latest"), ("openai", "gpt-5-mini"), ("anthropic", "claude")):
+        analyzer.provider = provider
+        analyzer.model_name = model
+        assert analyzer._analyze_chunk("the secret is out", "en") == (8.0, "big reveal")
+
+    assert requests["ollama"]["format"] == ViralMomentAnalyzer.SCORE_SCHEMA
+    assert requests["ollama"]["options"]["num_predict"] == analyzer_module.LLM_SCORE_MAX_TOKENS
+    assert requests["openai"]["response_format"]["json_schema"]["strict"] is True
+    # Reasoning models keep their thinking budget on top of the reply cap
+    assert requests["openai"]["max_completion_tokens"] == (
+        analyzer_module.LLM_SCORE_MAX_TOKENS + analyzer_module.LLM_REASONING_TOKENS
+    )
+    assert requests["anthropic"]["tool_choice"] == {"type": "tool", "name": "viral_score"}
+    assert requests["anthropic"]["max_tokens"] == analyzer_module.LLM_SCORE_MAX_TOKENS
+
+    monkeypatch.setattr(analyzer_module, "LLM_STRUCTURED_OUTPUT", False)
+    analyzer.provider = "ollama"
+    analyzer._analyze_chunk("the secret is out", "en")
+    assert "format" not in requests["ollama"]
+    assert "num_predict" not in requests["ollama"]["options"]
+
+
+def test_learned_prefilter_trains_from_chunk_cache_and_ranks(monkeypatch, tmp_path):
+    from modules import analyzer as analyzer_module
+
+    monkeypatch.setattr(analyzer_module, "PREFILTER_MODEL_MIN_SAMPLES", 10)
+    cache = _cached_analyzer(tmp_path)
+    for index in range(60):
+        # "giraffe" is no heuristic keyword, so only the learned model can pick it up
+        text = f"the giraffe story number {index}" if index % 3 == 0 else f"calm update about item {index}"
+        cache._save_chunk_score(text, "en", 9.0 if "giraffe" in text else 2.0, "")
+    cache.score_stage = "screen"
+    cache._save_chunk_score("the giraffe screened only", "en", 1.0, "")
+
+    model_path = tmp_path / "prefilter_model.npz"
+    model = ViralMomentAnalyzer.train_prefilter_model(tmp_path / "chunks", model_path)
+    assert model.trained_on == 60
+    loaded = analyzer_module.PrefilterModel.load(model_path)
+    assert loaded.digest == model.digest
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    analyzer.prefilter_model = loaded
+    chunks = [
+        {"start": float(i), "end": i + 30.0, "segments": [],
+         "text": "a giraffe walked in today" if i == 33 else f"plain remark {i}"}
+        for i in range(40)
+    ]
+    ranked, initial_limit = analyzer._rank_chunks_for_analysis(chunks, "en")
+
+    assert ranked[0]["start"] == 33.0
+    assert initial_limit == len(chunks) or initial_limit >= analyzer_module.ANALYSIS_MIN_CANDIDATES
+
+
+def test_segment_prefilter_matches_per_chunk_features(monkeypatch):
+    import random
+
+    from modules.prefilter_engine import SegmentPrefilter
+
+    monkeypatch.setitem(
+        ViralMomentAnalyzer.PREFILTER_PHRASES, "en",
+        ("no way", "no way out", "la la", "here's why", "wait for it"),
+    )
+    rng = random.Random(7)
+    pieces = [
+        "no", "way", "out", "la", "here's", "why", "Wait", "for it!", "SECRET", "secrets", "never's",
+        "why?", "42", "7", "$5", "x12", "--", "", "   ", "\"quote\":", "what", "Ça", "vérité",
+    ]
+    segments = []
+    current = 0.0
+    for _ in range(300):
+        text = " ".join(rng.choice(pieces) for _ in range(rng.randint(0, 4)))
+        if rng.random() < 0.5:
+            text = " " + text
+        duration = rng.uniform(0.5, 4.0)
+        segments.append({"start": current, "end": current + duration, "text": text})
+        current += duration + rng.choice([0.0, 0.3, 0.5, 0.9])
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    for chunks in (
+        analyzer._create_sliding_chunks(segments),
+        analyzer._create_chunks(segments, 20),
+        analyzer._create_smart_chunks(segments, 10),
+    ):
+        expected = [analyzer._prefilter_features(chunk, "en") for chunk in chunks]
+        engine = SegmentPrefilter(
+            segments, ViralMomentAnalyzer.PREFILTER_KEYWORDS["en"], ViralMomentAnalyzer.PREFILTER_PHRASES["en"]
+        )
+        assert engine.features(chunks) == expected
+        assert analyzer._prefilter_feature_rows(chunks, "en") == expected
+        assert any(features and features["phrases"] for features in expected)
+
+
+def test_overlapping_moments_are_suppressed_and_adjacent_ones_merged(monkeypatch):
+    from modules import analyzer as analyzer_module
+
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    moments = [
+        {"start": 0.0, "end": 45.0, "duration": 45.0, "score": 7.0, "reason": "a", "text": "a"},
+        {"start": 30.0, "end": 75.0, "duration": 45.0, "score": 9.0, "reason": "b", "text": "b"},
+        {"start": 32.0, "end": 74.0, "duration": 42.0, "score": 8.0, "reason": "c", "text": "c"},
+        {"start": 200.0, "end": 230.0, "duration": 30.0, "score": 6.5, "reason": "d", "text": "d"},
+    ]
+
+    # c is nearly identical to the better b; a shares only 15 s with b
+    kept = analyzer.suppress_overlapping_moments([dict(m) for m in moments], iou_threshold=0.3)
+    assert [m["reason"] for m in kept] == ["a", "b", "d"]
+    assert analyzer.suppress_overlapping_moments(moments[:1] * 2, iou_threshold=1.0) == moments[:1] * 2
+
+    monkeypatch.setattr(analyzer_module, "MAX_CLIP_LENGTH", 80)
+    merged = analyzer._merge_adjacent_moments(kept)
+    assert [(m["start"], m["end"], m["score"], m["reason"]) for m in merged] == [
+        (0.0, 75.0, 9.0, "b"), (200.0, 230.0, 6.5, "d")
+    ]
+    monkeypatch.setattr(analyzer_module, "MAX_CLIP_LENGTH", 60)
+    assert len(analyzer._merge_adjacent_moments(kept)) == 3
+
+
+def test_curve_selection_matches_brute_force_and_snaps_to_sentences(monkeypatch):
+    import itertools
+    import random
+
+    import numpy as np
+    from modules import analyzer as analyzer_module
+    from modules.moment_curve import score_curve, select_intervals
+
+    rng = random.Random(7)
+    curve = np.array([rng.uniform(0, 10) for _ in range(40)])
+    starts, ends = [0, 5, 9, 14, 20, 27, 31], [6, 10, 15, 19, 26, 33, 40]
+    picked = select_intervals(curve, starts, ends, 4, 12, baseline=5.0, max_count=2)
+
+    def gain(interval):
+        return curve[interval[0]:interval[1]].sum() - 5.0 * (interval[1] - interval[0])
+
+    candidates = [(s, e) for s in starts for e in ends if 4 <= e - s <= 12 and gain((s, e)) > 0]
+    best = max(
+        sum(gain(c) for c in combo)
+        for size in range(3)
+        for combo in itertools.combinations(candidates, size)
+        if all(a[1] <= b[0] or b[1] <= a[0] for a, b in itertools.combinations(combo, 2))
+    )
+    assert sum(gain((int(s), int(e))) for s, e, _ in picked) == pytest.approx(best)
+
+    # Overlapping windows blend: the hot spot sits where both high windows overlap
+    assert score_curve([(0, 10, 8.0), (5, 15, 8.0), (10, 20, 2.0)], 20)[7] == pytest.approx(8.0)
+
+    monkeypatch.setattr(analyzer_module, "MIN_CLIP_LENGTH", 8)
+    monkeypatch.setattr(analyzer_module, "MAX_CLIP_LENGTH", 20)
+    segments = [{"start": i * 4.0, "end": i * 4.0 + 4.0, "text": f"Sentence {i}."} for i in range(20)]
+    analyzed = [
+        {"chunk": {"start": s, "end": s + 16.0, "text": ""}, "score": score, "reason": f"r{s:.0f}"}
+        for s, score in [(0.0, 2.0), (12.0, 9.0), (24.0, 8.5), (36.0, 3.0), (48.0, 2.0), (60.0, 2.0)]
+    ]
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    analyzer.score_stage = "final"
+    moments = analyzer._select_moments_from_curve(analyzed, {"segments": segments, "duration": 80.0}, 5.0)
+
+    assert moments and all(m["start"] % 4 == 0 and m["end"] % 4 == 0 for m in moments)
+    assert all(8 <= m["duration"] <= 20 for m in moments)
+    assert moments[0]["start"] >= 12.0 and moments[0]["end"] <= 40.0 and moments[0]["score"] > 7.0
+    assert moments[0]["text"].startswith("Sentence")
+
+
+def test_curve_clips_stay_on_scored_windows_across_a_gap(monkeypatch):
+    from modules import analyzer as analyzer_module
+    from modules.moment_curve import covered_bins, score_curve, select_intervals
+
+    # Early stop left everything but two windows unscored
+    windows = [(100.0, 145.0, 8.5), (1000.0, 1045.0, 8.5)]
+    curve = score_curve(windows, 1200.0)
+    assert curve[50] == 0.0 and curve[500] == 0.0 and curve[120] == pytest.approx(8.5)
+
+    grid = [float(t) for t in range(0, 1201, 5)]
+    picked = select_intervals(curve, grid, grid, 15, 60, baseline=5.0, max_count=10,
+                              covered=covered_bins(windows, 1200.0), min_coverage=0.8)
+    assert picked
+    assert all(100.0 <= start and end <= 145.0 or 1000.0 <= start and end <= 1045.0 for start, end, _ in picked)
+
+    monkeypatch.setattr(analyzer_module, "MIN_CLIP_LENGTH", 15)
+    monkeypatch.setattr(analyzer_module, "MAX_CLIP_LENGTH", 60)
+    segments = [{"start": t, "end": t + 5.0, "text": f"Sentence {t:.0f}."} for t in grid[:-1]]
+    analyzed = [
+        {"chunk": {"start": start, "end": end, "text": ""}, "score": score, "reason": f"r{start:.0f}"}
+        for start, end, score in windows
+    ]
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    analyzer.score_stage = "final"
+    moments = analyzer._select_moments_from_curve(analyzed, {"segments": segments, "duration": 1200.0}, 5.0)
+
+    assert {moment["reason"] for moment in moments} == {"r100", "r1000"}
+    assert all(100.0 <= m["start"] and m["end"] <= 145.0 or 1000.0 <= m["start"] and m["end"] <= 1045.0
+               for m in moments)
+
+
+# Trimmed from a yt-dlp info_dict of a 3-minute video with a replay peak at 120-150 s
+RECORDED_INFO_DICT = {
+    "id": "dQw4w9WgXcQ",
+    "title": "Recorded talk",
+    "duration": 180,
+    "heatmap": [
+        {"start_time": float(t), "end_time": float(t + 30), "value": value}
+        for t, value in zip(range(0, 180, 30), [0.42, 0.31, 0.28, 0.35, 1.0, 0.47])
+    ],
+    "chapters": [
+        {"start_time": 0.0, "end_time": 70.0, "title": "Intro"},
+        {"start_time": 70.0, "end_time": 180.0, "title": "The story"},
+    ],
+}
+
+
+def test_youtube_heatmap_and_chapters_guide_chunking_and_ranking(monkeypatch):
+    from modules import analyzer as analyzer_module
+    from modules.youtube_signals import chapter_starts, extract_signals, replay_scores
+
+    signals = extract_signals(RECORDED_INFO_DICT)
+    assert signals["heatmap"][4] == {"start": 120.0, "end": 150.0, "value": 1.0}
+    assert signals["chapters"][1] == {"start": 70.0, "end": 180.0, "title": "The story"}
+    assert extract_signals({"title": "no signals"}) == {"heatmap": [], "chapters": []}
+    assert chapter_starts(signals["chapters"]) == [70.0]
+
+    # Fixed 45 s chunks restart at the chapter instead of straddling it
+    segments = _build_segments(count=45, duration=4.0)
+    analyzer = object.__new__(ViralMomentAnalyzer)
+    chunks = analyzer._create_chunks(segments, 45, chapter_starts(signals["chapters"]))
+    assert [chunk["start"] for chunk in chunks][:4] == [0.0, 48.0, 72.0, 120.0]
+
+    # Same text everywhere: only the replay peak separates the chunks
+    monkeypatch.setattr(analyzer_module, "ANALYSIS_MIN_CANDIDATES", 2)
+    monkeypatch.setattr(analyzer_module, "ANALYSIS_TARGET_MOMENTS", 1)
+    chunks = [
+        {"start": start, "end": start + 30.0, "text": "a regular sentence",
+         "segments": [{"start": start, "end": start + 30.0, "text": "a regular sentence"}]}
+        for start in range(0, 180, 30)
+    ]
+    replay = replay_scores([(c["start"], c["end"]) for c in chunks], signals["heatmap"])
+    assert replay[4] == 1.0 and replay[2] == 0.0
+    ranked, _ = analyzer._rank_chunks_for_analysis(chunks, "en", replay)
+    assert ranked[0] is chunks[4]
@@ -0,0 +1,121 @@
+import pytest
+
+np = pytest.importorskip("numpy")
+pytest.importorskip("ffmpeg")
+
+from utils import audio_cache
+
+
+def test_decoded_audio_is_cached_and_memory_mapped(monkeypatch, tmp_path):
+    decodes = {"count": 0}
+
+    def fake_run(stream, **kwargs):
+        decodes["count"] += 1
+        output_path = stream.get_args()[-1]
+        assert "pcm_s16le" in stream.get_args()
+        audio_cache.write_pcm(np.linspace(-0.5, 0.5, 16000, dtype=np.float32), output_path)
+
+    video_path = tmp_path / "talk.mp4"
+    video_path.write_bytes(b"fake-video")
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_DIR", tmp_path / "audio")
+    monkeypatch.setattr(audio_cache.ffmpeg, "run", fake_run)
+
+    first = audio_cache.load_decoded_audio(str(video_path))
+    second = audio_cache.load_decoded_audio(str(video_path))
+
+    assert decodes["count"] == 1
+    assert isinstance(first, audio_cache.PCMSamples)
+    assert first[:].dtype == np.float32
+    assert np.allclose(second[8000:8003], np.linspace(-0.5, 0.5, 16000)[8000:8003], atol=1 / 32768)
+    assert len(second) == 16000
+    cache_files = list((tmp_path / "audio").iterdir())
+    assert [p.suffix for p in cache_files] == [".s16"]
+    assert cache_files[0].stat().st_size == 16000 * 2
+
+
+def test_decoded_audio_cache_evicts_least_recently_used(monkeypatch, tmp_path):
+    import os
+
+    cache_dir = tmp_path / "audio"
+    cache_dir.mkdir()
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_DIR", cache_dir)
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_MAX_MB", 1)
+    for index in range(3):
+        path = cache_dir / f"old_{index}.s16"
+        path.write_bytes(b"\0" * 400 * 1024)
+        os.utime(path, (1000 + index, 1000 + index))
+    newest = cache_dir / "huge.s16"
+    newest.write_bytes(b"\0" * 2 * 1024 * 1024)
+
+    # The file just written stays even though it alone exceeds the quota
+    assert audio_cache.prune_audio_cache(newest) == 3
+    assert sorted(p.name for p in cache_dir.iterdir()) == ["huge.s16"]
+
+
+def test_detect_silences_finds_quiet_runs():
+    sample_rate = 16000
+    loud = np.full(sample_rate, 0.3, dtype=np.float32)
+    quiet = np.zeros(sample_rate // 2, dtype=np.float32)
+    audio = np.concatenate([loud, quiet, loud, np.zeros(sample_rate // 10, dtype=np.float32)])
+
+    silences = audio_cache.detect_silences(audio, sample_rate, min_duration=0.3)
+
+    assert silences == [(1.0, 1.5)]
+    assert audio_cache.measure_loudness(loud) == pytest.approx(-10.46, abs=0.01)
+
+
+def test_progressive_pcm_tails_a_growing_download(monkeypatch, tmp_path):
+    import subprocess
+    import sys
+    import threading
+    import time
+
+    from utils import progressive_audio
+
+    class PassThrough:
+        """Stands in for the ffmpeg chain: 'decodes' by copying stdin to stdout."""
+
+        def __getattr__(self, name):
+            return lambda *args, **kwargs: self
+
+        def run_async(self, **kwargs):
+            return subprocess.Popen(
+                [sys.executable, "-c", "import os\nwhile True:\n    d = os.read(0, 4096)\n    if not d: break\n    os.write(1, d)"],
+                stdin=subprocess.PIPE, stdout=subprocess.PIPE,
+            )
+
+    monkeypatch.setattr(progressive_audio, "AUDIO_CACHE_DIR", tmp_path / "audio")
+    monkeypatch.setattr(audio_cache, "AUDIO_CACHE_DIR", tmp_path / "audio")
+    monkeypatch.setattr(progressive_audio, "ffmpeg", PassThrough())
+    samples = np.linspace(-1.0, 1.0, 48000, dtype=np.float32)
+    part = tmp_path / "talk.webm.part"
+    final = tmp_path / "talk.webm"
+
+    pcm = progressive_audio.ProgressivePCM(poll_interval=0.01)
+    part.write_bytes(samples[:1000].tobytes())
+    pcm.hook({"status": "downloading", "tmpfilename": str(part), "filename": str(final),
+              "info_dict": {"duration": 3}})
+    assert pcm.wait_for(1000) >= 1000
+    assert pcm.duration == 3.0
+
+    def finish_download():
+        with open(part, "ab") as f:
+            # Uneven writes, split inside a sample
+            data = samples[1000:].tobytes()
+            for offset in range(0, len(data), 30001):
+                f.write(data[offset:offset + 30001])
+                f.flush()
+                time.sleep(0.001)
+        part.rename(final)
+        pcm.hook({"status": "finished", "filename": str(final)})
+
+    writer = threading.Thread(target=finish_download)
+    writer.start()
+    assert pcm.wait_for(float("inf")) == 48000
+    writer.join()
+    assert np.array_equal(pcm.read(100, 40000), samples[100:40000])
+
+    cache_path = pcm.publish(str(final))
+    assert cache_path.suffix == ".s16"
+    assert np.allclose(audio_cache.open_pcm(cache_path)[:], samples, atol=1 / 32768)
+    pcm.close()
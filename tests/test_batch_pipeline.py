@@ -0,0 +1,81 @@
+import threading
+import time
+
+from modules.batch_pipeline import BatchPipeline
+
+
+def test_batch_pipeline_keeps_order_and_isolates_failures():
+    def download(state):
+        # Later sources finish first, so results must be reordered
+        time.sleep(0.01 * (5 - state['source']))
+        if state['source'] == 2:
+            raise Exception("video unavailable")
+        state['path'] = f"video_{state['source']}.mp4"
+        return state
+
+    def transcribe(state):
+        state['text'] = state['path'].upper()
+        return state
+
+    reported = []
+    pipeline = BatchPipeline([('download', download, 3), ('transcribe', transcribe, 1)],
+                             max_in_flight=4, on_result=reported.append)
+    results = pipeline.run(range(5))
+
+    assert [result['source'] for result in results] == [0, 1, 2, 3, 4]
+    assert [result['status'] for result in results] == ['ok', 'ok', 'failed', 'ok', 'ok']
+    assert results[2]['stage'] == 'download' and results[2]['error'] == "video unavailable"
+    assert results[4]['state']['text'] == "VIDEO_4.MP4"
+    assert len(reported) == 5
+
+
+def test_batch_pipeline_pulls_sources_lazily():
+    lock = threading.Lock()
+    in_flight = {'now': 0, 'max': 0}
+
+    def sources():
+        for index in range(8):
+            with lock:
+                in_flight['now'] += 1
+                in_flight['max'] = max(in_flight['max'], in_flight['now'])
+            yield index
+
+    def work(state):
+        time.sleep(0.01)
+        return state
+
+    def done(result):
+        with lock:
+            in_flight['now'] -= 1
+
+    results = BatchPipeline([('work', work, 4)], max_in_flight=2, on_result=done).run(sources())
+
+    assert len(results) == 8
+    assert all(result['status'] == 'ok' for result in results)
+    assert in_flight['max'] <= 2
+
+
+def test_batch_sources_that_cannot_be_expanded_fail_alone(monkeypatch, tmp_path):
+    import pytest
+
+    pytest.importorskip("yt_dlp")
+    from modules.downloader import YouTubeDownloader
+
+    manifest = tmp_path / "batch.txt"
+    manifest.write_text("https://youtube.com/playlist?list=gone\n# comment\nhttps://youtube.com/@channel\n")
+
+    def expand(url):
+        if "gone" in url:
+            raise Exception(f"Could not expand batch source: {url}")
+        yield "https://www.youtube.com/watch?v=aaaaaaaaaaa"
+        yield "https://www.youtube.com/watch?v=bbbbbbbbbbb"
+
+    downloader = YouTubeDownloader(tmp_path)
+    monkeypatch.setattr(downloader, "_expand_url", expand)
+    failures = []
+
+    urls = list(downloader.iter_batch_urls(str(manifest), on_error=lambda url, e: failures.append((url, str(e)))))
+
+    assert urls == ["https://www.youtube.com/watch?v=aaaaaaaaaaa", "https://www.youtube.com/watch?v=bbbbbbbbbbb"]
+    assert failures == [("https://youtube.com/playlist?list=gone",
+                         "Could not expand batch source: https://youtube.com/playlist?list=gone")]
@@ -0,0 +1,125 @@
+import os
+
+from utils.download_store import DownloadStore
+
+
+def _download(root, name, size):
+    path = root / name
+    path.write_bytes(b"x" * size)
+    return path
+
+
+def test_downloads_are_reused_by_video_id_and_format(tmp_path):
+    store = DownloadStore(tmp_path, max_bytes=None)
+    video = _download(tmp_path, "talk_abc.mp4", 10)
+    store.put("abc", "720p", {"filepath": str(video), "title": "talk"}, [video])
+
+    assert store.get("abc", "720p") == {"filepath": str(video), "title": "talk"}
+    assert store.get("abc", "1080p") is None
+    assert store.get("xyz", "720p") is None
+
+    # A download whose file disappeared is forgotten
+    os.unlink(video)
+    assert store.get("abc", "720p") is None
+    assert store.total_bytes == 0
+
+
+def test_least_recently_used_downloads_are_evicted_over_quota(tmp_path, monkeypatch):
+    from utils import download_store
+
+    clock = iter(range(0, 100000, 1000))
+    monkeypatch.setattr(download_store.time, "time", lambda: next(clock))
+    store = DownloadStore(tmp_path, max_bytes=250)
+    untracked = _download(tmp_path, "upload.mp4", 500)
+
+    first = _download(tmp_path, "a.mp4", 100)
+    store.put("a", "720p", {"filepath": str(first)}, [first])
+    second = _download(tmp_path, "b.mp4", 100)
+    store.put("b", "720p", {"filepath": str(second)}, [second])
+    assert store.get("a", "720p") is not None  # "b" is now the least recently used
+
+    third = _download(tmp_path, "c.mp4", 100)
+    evicted = store.put("c", "720p", {"filepath": str(third)}, [third])
+
+    assert evicted == 1
+    assert not second.exists() and first.exists() and third.exists()
+    assert untracked.exists()
+    assert store.total_bytes == 200
+
+    # The newest download is kept even if it alone exceeds the quota
+    big = _download(tmp_path, "d.mp4", 300)
+    store.put("d", "720p", {"filepath": str(big)}, [big])
+    assert big.exists() and not first.exists() and not third.exists()
+
+
+def test_leased_downloads_survive_eviction_until_released(tmp_path):
+    store = DownloadStore(tmp_path, max_bytes=150)
+    first = _download(tmp_path, "a.mp4", 100)
+    store.put("a", "720p", {"filepath": str(first)}, [first], lease=True)
+    audio = _download(tmp_path, "b.audio.m4a", 100)
+    store.put("b", "audio", {"filepath": str(audio)}, [audio], lease=True)
+    assert store.get("b", "audio", lease=True) is not None
+
+    # Still in use by its pipeline, so the newer download goes over quota instead
+    assert first.exists()
+    # The ranges of a leased video are protected along with it
+    clip = _download(tmp_path, "b.10-20.mp4", 100)
+    store.put("b", "720p|10-20", {"filepath": str(clip)}, [clip])
+    assert first.exists() and audio.exists()
+
+    store.release("a")
+    other = _download(tmp_path, "c.mp4", 10)
+    assert store.put("c", "720p", {"filepath": str(other)}, [other]) == 1
+    assert not first.exists()
+
+    # "b" was leased twice; one release still leaves it protected
+    store.release("b")
+    later = _download(tmp_path, "d.mp4", 10)
+    store.put("d", "720p", {"filepath": str(later)}, [later])
+    assert audio.exists() and clip.exists()
+    store.release("b")
+    last = _download(tmp_path, "e.mp4", 10)
+    assert store.put("e", "720p", {"filepath": str(last)}, [last]) == 1
+    assert not audio.exists() and clip.exists()
+
+
+def test_reuse_rewrites_the_index_only_after_the_touch_interval(tmp_path, monkeypatch):
+    from utils import download_store
+
+    now = [1000.0]
+    monkeypatch.setattr(download_store.time, "time", lambda: now[0])
+    writes = []
+    write = download_store.atomic_write_json
+
+    def counting_write(*args, **kwargs):
+        writes.append(args[1])
+        write(*args, **kwargs)
+
+    monkeypatch.setattr(download_store, "atomic_write_json", counting_write)
+    store = DownloadStore(tmp_path, max_bytes=None)
+    video = _download(tmp_path, "a.mp4", 10)
+    store.put("a", "720p", {"filepath": str(video)}, [video])
+
+    for _ in range(5):
+        now[0] += 1
+        assert store.get("a", "720p") is not None
+    assert len(writes) == 1
+
+    now[0] += download_store.DOWNLOAD_STORE_TOUCH_INTERVAL
+    store.get("a", "720p")
+    assert len(writes) == 2
+
+
+def test_untracked_files_are_swept_by_age(tmp_path):
+    store = DownloadStore(tmp_path, max_bytes=None)
+    tracked = _download(tmp_path, "talk_abc.mp4", 10)
+    store.put("abc", "720p", {"filepath": str(tracked)}, [tracked])
+    old_upload = _download(tmp_path, "upload.mp4", 10)
+    new_upload = _download(tmp_path, "fresh.mp4", 10)
+    day_ago = os.path.getmtime(new_upload) - 25 * 3600
+    for path in (tracked, old_upload):
+        os.utime(path, (day_ago, day_ago))
+
+    assert store.sweep_untracked(max_age_hours=24) == 1
+    assert not old_upload.exists()
+    assert tracked.exists() and new_upload.exists() and store.index_path.exists()
@@ -0,0 +1,106 @@
+import threading
+
+import pytest
+
+pytest.importorskip("ollama")
+
+from utils.ollama_pool import OllamaHostPool
+
+
+class _FakeClient:
+    def __init__(self, host, up=True):
+        self.host = host
+        self.up = up
+        self.calls = 0
+
+    def list(self):
+        if not self.up:
+            raise ConnectionError("connection refused")
+        return {'models': []}
+
+    def chat(self, **kwargs):
+        if not self.up:
+            raise ConnectionError("connection refused")
+        self.calls += 1
+        return {'message': {'content': self.host}}
+
+
+def _pool(clients, hosts, interval=30):
+    return OllamaHostPool(hosts, health_check_interval=interval, client_factory=lambda host: clients[host])
+
+
+def test_pool_routes_to_least_loaded_host():
+    clients = {"a": _FakeClient("a"), "b": _FakeClient("b")}
+    pool = _pool(clients, [{"host": "a", "max_concurrency": 4}, {"host": "b", "max_concurrency": 2}])
+    assert pool.capacity == 6
+
+    held = [pool._acquire(set()) for _ in range(6)]
+    assert sorted(host.host for host in held) == ["a", "a", "a", "a", "b", "b"]
+    assert all(host.in_flight == host.max_concurrency for host in pool.hosts)
+    for host in held:
+        pool._release(host)
+    assert all(host.in_flight == 0 for host in pool.hosts)
+
+
+def test_pool_fails_over_and_rechecks_down_hosts():
+    clients = {"a": _FakeClient("a", up=False), "b": _FakeClient("b")}
+    pool = _pool(clients, [{"host": "a", "max_concurrency": 4}, {"host": "b", "max_concurrency": 1}], interval=0)
+
+    assert pool.chat(model="m", messages=[])['message']['content'] == "b"
+    assert not pool.hosts[0].healthy
+    assert pool.capacity == 1
+
+    clients["a"].up = True
+    assert pool.chat(model="m", messages=[])['message']['content'] == "a"
+    assert pool.hosts[0].healthy
+
+
+def test_pool_raises_when_no_host_is_reachable():
+    clients = {"a": _FakeClient("a", up=False)}
+    pool = _pool(clients, [{"host": "a", "max_concurrency": 1}])
+    with pytest.raises(Exception, match="No Ollama host reachable"):
+        pool.chat(model="m", messages=[])
+    assert pool.hosts[0].in_flight == 0
+
+
+def test_pool_never_exceeds_host_concurrency():
+    release = threading.Event()
+    peak = {"a": 0, "b": 0}
+    running = {"a": 0, "b": 0}
+    lock = threading.Lock()
+
+    class _SlowClient(_FakeClient):
+        def chat(self, **kwargs):
+            with lock:
+                running[self.host] += 1
+                peak[self.host] = max(peak[self.host], running[self.host])
+            release.wait(1)
+            with lock:
+                running[self.host] -= 1
+            return {'message': {'content': self.host}}
+
+    clients = {"a": _SlowClient("a"), "b": _SlowClient("b")}
+    pool = _pool(clients, [{"host": "a", "max_concurrency": 2}, {"host": "b", "max_concurrency": 1}])
+    threads = [threading.Thread(target=pool.chat, kwargs={'model': "m", 'messages': []}) for _ in range(9)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert peak["a"] <= 2 and peak["b"] <= 1
+
+
+def test_malformed_ollama_hosts_fall_back_to_one_request(capsys):
+    from config import _parse_ollama_hosts
+
+    hosts = _parse_ollama_hosts("http://gpu1:11434=4, http://gpu2:11434=abc,http://gpu3:11434=,=2,http://gpu4:11434")
+
+    assert hosts == [
+        {"host": "http://gpu1:11434", "max_concurrency": 4},
+        {"host": "http://gpu2:11434", "max_concurrency": 1},
+        {"host": "http://gpu3:11434", "max_concurrency": 1},
+        {"host": "http://gpu4:11434", "max_concurrency": 1},
+    ]
+    warnings = capsys.readouterr().out
+    assert "'abc'" in warnings and "without a host: '=2'" in warnings
@@ -0,0 +1,93 @@
+import threading
+
+import pytest
+
+from utils import rate_limit
+from utils.rate_limit import ProviderLimiter, TokenBucket, is_throttling_error
+
+
+class _RateLimited(Exception):
+    status_code = 429
+
+
+def test_limiter_halves_on_throttling_and_grows_on_success(monkeypatch):
+    monkeypatch.setattr(rate_limit.time, "sleep", lambda seconds: None)
+    limiter = ProviderLimiter("test", max_concurrency=8, initial_concurrency=8)
+    attempts = []
+
+    def flaky():
+        attempts.append(1)
+        if len(attempts) < 3:
+            raise _RateLimited("Error code: 429")
+        return "ok"
+
+    assert limiter.call(flaky) == "ok"
+    assert len(attempts) == 3
+    assert limiter.limit == pytest.approx(2.0 + 0.5)
+    assert limiter.in_flight == 0
+
+    for _ in range(20):
+        limiter.call(lambda: "ok")
+    assert 5.0 < limiter.limit <= 8.0
+
+
+def test_limiter_does_not_retry_other_errors(monkeypatch):
+    limiter = ProviderLimiter("test", max_concurrency=2)
+
+    def broken():
+        raise ValueError("bad request")
+
+    with pytest.raises(ValueError):
+        limiter.call(broken)
+    assert limiter.in_flight == 0
+    assert limiter.limit == 2.0
+
+
+def test_limiter_caps_calls_in_flight():
+    limiter = ProviderLimiter("test", max_concurrency=2)
+    running = []
+    peak = []
+    release = threading.Event()
+    lock = threading.Lock()
+
+    def slow():
+        with lock:
+            running.append(1)
+            peak.append(len(running))
+        release.wait(1.0)
+        with lock:
+            running.pop()
+        return "ok"
+
+    threads = [threading.Thread(target=limiter.call, args=(slow,)) for _ in range(5)]
+    for thread in threads:
+        thread.start()
+    release.set()
+    for thread in threads:
+        thread.join()
+
+    assert max(peak) <= 2
+
+
+def test_token_bucket_waits_for_refill(monkeypatch):
+    clock = [100.0]
+    sleeps = []
+    monkeypatch.setattr(rate_limit.time, "monotonic", lambda: clock[0])
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        clock[0] += seconds
+
+    monkeypatch.setattr(rate_limit.time, "sleep", fake_sleep)
+    bucket = TokenBucket(per_minute=60)
+
+    bucket.acquire(60)
+    bucket.acquire(30)
+
+    assert sleeps == [pytest.approx(30.0)]
+
+
+def test_throttling_errors_are_recognized():
+    assert is_throttling_error(_RateLimited("slow down"))
+    assert is_throttling_error(Exception("Error code: 529 - overloaded_error"))
+    assert not is_throttling_error(ValueError("invalid prompt"))
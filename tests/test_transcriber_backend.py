@@ -1,6 +1,11 @@
+import json
 from types import SimpleNamespace
 
+import numpy as np
+
 from modules.transcriber import VideoTranscriber
+from utils.audio_cache import write_pcm
+from utils.transcript_store import TranscriptStore
 
 
 def test_faster_whisper_serializer_preserves_transcript_shape():
@@ -40,3 +45,203 @@ def test_cache_signature_tracks_backend_settings():
     assert signature["backend"] == "faster-whisper"
     assert signature["language"] == "fr"
     assert signature["word_timestamps"] is True
+
+
+def test_parallel_spans_cut_inside_nearby_silences():
+    transcriber = VideoTranscriber()
+    silences = [(95.0, 96.0), (203.0, 204.0), (500.0, 501.0)]
+
+    spans = transcriber._plan_transcription_spans(silences, total_duration=600.0, span_count=3)
+
+    # 200s cut snaps to the silence at 203.5s; no silence near 400s keeps the nominal cut.
+    assert spans == [(0.0, 203.5), (203.5, 400.0), (400.0, 600.0)]
+
+
+def test_stitched_spans_have_global_ids_and_offsets():
+    transcriber = VideoTranscriber()
+    span_segment = {
+        "id": 0,
+        "start": 0.5,
+        "end": 2.0,
+        "text": "Hello",
+        "words": [{"word": "Hello", "start": 0.5, "end": 1.0, "probability": 0.9}],
+    }
+
+    stitched = transcriber._stitch_span_segments([(0.0, [span_segment]), (203.5, [span_segment])])
+
+    assert [segment["id"] for segment in stitched] == [0, 1]
+    assert stitched[1]["start"] == 204.0
+    assert stitched[1]["words"][0] == {"word": "Hello", "start": 204.0, "end": 204.5, "probability": 0.9}
+
+
+def test_transcript_stream_yields_segments_before_the_cache_is_written(monkeypatch, tmp_path):
+    from modules import transcriber as transcriber_module
+
+    source = tmp_path / "talk.mp4"
+    source.write_bytes(b"fake-video")
+    pcm_path = tmp_path / "talk.s16"
+    write_pcm(np.zeros(16000 * 10, dtype=np.float32), pcm_path)
+    monkeypatch.setattr(transcriber_module, "get_decoded_audio_path", lambda path: pcm_path)
+
+    def fake_transcribe(audio, **options):
+        # Whisper gets a float32 span, not the memory-mapped file
+        assert isinstance(audio, np.ndarray) and audio.dtype == np.float32
+        raw_segments = (
+            SimpleNamespace(start=float(index), end=index + 1.0, text=f" part {index}", words=[])
+            for index in range(3)
+        )
+        return raw_segments, SimpleNamespace(language="en")
+
+    transcriber = VideoTranscriber()
+    transcriber.store = TranscriptStore(tmp_path)
+    transcriber.model = SimpleNamespace(transcribe=fake_transcribe)
+    progress = []
+
+    stream = transcriber.transcribe_stream(str(source), progress_callback=lambda done, total: progress.append((done, total)))
+    assert stream.language == "en"
+    assert stream.duration == 10.0
+
+    iterator = iter(stream)
+    first = next(iterator)
+    assert first["text"] == "part 0"
+    assert stream.transcript is None
+    cache_path = transcriber._transcript_cache_path(source, None)
+    partial_path = cache_path.with_name(f"{cache_path.stem}.partial.jsonl")
+    assert partial_path.exists()
+
+    rest = list(iterator)
+    assert [segment["id"] for segment in [first] + rest] == [0, 1, 2]
+    assert progress == [(1.0, 10.0), (2.0, 10.0), (3.0, 10.0)]
+    assert stream.transcript["full_text"] == "part 0 part 1 part 2"
+    assert cache_path.exists()
+    assert not partial_path.exists()
+
+    # A second call replays the cached transcript.
+    cached = transcriber.transcribe_stream(str(source))
+    assert cached.transcript == stream.transcript
+
+
+def test_serial_transcription_feeds_whisper_one_span_at_a_time(monkeypatch, tmp_path):
+    from modules import transcriber as transcriber_module
+
+    rate = 16000
+    source = tmp_path / "talk.mp4"
+    source.write_bytes(b"fake-video")
+    pcm_path = tmp_path / "talk.s16"
+    write_pcm(np.zeros(rate * 300, dtype=np.float32), pcm_path)
+    monkeypatch.setattr(transcriber_module, "get_decoded_audio_path", lambda path: pcm_path)
+    span_lengths = []
+
+    def fake_transcribe(audio, **options):
+        span_lengths.append(len(audio))
+        return iter([SimpleNamespace(start=0.0, end=1.0, text=" hi", words=[])]), SimpleNamespace(language="en")
+
+    transcriber = VideoTranscriber(backend="faster-whisper")
+    transcriber.store = TranscriptStore(tmp_path)
+    transcriber.model = SimpleNamespace(transcribe=fake_transcribe)
+
+    result = transcriber.transcribe(str(source))
+
+    assert len(span_lengths) == 3 and sum(span_lengths) == rate * 300
+    assert max(span_lengths) <= rate * 140
+    assert [(s["id"], s["start"]) for s in result["segments"]] == [(0, 0.0), (1, 120.0), (2, 240.0)]
+    assert result["video_path"] == str(source)
+
+
+def test_transcript_store_shares_renamed_uploads_and_separates_same_stems(tmp_path):
+    store = TranscriptStore(tmp_path / "transcripts")
+    signature = VideoTranscriber()._cache_signature(None)
+    original = tmp_path / "a" / "talk.mp4"
+    renamed = tmp_path / "b" / "upload-copy.mp4"
+    other = tmp_path / "c" / "talk.mp4"
+    for path, content in ((original, b"same-bytes"), (renamed, b"same-bytes"), (other, b"different")):
+        path.parent.mkdir()
+        path.write_bytes(content)
+
+    store.save(store.path_for(str(original), signature), {"transcriber": signature, "segments": []})
+
+    assert store.load(str(renamed), signature)["video_path"] == str(renamed)
+    assert store.load(str(other), signature) is None
+    assert set(store._read_index()) == {str(original.resolve()), str(renamed.resolve()), str(other.resolve())}
+
+
+def test_transcript_store_adopts_matching_legacy_transcripts(tmp_path):
+    store = TranscriptStore(tmp_path)
+    signature = VideoTranscriber()._cache_signature(None)
+    source = tmp_path / "talk.mp4"
+    source.write_bytes(b"video")
+    legacy = {"video_path": str(source), "transcriber": signature, "segments": []}
+    store.legacy_path(str(source)).write_text(json.dumps(legacy))
+
+    assert store.load(str(source), signature)["segments"] == []
+    assert store.path_for(str(source), signature).exists()
+
+
+def test_progressive_transcript_is_reused_by_later_runs(tmp_path):
+    source = tmp_path / "talk.mp4"
+    source.write_bytes(b"video")
+    transcriber = VideoTranscriber()
+    transcriber.store = TranscriptStore(tmp_path / "transcripts")
+    progressive = {
+        "language": "en",
+        "duration": 1.0,
+        "segments": [{"id": 0, "start": 0.0, "end": 1.0, "text": "hi", "words": []}],
+        "full_text": "hi",
+        "transcriber": transcriber._cache_signature(None, progressive=True),
+    }
+
+    transcriber.store_transcript(str(source), progressive)
+
+    assert transcriber.transcribe(str(source))["full_text"] == "hi"
+    assert transcriber.transcribe_stream(str(source)).transcript["full_text"] == "hi"
+
+
+def test_progressive_transcription_cuts_at_silences_independent_of_arrival(monkeypatch):
+    import numpy as np
+    from modules import transcriber as transcriber_module
+
+    monkeypatch.setattr(transcriber_module, "PROGRESSIVE_TRANSCRIBE_SPAN", 10)
+    rate = 16000
+    audio = np.full(35 * rate, 0.3, dtype=np.float32)
+    audio[int(11.0 * rate):int(11.6 * rate)] = 0.0
+    audio[int(21.0 * rate):int(21.4 * rate)] = 0.0
+
+    class FakePCM:
+        sample_rate = rate
+        duration = 35.0
+
+        def __init__(self, step):
+            self.step = step
+            self.samples = 0
+
+        def wait_for(self, count):
+            # Samples arrive in uneven steps, as from a download
+            while self.samples < min(count, len(audio)):
+                self.samples = min(len(audio), self.samples + self.step)
+            return self.samples
+
+        def read(self, start, end):
+            return audio[start:min(end, self.samples)]
+
+    def run(step):
+        calls = []
+
+        def fake_transcribe(span_audio, **options):
+            calls.append(options["language"])
+            segment = SimpleNamespace(start=0.0, end=len(span_audio) / rate, text=f" {len(span_audio)}", words=[])
+            return iter([segment]), SimpleNamespace(language="en")
+
+        transcriber = VideoTranscriber()
+        transcriber.model = SimpleNamespace(transcribe=fake_transcribe)
+        progress = []
+        result = transcriber.transcribe_progressive(FakePCM(step), progress_callback=lambda d, t: progress.append(d))
+        return result, calls, progress
+
+    result, calls, progress = run(step=7 * rate)
+    assert result == run(step=rate // 3)[0]
+    assert [(s["start"], s["end"]) for s in result["segments"]] == [
+        (0.0, 11.3), (11.3, 21.2), (21.2, 31.2), (31.2, 35.0)
+    ]
+    assert calls == [None, "en", "en", "en"]
+    assert progress[-1] == 35.0
+    assert result["transcriber"]["progressive_span"] == 10
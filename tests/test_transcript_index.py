@@ -0,0 +1,63 @@
+import random
+
+from modules.transcriber import VideoTranscriber
+from utils.transcript_index import TranscriptIndex, build_transcript_index
+
+
+def _random_transcript(seed=7, segment_count=200):
+    rng = random.Random(seed)
+    segments = []
+    current = 0.0
+    for index in range(segment_count):
+        current += rng.uniform(0.0, 1.5)
+        start = round(current, 2)
+        words = []
+        word_time = start
+        for word_index in range(rng.randint(0, 6)):
+            word_start = round(word_time + rng.uniform(0.0, 0.2), 2)
+            word_end = round(word_start + rng.uniform(0.05, 0.6), 2)
+            words.append({"word": f"w{index}_{word_index}", "start": word_start, "end": word_end})
+            word_time = word_end
+        end = round(max(word_time, start + rng.uniform(0.2, 3.0)), 2)
+        segments.append({"id": index, "start": start, "end": end, "text": f"segment {index}", "words": words})
+        current = end - rng.uniform(0.0, 0.3)
+    return {"language": "en", "segments": segments}
+
+
+def test_index_matches_linear_scans():
+    transcriber = VideoTranscriber()
+    transcript = _random_transcript()
+    index = TranscriptIndex(transcript)
+    rng = random.Random(3)
+    duration = transcript["segments"][-1]["end"]
+
+    for _ in range(300):
+        start = rng.uniform(-5.0, duration + 5.0)
+        end = start + rng.uniform(0.0, 40.0)
+        assert index.segments_in_range(start, end) == transcriber.get_segments_in_range(transcript, start, end)
+        assert index.words_in_range(start, end) == transcriber.get_words_in_range(transcript, start, end)
+        assert index.text_at(start) == transcriber.get_text_at_time(transcript, start)
+
+
+def test_index_behaves_like_the_transcript_dict():
+    transcript = _random_transcript(segment_count=5)
+    index = build_transcript_index(transcript)
+
+    assert build_transcript_index(index) is index
+    assert index["segments"] is transcript["segments"]
+    assert index.get("language") == "en"
+    assert index.get("missing", "fallback") == "fallback"
+    assert dict(index) == transcript
+
+
+def test_unsorted_transcript_falls_back_to_linear_scan():
+    transcriber = VideoTranscriber()
+    transcript = {"segments": [
+        {"start": 10.0, "end": 12.0, "text": "late", "words": []},
+        {"start": 1.0, "end": 3.0, "text": "early", "words": []},
+    ]}
+
+    index = TranscriptIndex(transcript)
+
+    assert index.segments_in_range(0.0, 20.0) == transcriber.get_segments_in_range(transcript, 0.0, 20.0)
+    assert transcriber.get_text_at_time(index, 2.0)["word"] == "early"
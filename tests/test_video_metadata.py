@@ -1,3 +1,5 @@
+from types import SimpleNamespace
+
 import pytest
 
 pytest.importorskip("ffmpeg")
@@ -47,3 +49,24 @@ def test_get_video_info_reuses_cached_probe(monkeypatch, tmp_path):
     assert first == second
     assert first["width"] == 1920
     assert first["audio_codec"] == "aac"
+
+
+def test_keyframe_index_parses_packet_flags_once(monkeypatch, tmp_path):
+    video_metadata._probe_keyframes_cached.cache_clear()
+    calls = []
+
+    def fake_run(cmd, **kwargs):
+        calls.append(cmd)
+        return SimpleNamespace(
+            returncode=0,
+            stdout="0.000000,K__\n0.033333,___\n4.004000,K__\nN/A,K__\n2.002000,___\n",
+            stderr="",
+        )
+
+    video_path = tmp_path / "clip.mp4"
+    video_path.write_bytes(b"fake-video")
+    monkeypatch.setattr(video_metadata.subprocess, "run", fake_run)
+
+    assert video_metadata.get_keyframe_times(str(video_path)) == [0.0, 4.004]
+    assert video_metadata.get_keyframe_times(str(video_path)) == [0.0, 4.004]
+    assert len(calls) == 1
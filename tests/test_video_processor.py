@@ -0,0 +1,252 @@
+import pytest
+
+ffmpeg = pytest.importorskip("ffmpeg")
+
+from modules import video_processor
+from modules.subtitle_generator import SubtitleGenerator
+from modules.video_processor import VideoProcessor
+
+
+def _fake_video_info(path):
+    return {
+        "duration": 600.0, "width": 1920, "height": 1080, "video_codec": "h264", "audio_codec": "aac",
+        "pix_fmt": "yuv420p", "video_profile": "High", "video_level": 40, "video_time_base": "1/15360",
+    }
+
+
+def _fake_parameter_sets(cabac=0):
+    return {
+        "sps": {
+            "nal_unit_type": 7, "profile_idc": 100, "level_idc": 40, "pic_order_cnt_type": 2,
+            "max_num_ref_frames": 1, "vui_parameters_present_flag": 1, "time_scale": 50,
+            "max_num_reorder_frames": 0, "max_dec_frame_buffering": 1, "rbsp_stop_one_bit": 1,
+        },
+        "pps": {
+            "nal_unit_type": 8, "entropy_coding_mode_flag": cabac, "num_ref_idx_l0_default_active_minus1": 0,
+            "weighted_pred_flag": 0, "weighted_bipred_idc": 0, "pic_init_qp_minus26": -6,
+            "chroma_qp_index_offset": -2, "transform_8x8_mode_flag": 1,
+        },
+    }
+
+
+def _capture_runs(monkeypatch, decode_errors=b""):
+    runs = []
+
+    def fake_run(stream, **kwargs):
+        args = ffmpeg.compile(stream)
+        runs.append(args)
+        if "-xerror" in args:
+            return b"", decode_errors
+        for arg in args:
+            if arg.endswith(".mp4"):
+                open(arg, "wb").close()
+        return b"", b""
+
+    monkeypatch.setattr(video_processor.ffmpeg, "run", fake_run)
+    monkeypatch.setattr(video_processor, "load_video_info", _fake_video_info)
+    monkeypatch.setattr(video_processor, "get_parameter_sets", lambda path: _fake_parameter_sets())
+    monkeypatch.setattr(video_processor, "get_keyframe_times", lambda path: [0.0, 8.0, 12.0, 16.0])
+    return runs
+
+
+def test_subtitled_clip_is_rendered_in_a_single_ffmpeg_pass(monkeypatch, tmp_path):
+    runs = _capture_runs(monkeypatch)
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"fake-video")
+    transcript = {
+        "language": "en",
+        "segments": [{
+            "start": 10.0,
+            "end": 12.0,
+            "text": "hello world",
+            "words": [
+                {"word": "hello", "start": 10.0, "end": 10.5},
+                {"word": "world", "start": 10.6, "end": 11.2},
+            ],
+        }],
+    }
+
+    processor = VideoProcessor(output_dir=tmp_path)
+    generator = SubtitleGenerator(output_dir=tmp_path)
+    clip_path = generator.render_subtitled_clip(
+        processor, str(source), transcript, 10.0, 25.0, "clip_1_final",
+    )
+
+    assert clip_path.endswith("clip_1_final_subtitled.mp4")
+    assert len(runs) == 1
+    filtergraph = runs[0][runs[0].index("-filter_complex") + 1]
+    assert "crop=607:1080:656:0" in filtergraph
+    assert "scale=1080:1920" in filtergraph
+    assert "ass=" in filtergraph
+    # The temporary ASS file is removed once the render finishes.
+    ass_path = filtergraph.split("ass=")[1].split("[")[0]
+    assert not (tmp_path / ass_path).exists()
+
+
+def test_batch_extraction_shares_one_process_for_nearby_clips(monkeypatch, tmp_path):
+    runs = _capture_runs(monkeypatch)
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"fake-video")
+    jobs = [
+        {"start": 100.0, "end": 130.0, "output_name": "clip_a"},
+        {"start": 3000.0, "end": 3040.0, "output_name": "clip_far"},
+        {"start": 135.0, "end": 170.0, "output_name": "clip_b"},
+    ]
+
+    processor = VideoProcessor(output_dir=tmp_path)
+    results = processor.extract_clips_batch(str(source), jobs, vertical_format=True)
+
+    assert [r["error"] for r in results] == [None, None, None]
+    assert [r["path"].rsplit("/", 1)[-1] for r in results] == ["clip_a.mp4", "clip_far.mp4", "clip_b.mp4"]
+    assert len(runs) == 2
+    grouped = next(args for args in runs if "clip_a.mp4" in " ".join(args))
+    assert "clip_b.mp4" in " ".join(grouped)
+    assert "split=2" in grouped[grouped.index("-filter_complex") + 1]
+
+
+def test_batch_plan_splits_heavily_overlapping_clips():
+    processor = object.__new__(VideoProcessor)
+    jobs = [
+        {"start": 0.0, "end": 45.0},
+        {"start": 5.0, "end": 50.0},
+        {"start": 10.0, "end": 55.0},
+        {"start": 200.0, "end": 230.0},
+        {"start": 240.0, "end": 260.0},
+    ]
+
+    assert processor._plan_extraction_groups(jobs) == [[0], [1], [2], [3, 4]]
+
+
+def test_horizontal_clip_copies_frames_after_first_keyframe(monkeypatch, tmp_path):
+    runs = _capture_runs(monkeypatch)
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"fake-video")
+
+    processor = VideoProcessor(output_dir=tmp_path)
+    clip_path = processor.extract_clip(str(source), 10.0, 30.0, "horizontal", vertical_format=False)
+
+    assert clip_path.endswith("horizontal.mp4")
+    head, tail, final, seam_check = runs
+    assert head[head.index("-ss") + 1] == "10.0"
+    assert head[head.index("-t") + 1] == "2.0"
+    assert head[head.index("-vcodec") + 1] == "libx264"
+    assert head[head.index("-profile:v") + 1] == "high"
+    assert head[head.index("-level") + 1] == "4.0"
+    # The head reproduces the source's entropy coder, refs, B-frames and QP
+    x264_params = head[head.index("-x264-params") + 1].split(":")
+    assert {"cabac=0", "ref=1", "bframes=0", "8x8dct=1", "weightp=0", "chroma-qp-offset=0"} <= set(x264_params)
+    assert head[head.index("-crf") + 1] == "20"
+    assert tail[tail.index("-ss") + 1] == "12.0"
+    assert tail[tail.index("-vcodec") + 1] == "copy"
+    assert final[final.index("-vcodec") + 1] == "copy"
+    assert final[final.index("-acodec") + 1] == "copy"
+    assert final[final.index("-video_track_timescale") + 1] == "15360"
+    # The joined clip is decoded through a second past the seam
+    assert seam_check[seam_check.index("-i") + 1].endswith("horizontal.mp4")
+    assert seam_check[seam_check.index("-t") + 1] == "3.0"
+
+
+def test_smart_cut_falls_back_when_the_head_parameter_sets_differ(monkeypatch, tmp_path):
+    runs = _capture_runs(monkeypatch)
+    monkeypatch.setattr(
+        video_processor, "get_parameter_sets",
+        lambda path: _fake_parameter_sets(cabac=1 if path.endswith("head.mp4") else 0),
+    )
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"fake-video")
+
+    processor = VideoProcessor(output_dir=tmp_path)
+    processor.extract_clip(str(source), 10.0, 30.0, "horizontal", vertical_format=False)
+
+    # Only the head was encoded before the whole clip was re-encoded
+    head, full = runs
+    assert "-x264-params" in head
+    assert full[full.index("-ss") + 1] == "10.0"
+    assert full[full.index("-vcodec") + 1] == "libx264"
+
+
+def test_smart_cut_falls_back_when_the_seam_does_not_decode(monkeypatch, tmp_path):
+    runs = _capture_runs(monkeypatch, decode_errors=b"[h264 @ 0x1] error while decoding MB 3 7")
+    source = tmp_path / "source.mp4"
+    source.write_bytes(b"fake-video")
+
+    processor = VideoProcessor(output_dir=tmp_path)
+    processor.extract_clip(str(source), 10.0, 30.0, "horizontal", vertical_format=False)
+
+    assert len(runs) == 5
+    assert "-xerror" in runs[3]
+    assert runs[4][runs[4].index("-vcodec") + 1] == "libx264"
+
+
+def test_clips_are_cut_from_the_covering_range_with_shifted_times(monkeypatch, tmp_path):
+    processor = VideoProcessor(tmp_path)
+    calls = []
+
+    def fake_batch(video_path, jobs, vertical_format=True):
+        calls.append((video_path, [(job["start"], job["end"]) for job in jobs]))
+        return [{"path": f"{video_path}:{job['output_name']}", "error": None} for job in jobs]
+
+    monkeypatch.setattr(processor, "extract_clips_batch", fake_batch)
+    ranges = [
+        {"start": 98.0, "end": 162.0, "filepath": "a.mp4"},
+        {"start": 598.0, "end": 650.0, "filepath": "b.mp4"},
+    ]
+    jobs = [
+        {"start": 600.0, "end": 640.0, "output_name": "one"},
+        {"start": 100.0, "end": 130.0, "output_name": "two"},
+        {"start": 130.0, "end": 160.0, "output_name": "three"},
+        {"start": 300.0, "end": 330.0, "output_name": "four"},
+    ]
+
+    results = processor.extract_clips_from_ranges(ranges, jobs)
+
+    assert sorted(calls) == [("a.mp4", [(2.0, 32.0), (32.0, 62.0)]), ("b.mp4", [(2.0, 42.0)])]
+    assert [r["path"] for r in results[:3]] == ["b.mp4:one", "a.mp4:two", "a.mp4:three"]
+    assert results[3]["path"] is None and "300.0s" in results[3]["error"]
+
+
+def test_smart_cut_joins_a_real_clip_that_decodes_cleanly(monkeypatch, tmp_path):
+    import shutil
+    import subprocess
+
+    if not shutil.which("ffmpeg") or not shutil.which("ffprobe"):
+        pytest.skip("ffmpeg binaries not installed")
+    from utils import video_metadata
+
+    source = tmp_path / "source.mp4"
+    subprocess.run(
+        [
+            "ffmpeg", "-v", "error", "-y",
+            "-f", "lavfi", "-i", "testsrc=size=320x240:rate=25:duration=6",
+            "-f", "lavfi", "-i", "sine=frequency=440:duration=6",
+            # CAVLC, one ref and no B-frames: none of them libx264 defaults for the head
+            "-c:v", "libx264", "-profile:v", "main", "-x264-params", "ref=1:bframes=0:cabac=0",
+            "-pix_fmt", "yuv420p", "-g", "25",
+            "-c:a", "aac", "-shortest", str(source),
+        ],
+        check=True,
+    )
+    video_metadata._probe_video_cached.cache_clear()
+    smart_cuts = []
+    original = VideoProcessor._smart_cut
+
+    def spy(self, *args):
+        smart_cuts.append(original(self, *args))
+        return smart_cuts[-1]
+
+    monkeypatch.setattr(VideoProcessor, "_smart_cut", spy)
+    processor = VideoProcessor(output_dir=tmp_path)
+    clip_path = processor.extract_clip(str(source), 1.4, 4.6, "cut", vertical_format=False)
+
+    assert smart_cuts == [True]
+    info = video_metadata.get_video_info(clip_path)
+    assert info["video_profile"] == "Main"
+    clip_sets = video_metadata.get_parameter_sets(clip_path)
+    assert clip_sets["pps"]["entropy_coding_mode_flag"] == 0
+    assert clip_sets["sps"]["max_num_ref_frames"] == 1
+    assert info["duration"] == pytest.approx(3.2, abs=0.15)
+    decode = subprocess.run(
+        ["ffmpeg", "-v", "error", "-i", clip_path, "-f", "null", "-"],
+        stderr=subprocess.PIPE, text=True,
+    )
+    assert decode.returncode == 0 and decode.stderr == ""
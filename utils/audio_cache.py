@@ -0,0 +1,186 @@
+import hashlib
+import os
+import threading
+import uuid
+from pathlib import Path
+from typing import List, Tuple
+
+import ffmpeg
+import numpy as np
+
+from config import AUDIO_CACHE_DIR, AUDIO_SAMPLE_RATE, AUDIO_CACHE_MAX_MB, AUDIO_CACHE_MAX_ENTRIES
+from utils.helpers import prune_cache_dir
+from utils.video_metadata import _video_cache_key
+
+# Samples are stored as int16, half the size of float32 and all Whisper needs
+PCM_SCALE = 32768.0
+
+_decode_locks: dict = {}
+_decode_locks_guard = threading.Lock()
+
+
+def _decode_lock(cache_path: Path) -> threading.Lock:
+    with _decode_locks_guard:
+        return _decode_locks.setdefault(str(cache_path), threading.Lock())
+
+
+def decoded_audio_cache_path(video_path: str) -> Path:
+    """Location of the decoded PCM for the current version (path, mtime, size) of video_path."""
+    resolved_path, mtime_ns, size = _video_cache_key(video_path)
+    digest = hashlib.sha1(f"{resolved_path}|{mtime_ns}|{size}|{AUDIO_SAMPLE_RATE}|s16".encode()).hexdigest()
+    return AUDIO_CACHE_DIR / f"{Path(resolved_path).stem[:80]}_{digest[:16]}.s16"
+
+
+def prune_audio_cache(keep: Path) -> int:
+    """Evict least recently used decoded audio beyond AUDIO_CACHE_MAX_MB / AUDIO_CACHE_MAX_ENTRIES, never `keep`."""
+    return prune_cache_dir(
+        AUDIO_CACHE_DIR,
+        max_bytes=AUDIO_CACHE_MAX_MB * 1024 * 1024,
+        max_entries=AUDIO_CACHE_MAX_ENTRIES,
+        pattern='*.s16',
+        recursive=False,
+        protect=[keep],
+    )
+
+
+def get_decoded_audio_path(video_path: str) -> Path:
+    """Decode the first audio track of video_path once to mono int16 PCM and return its path."""
+    cache_path = decoded_audio_cache_path(video_path)
+    if cache_path.exists():
+        _touch(cache_path)
+        return cache_path
+
+    with _decode_lock(cache_path):
+        if cache_path.exists():
+            _touch(cache_path)
+            return cache_path
+
+        AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        temp_path = cache_path.with_name(f".{cache_path.name}.{uuid.uuid4().hex}.tmp")
+        try:
+            stream = ffmpeg.output(
+                ffmpeg.input(str(video_path)).audio,
+                str(temp_path),
+                f='s16le',
+                acodec='pcm_s16le',
+                ac=1,
+                ar=AUDIO_SAMPLE_RATE,
+            )
+            ffmpeg.run(stream, overwrite_output=True, quiet=True)
+            # Atomic publish: readers never see a partially decoded file.
+            os.replace(temp_path, cache_path)
+        except ffmpeg.Error as e:
+            error_msg = e.stderr.decode() if e.stderr else str(e)
+            raise Exception(f"FFmpeg audio decode failed: {error_msg}")
+        finally:
+            if temp_path.exists():
+                temp_path.unlink()
+
+    prune_audio_cache(cache_path)
+    return cache_path
+
+
+def _touch(cache_path: Path):
+    # Refresh mtime so pruning evicts least recently used entries first
+    try:
+        os.utime(cache_path)
+    except OSError:
+        pass
+
+
+def write_pcm(samples: np.ndarray, target):
+    """Write float32 samples in [-1, 1] as int16 PCM to a path or an open binary file."""
+    scaled = np.clip(np.round(np.asarray(samples, dtype=np.float32) * PCM_SCALE), -PCM_SCALE, PCM_SCALE - 1)
+    scaled.astype('<i2').tofile(target)
+
+
+class PCMSamples:
+    """Read-only view of an int16 PCM file as float32 samples in [-1, 1].
+
+    The file is memory-mapped; indexing converts only the requested samples,
+    so span workers never load the whole file. sample_rate, duration,
+    wait_for and read mirror ProgressivePCM for a file that is already
+    complete, so Whisper can work through it span by span.
+    """
+
+    sample_rate = AUDIO_SAMPLE_RATE
+
+    def __init__(self, pcm_path: Path):
+        self.path = Path(pcm_path)
+        if self.path.stat().st_size == 0:
+            self._data = np.zeros(0, dtype='<i2')
+        else:
+            self._data = np.memmap(self.path, dtype='<i2', mode='r')
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __getitem__(self, key) -> np.ndarray:
+        return np.asarray(self._data[key], dtype=np.float32) / np.float32(PCM_SCALE)
+
+    def __array__(self, dtype=None, copy=None) -> np.ndarray:
+        samples = self[:]
+        return samples if dtype is None else samples.astype(dtype)
+
+    @property
+    def duration(self) -> float:
+        return len(self) / self.sample_rate
+
+    def wait_for(self, sample_count: int) -> int:
+        """Samples available; everything is decoded already, so this never blocks."""
+        return len(self)
+
+    def read(self, start_sample: int, end_sample: int) -> np.ndarray:
+        return self[start_sample:end_sample]
+
+
+def open_pcm(pcm_path: Path) -> PCMSamples:
+    """Open an int16 PCM cache file as float32 samples (memory-mapped, converted on access)."""
+    return PCMSamples(pcm_path)
+
+
+def load_decoded_audio(video_path: str) -> PCMSamples:
+    """16 kHz mono samples of video_path, memory-mapped from the shared cache."""
+    return open_pcm(get_decoded_audio_path(video_path))
+
+
+def frame_rms_db(audio: np.ndarray, sample_rate: int = AUDIO_SAMPLE_RATE,
+                 frame_seconds: float = 0.05) -> np.ndarray:
+    """RMS level in dBFS of consecutive, non-overlapping frames."""
+    frame_size = max(1, int(sample_rate * frame_seconds))
+    frame_count = len(audio) // frame_size
+    if frame_count == 0:
+        return np.zeros(0, dtype=np.float32)
+
+    frames = np.asarray(audio[:frame_count * frame_size], dtype=np.float32).reshape(frame_count, frame_size)
+    rms = np.sqrt(np.mean(np.square(frames), axis=1))
+    return (20.0 * np.log10(np.maximum(rms, 1e-10))).astype(np.float32)
+
+
+def measure_loudness(audio: np.ndarray) -> float:
+    """Overall RMS level in dBFS (unweighted; enough to compare spans of the same source)."""
+    if len(audio) == 0:
+        return -200.0
+    rms = float(np.sqrt(np.mean(np.square(np.asarray(audio, dtype=np.float64)))))
+    return 20.0 * float(np.log10(max(rms, 1e-10)))
+
+
+def detect_silences(audio: np.ndarray, sample_rate: int = AUDIO_SAMPLE_RATE,
+                    threshold_db: float = -40.0, min_duration: float = 0.3,
+                    frame_seconds: float = 0.05) -> List[Tuple[float, float]]:
+    """Return (start, end) seconds of runs quieter than threshold_db lasting at least min_duration."""
+    levels = frame_rms_db(audio, sample_rate, frame_seconds)
+    if len(levels) == 0:
+        return []
+
+    quiet = np.concatenate(([False], levels < threshold_db, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+    starts, ends = edges[0::2], edges[1::2]
+
+    silences = []
+    for start_frame, end_frame in zip(starts, ends):
+        start = start_frame * frame_seconds
+        end = end_frame * frame_seconds
+        if end - start >= min_duration:
+            silences.append((round(start, 3), round(end, 3)))
+    return silences
@@ -0,0 +1,153 @@
+import threading
+import time
+from pathlib import Path
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from config import (
+    DOWNLOADS_DIR, DOWNLOAD_STORE_MAX_MB, DOWNLOAD_STORE_TOUCH_INTERVAL, DOWNLOAD_UNTRACKED_MAX_AGE_HOURS
+)
+from utils.audio_cache import decoded_audio_cache_path
+from utils.helpers import atomic_write_json, load_json_file
+
+_index_lock = threading.Lock()
+# (index path, video id) -> number of pipelines still using that video's downloads
+_leases: Dict[Tuple[str, str], int] = {}
+
+
+class DownloadStore:
+    """Downloaded files keyed by video id and requested format, evicted least recently used.
+
+    `<root>/download_index.json` maps '{video_id}|{format}' to the download's
+    metadata, its files and their total size, and when it was last used. A
+    hit skips yt-dlp entirely. When the indexed files exceed max_bytes the
+    least recently used downloads are deleted, except those of videos leased
+    by a running pipeline (get/put with lease=True, until release). Files the
+    index does not know (uploads, older downloads) are removed by age instead,
+    see sweep_untracked.
+    """
+
+    def __init__(self, root: Path = DOWNLOADS_DIR, max_bytes: Optional[int] = DOWNLOAD_STORE_MAX_MB * 1024 * 1024):
+        self.root = Path(root)
+        self.index_path = self.root / "download_index.json"
+        self.max_bytes = max_bytes
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    @staticmethod
+    def key(video_id: str, format_key: str) -> str:
+        return f"{video_id}|{format_key}"
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        if not self.index_path.exists():
+            return {}
+        return load_json_file(self.index_path) or {}
+
+    def get(self, video_id: str, format_key: str, lease: bool = False) -> Optional[Dict[str, Any]]:
+        """Metadata of a stored download whose files all still exist, marking it used.
+
+        The last-use time is only written back once it is DOWNLOAD_STORE_TOUCH_INTERVAL
+        old, so repeated hits do not rewrite the index each time.
+        """
+        key = self.key(video_id, format_key)
+        with _index_lock:
+            index = self._read_index()
+            entry = index.get(key)
+            if entry is None:
+                return None
+            if not all(Path(path).exists() for path in entry['files']):
+                del index[key]
+                atomic_write_json(index, self.index_path)
+                return None
+            now = time.time()
+            if now - entry['last_access'] >= DOWNLOAD_STORE_TOUCH_INTERVAL:
+                entry['last_access'] = now
+                atomic_write_json(index, self.index_path)
+            if lease:
+                self._lease(video_id)
+            return dict(entry['metadata'])
+
+    def put(self, video_id: str, format_key: str, metadata: Dict[str, Any], files: Iterable[Path],
+            lease: bool = False) -> int:
+        """Record a finished download, then evict down to the quota. Returns the number of evicted downloads."""
+        files = [str(path) for path in files if Path(path).exists()]
+        key = self.key(video_id, format_key)
+        with _index_lock:
+            index = self._read_index()
+            index[key] = {
+                'video_id': video_id,
+                'format': format_key,
+                'metadata': metadata,
+                'files': files,
+                'size': sum(Path(path).stat().st_size for path in files),
+                'last_access': time.time(),
+            }
+            if lease:
+                self._lease(video_id)
+            evicted = self._evict(index, protect={key})
+            atomic_write_json(index, self.index_path)
+        if evicted:
+            print(f"Evicted {len(evicted)} least recently used download(s) to stay under the disk quota")
+        return len(evicted)
+
+    def release(self, video_id: str):
+        """Drop one lease on video_id taken by get or put; its downloads may be evicted again."""
+        lease_key = (str(self.index_path), video_id)
+        with _index_lock:
+            count = _leases.get(lease_key, 0) - 1
+            if count > 0:
+                _leases[lease_key] = count
+            else:
+                _leases.pop(lease_key, None)
+
+    def _lease(self, video_id: str):
+        lease_key = (str(self.index_path), video_id)
+        _leases[lease_key] = _leases.get(lease_key, 0) + 1
+
+    def _evict(self, index: Dict[str, Dict[str, Any]], protect: set) -> List[str]:
+        """Delete least recently used downloads from `index` (in place) until it fits max_bytes.
+
+        Keys in `protect` and downloads of leased videos are kept.
+        """
+        if self.max_bytes is None:
+            return []
+        total = sum(entry['size'] for entry in index.values())
+        evicted = []
+        for key, entry in sorted(index.items(), key=lambda item: item[1]['last_access']):
+            if total <= self.max_bytes:
+                break
+            if key in protect or (str(self.index_path), entry['video_id']) in _leases:
+                continue
+            for path in entry['files']:
+                try:
+                    # The decoded audio of an evicted source is never read again
+                    decoded_audio_cache_path(path).unlink(missing_ok=True)
+                except OSError:
+                    pass
+                Path(path).unlink(missing_ok=True)
+            total -= entry['size']
+            evicted.append(key)
+        for key in evicted:
+            del index[key]
+        return evicted
+
+    def sweep_untracked(self, max_age_hours: float = DOWNLOAD_UNTRACKED_MAX_AGE_HOURS) -> int:
+        """Delete files in root that the index does not track, once older than max_age_hours. Returns the count."""
+        cutoff = time.time() - max_age_hours * 3600
+        deleted = 0
+        with _index_lock:
+            tracked = {Path(path).resolve() for entry in self._read_index().values() for path in entry['files']}
+            for path in self.root.iterdir():
+                if not path.is_file() or path == self.index_path or path.resolve() in tracked:
+                    continue
+                try:
+                    if path.stat().st_mtime >= cutoff:
+                        continue
+                    decoded_audio_cache_path(path).unlink(missing_ok=True)
+                    path.unlink()
+                    deleted += 1
+                except OSError:
+                    pass
+        return deleted
+
+    @property
+    def total_bytes(self) -> int:
+        return sum(entry['size'] for entry in self._read_index().values())
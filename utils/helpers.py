@@ -1,8 +1,8 @@
 import os
 import sys
-import time as _time
+import uuid
 from pathlib import Path
-from typing import Optional, Dict, List
+from typing import Iterable, Optional, Dict, List
 import json
 from datetime import timedelta
 import subprocess
@@ -61,14 +61,26 @@ def load_json_file(filepath: Path) -> Optional[Dict]:
 
 def save_json_file(data: Dict, filepath: Path) -> bool:
     try:
-        with open(filepath, 'w', encoding='utf-8') as f:
-            json.dump(data, f, indent=2, ensure_ascii=False)
+        atomic_write_json(data, filepath)
         return True
     except Exception as e:
         # Error saving JSON
         return False
 
 
+def atomic_write_json(data, filepath: Path, indent: Optional[int] = 2):
+    """Write JSON to a temp file in the same directory, then rename it over filepath."""
+    filepath = Path(filepath)
+    temp_path = filepath.with_name(f".{filepath.name}.{os.getpid()}.{uuid.uuid4().hex}.tmp")
+    try:
+        with open(temp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, indent=indent, ensure_ascii=False)
+        os.replace(temp_path, filepath)
+    finally:
+        if temp_path.exists():
+            temp_path.unlink()
+
+
 def clean_filename(filename: str) -> str:
     import re
     filename = re.sub(r'[<>:"/\\|?*]', '_', filename)
@@ -136,17 +148,45 @@ def create_summary_report(video_metadata: Dict, moments: List[Dict],
     return str(report_path)
 
 
-def cleanup_downloads(downloads_dir: Path, max_age_hours: int = 24) -> int:
-    """Remove downloaded video files older than max_age_hours. Returns count of deleted files."""
-    if not downloads_dir.exists():
+def prune_cache_dir(cache_dir: Path, max_bytes: Optional[int] = None,
+                    max_entries: Optional[int] = None, pattern: str = '*.json',
+                    recursive: bool = True, protect: Iterable[Path] = ()) -> int:
+    """Delete least recently used files (by mtime) under cache_dir until both caps hold.
+
+    Returns the number of files removed. Cache readers refresh the mtime on a hit.
+    Files in `protect` (e.g. the one just written) are never removed.
+    """
+    protect = {Path(path).resolve() for path in protect}
+    cache_dir = Path(cache_dir)
+    if not cache_dir.exists():
         return 0
-    cutoff = _time.time() - (max_age_hours * 3600)
-    deleted = 0
-    for path in downloads_dir.iterdir():
-        if path.is_file() and path.stat().st_mtime < cutoff:
+
+    entries = []
+    for path in (cache_dir.rglob(pattern) if recursive else cache_dir.glob(pattern)):
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            continue
+        entries.append((stat.st_mtime, stat.st_size, path))
+
+    total_bytes = sum(size for _, size, _ in entries)
+    entries.sort(key=lambda entry: entry[0])
+
+    removed = 0
+    for _, size, path in entries:
+        over_bytes = max_bytes is not None and total_bytes > max_bytes
+        over_entries = max_entries is not None and len(entries) - removed > max_entries
+        if not over_bytes and not over_entries:
+            break
+        if path.resolve() in protect:
+            continue
+        try:
             path.unlink()
-            deleted += 1
-    return deleted
+        except FileNotFoundError:
+            pass
+        total_bytes -= size
+        removed += 1
+    return removed
 
 
 class ProgressBar:
@@ -0,0 +1,146 @@
+import threading
+import time
+from typing import Any, Callable, Dict, List, Optional
+
+import ollama
+
+from config import OLLAMA_HOSTS, OLLAMA_HEALTH_CHECK_INTERVAL
+
+try:
+    import httpx
+    _HOST_ERRORS = (ConnectionError, OSError, httpx.TransportError)
+except ImportError:
+    _HOST_ERRORS = (ConnectionError, OSError)
+
+_pool = None
+_pool_guard = threading.Lock()
+
+
+class OllamaHost:
+    def __init__(self, host: str, max_concurrency: int = 1, client: Any = None):
+        self.host = host
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.client = client if client is not None else ollama.Client(host=host)
+        self.in_flight = 0
+        self.healthy = True
+        self.checked_at = 0.0
+
+    @property
+    def load(self) -> float:
+        return self.in_flight / self.max_concurrency
+
+
+class OllamaHostPool:
+    """Routes Ollama requests over several hosts, each with its own concurrency limit.
+
+    Each request goes to the least-loaded healthy host with a free slot.
+    A host that fails to connect is marked down and the request moves to
+    another host. Down hosts are probed again every health_check_interval
+    seconds.
+    """
+
+    def __init__(self, hosts: List[Dict[str, Any]], health_check_interval: float = OLLAMA_HEALTH_CHECK_INTERVAL,
+                 client_factory: Optional[Callable[[str], Any]] = None):
+        if not hosts:
+            raise ValueError("At least one Ollama host is required")
+        self.hosts = [
+            OllamaHost(
+                entry['host'],
+                entry.get('max_concurrency', 1),
+                client_factory(entry['host']) if client_factory else None,
+            )
+            for entry in hosts
+        ]
+        self.health_check_interval = health_check_interval
+        self.condition = threading.Condition()
+
+    @property
+    def capacity(self) -> int:
+        """Total request slots on healthy hosts (at least 1)."""
+        healthy = [host for host in self.hosts if host.healthy] or self.hosts
+        return max(1, sum(host.max_concurrency for host in healthy))
+
+    def check_host(self, host: OllamaHost) -> bool:
+        try:
+            host.client.list()
+            healthy = True
+        except Exception:
+            healthy = False
+        with self.condition:
+            host.healthy = healthy
+            host.checked_at = time.monotonic()
+            self.condition.notify_all()
+        return healthy
+
+    def mark_down(self, host: OllamaHost):
+        with self.condition:
+            host.healthy = False
+            host.checked_at = time.monotonic()
+            self.condition.notify_all()
+
+    def _recheck_down_hosts(self, force: bool = False):
+        now = time.monotonic()
+        for host in self.hosts:
+            if not host.healthy and (force or now - host.checked_at >= self.health_check_interval):
+                self.check_host(host)
+
+    def _acquire(self, exclude: set) -> OllamaHost:
+        """Reserve a slot on the least-loaded healthy host not in `exclude`."""
+        self._recheck_down_hosts()
+        probed = False
+        with self.condition:
+            while True:
+                candidates = [host for host in self.hosts if host.healthy and host not in exclude]
+                free = [host for host in candidates if host.in_flight < host.max_concurrency]
+                if free:
+                    host = min(free, key=lambda item: item.load)
+                    host.in_flight += 1
+                    return host
+                if candidates:
+                    self.condition.wait(timeout=self.health_check_interval)
+                    continue
+                if probed:
+                    raise Exception(
+                        "No Ollama host reachable: " + ", ".join(host.host for host in self.hosts)
+                    )
+                # Every remaining host is down: probe them once before giving up.
+                self.condition.release()
+                try:
+                    self._recheck_down_hosts(force=True)
+                finally:
+                    self.condition.acquire()
+                probed = True
+
+    def _release(self, host: OllamaHost, failed: bool = False):
+        with self.condition:
+            host.in_flight -= 1
+            self.condition.notify_all()
+        if failed:
+            self.mark_down(host)
+
+    def chat(self, **kwargs) -> Any:
+        """ollama.chat on the least-loaded healthy host, failing over on connection errors."""
+        tried = set()
+        while True:
+            host = self._acquire(tried)
+            try:
+                response = host.client.chat(**kwargs)
+            except _HOST_ERRORS as e:
+                self._release(host, failed=True)
+                tried.add(host)
+                print(f"Warning: Ollama host {host.host} unavailable ({e}), routing around it")
+                continue
+            except Exception:
+                self._release(host)
+                raise
+            self._release(host)
+            return response
+
+
+def get_ollama_pool() -> OllamaHostPool:
+    """Process-wide pool built from OLLAMA_HOSTS."""
+    global _pool
+    with _pool_guard:
+        if _pool is None:
+            _pool = OllamaHostPool(OLLAMA_HOSTS)
+        return _pool
@@ -0,0 +1,189 @@
+import os
+import threading
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+import ffmpeg
+import numpy as np
+
+from config import AUDIO_CACHE_DIR, AUDIO_SAMPLE_RATE
+from utils.audio_cache import decoded_audio_cache_path, prune_audio_cache, write_pcm
+
+_READ_SIZE = 1 << 16
+_CONVERT_BLOCK = AUDIO_SAMPLE_RATE * 60
+
+
+class ProgressivePCM:
+    """16 kHz mono float32 PCM decoded from an audio file while it is still downloading.
+
+    `hook` is a yt-dlp progress hook: on the first 'downloading' status the
+    growing file is tailed into an ffmpeg pipe, and the decoded samples are
+    appended to a temporary file in AUDIO_CACHE_DIR. Readers block in
+    wait_for until enough samples exist or decoding has ended.
+    """
+
+    def __init__(self, sample_rate: int = AUDIO_SAMPLE_RATE, poll_interval: float = 0.2):
+        self.sample_rate = sample_rate
+        self.poll_interval = poll_interval
+        self.path = AUDIO_CACHE_DIR / f".progressive_{uuid.uuid4().hex}.f32"
+        self.duration = 0.0  # Expected seconds of audio, from the download's info dict
+        self.samples = 0
+        self.finished = False
+        self.error: Optional[Exception] = None
+        self.condition = threading.Condition()
+        self._download_done = threading.Event()
+        self._process = None
+        self._threads = []
+        self._final_path: Optional[Path] = None
+
+    @property
+    def started(self) -> bool:
+        return self._process is not None
+
+    def hook(self, status: Dict[str, Any]):
+        info = status.get('info_dict') or {}
+        if info.get('duration'):
+            self.duration = float(info['duration'])
+        if status['status'] == 'downloading' and not self.started:
+            self.start(status.get('tmpfilename') or status['filename'])
+        elif status['status'] == 'finished':
+            self._final_path = Path(status['filename'])
+            if not self.started:
+                # Already on disk: nothing was streamed, decode the complete file
+                self.start(status['filename'])
+            self._download_done.set()
+        elif status['status'] == 'error':
+            self.fail(Exception("Audio download failed"))
+
+    def start(self, source_path: str):
+        """Start decoding `source_path`, which may still be growing."""
+        AUDIO_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+        self.path.write_bytes(b'')
+        self._process = (
+            ffmpeg
+            .input('pipe:')
+            .output('pipe:', f='f32le', acodec='pcm_f32le', ac=1, ar=self.sample_rate)
+            .global_args('-loglevel', 'error')
+            .run_async(pipe_stdin=True, pipe_stdout=True)
+        )
+        self._threads = [
+            threading.Thread(target=self._feed, args=(Path(source_path),), daemon=True),
+            threading.Thread(target=self._collect, daemon=True),
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def download_finished(self):
+        """Mark the source complete (for callers not using `hook`)."""
+        self._download_done.set()
+
+    def fail(self, error: Exception):
+        with self.condition:
+            if self.error is None:
+                self.error = error
+            self.condition.notify_all()
+        self._download_done.set()
+
+    def _feed(self, source_path: Path):
+        """Copy the growing file into ffmpeg's stdin until the download has finished."""
+        try:
+            while not source_path.exists():
+                if self._download_done.is_set():
+                    # yt-dlp renames the .part file when it finishes
+                    if self._final_path is None or not self._final_path.exists():
+                        raise FileNotFoundError(f"Audio download not found: {source_path}")
+                    source_path = self._final_path
+                    break
+                time.sleep(self.poll_interval)
+            with open(source_path, 'rb') as source:
+                while self.error is None:
+                    done = self._download_done.is_set()
+                    data = source.read(_READ_SIZE)
+                    if data:
+                        self._process.stdin.write(data)
+                        self._process.stdin.flush()
+                    elif done:
+                        # Finished before this empty read: everything has been copied
+                        break
+                    else:
+                        time.sleep(self.poll_interval)
+        except BrokenPipeError:
+            pass
+        except Exception as e:
+            self.fail(e)
+        finally:
+            try:
+                self._process.stdin.close()
+            except OSError:
+                pass
+
+    def _collect(self):
+        """Append decoded samples to the PCM file, publishing whole samples only."""
+        pending = b''
+        with open(self.path, 'ab') as output:
+            while True:
+                # read1: whatever is decoded now, not a full buffer
+                data = self._process.stdout.read1(_READ_SIZE)
+                if not data:
+                    break
+                pending += data
+                usable = len(pending) - len(pending) % 4
+                if not usable:
+                    continue
+                output.write(pending[:usable])
+                output.flush()
+                pending = pending[usable:]
+                with self.condition:
+                    self.samples += usable // 4
+                    self.condition.notify_all()
+
+        returncode = self._process.wait()
+        with self.condition:
+            if returncode != 0 and self.error is None:
+                self.error = Exception(f"FFmpeg progressive audio decode failed (exit code {returncode})")
+            self.finished = True
+            self.condition.notify_all()
+
+    def wait_for(self, sample_count: int) -> int:
+        """Block until sample_count samples are decoded or decoding ends; returns the count available."""
+        with self.condition:
+            while self.samples < sample_count and not self.finished and self.error is None:
+                self.condition.wait()
+            if self.error is not None:
+                raise self.error
+            return self.samples
+
+    def read(self, start_sample: int, end_sample: int) -> np.ndarray:
+        """Decoded samples [start_sample, end_sample); they must already be available."""
+        count = max(0, min(end_sample, self.samples) - start_sample)
+        if count == 0:
+            return np.zeros(0, dtype=np.float32)
+        return np.fromfile(self.path, dtype=np.float32, count=count, offset=start_sample * 4)
+
+    def publish(self, video_path: str) -> Path:
+        """Store the complete PCM in the shared decoded-audio cache of video_path."""
+        self.wait_for(float('inf'))
+        cache_path = decoded_audio_cache_path(video_path)
+        if not cache_path.exists():
+            # The cache holds int16: convert block by block, then publish atomically
+            temp_path = cache_path.with_name(f".{cache_path.name}.{uuid.uuid4().hex}.tmp")
+            try:
+                with open(temp_path, 'wb') as output:
+                    for offset in range(0, self.samples, _CONVERT_BLOCK):
+                        write_pcm(self.read(offset, offset + _CONVERT_BLOCK), output)
+                os.replace(temp_path, cache_path)
+            finally:
+                temp_path.unlink(missing_ok=True)
+            prune_audio_cache(cache_path)
+        self.close()
+        return cache_path
+
+    def close(self):
+        if self._process is not None and self._process.poll() is None:
+            self._process.kill()
+        for thread in self._threads:
+            thread.join(timeout=5)
+        if self.path.exists():
+            self.path.unlink()
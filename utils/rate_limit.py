@@ -0,0 +1,132 @@
+import random
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from config import LLM_RATE_LIMITS, LLM_MAX_RETRIES, LLM_RETRY_BASE_DELAY, LLM_RETRY_MAX_DELAY
+
+_limiters: Dict[str, "ProviderLimiter"] = {}
+_limiters_guard = threading.Lock()
+
+
+class TokenBucket:
+    """Blocking token bucket refilled continuously at `per_minute` tokens per minute."""
+
+    def __init__(self, per_minute: float):
+        self.capacity = float(per_minute)
+        self.tokens = float(per_minute)
+        self.updated = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self, amount: float = 1.0):
+        if self.capacity <= 0:
+            return
+        # Requests larger than the whole bucket wait for a full bucket instead of forever.
+        amount = min(float(amount), self.capacity)
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.capacity / 60.0)
+                self.updated = now
+                if self.tokens >= amount:
+                    self.tokens -= amount
+                    return
+                wait = (amount - self.tokens) * 60.0 / self.capacity
+            time.sleep(wait)
+
+
+def is_throttling_error(error: Exception) -> bool:
+    """True for rate-limit/overload responses (429, 503, 529) that are worth retrying."""
+    status = getattr(error, 'status_code', None) or getattr(getattr(error, 'response', None), 'status_code', None)
+    if status in (429, 503, 529):
+        return True
+    name = type(error).__name__.lower()
+    message = str(error).lower()
+    return (
+        'ratelimit' in name or 'overloaded' in name
+        or 'rate limit' in message or 'overloaded' in message or '429' in message
+    )
+
+
+def _retry_after(error: Exception) -> float:
+    headers = getattr(getattr(error, 'response', None), 'headers', None) or {}
+    try:
+        return float(headers.get('retry-after', 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class ProviderLimiter:
+    """Process-wide limits for one LLM provider, shared by every analyzer and request thread.
+
+    Concurrency follows AIMD: the in-flight limit halves on a throttling
+    error and grows by about one slot per window of successful calls, between
+    1 and max_concurrency. Requests and estimated tokens also pass through
+    per-minute token buckets (0 disables a bucket). Throttled calls are retried
+    with full-jitter exponential backoff, honoring Retry-After when present.
+    """
+
+    def __init__(self, name: str, max_concurrency: int, initial_concurrency: Optional[int] = None,
+                 rpm: float = 0, tpm: float = 0):
+        self.name = name
+        self.max_concurrency = max(1, int(max_concurrency))
+        self.limit = float(min(self.max_concurrency, initial_concurrency or self.max_concurrency))
+        self.in_flight = 0
+        self.condition = threading.Condition()
+        self.requests = TokenBucket(rpm)
+        self.tokens = TokenBucket(tpm)
+
+    def acquire(self, estimated_tokens: int = 0):
+        with self.condition:
+            while self.in_flight >= int(self.limit):
+                self.condition.wait()
+            self.in_flight += 1
+        try:
+            self.requests.acquire(1)
+            self.tokens.acquire(estimated_tokens)
+        except BaseException:
+            self.release(success=False)
+            raise
+
+    def release(self, success: bool = True, throttled: bool = False):
+        with self.condition:
+            self.in_flight -= 1
+            if throttled:
+                self.limit = max(1.0, self.limit / 2)
+            elif success:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self.condition.notify_all()
+
+    def call(self, request: Callable[[], str], estimated_tokens: int = 0) -> str:
+        for attempt in range(LLM_MAX_RETRIES + 1):
+            self.acquire(estimated_tokens)
+            try:
+                result = request()
+            except Exception as e:
+                throttled = is_throttling_error(e)
+                self.release(success=False, throttled=throttled)
+                if not throttled or attempt == LLM_MAX_RETRIES:
+                    raise
+                delay = random.uniform(0, min(LLM_RETRY_MAX_DELAY, LLM_RETRY_BASE_DELAY * 2 ** attempt))
+                delay = max(delay, _retry_after(e))
+                print(f"{self.name} throttled ({e}); retrying in {delay:.1f}s "
+                      f"(concurrency limit {int(self.limit)})")
+                time.sleep(delay)
+                continue
+            self.release(success=True)
+            return result
+
+
+def get_provider_limiter(provider: str) -> ProviderLimiter:
+    """Shared limiter for `provider`, configured from LLM_RATE_LIMITS."""
+    with _limiters_guard:
+        if provider not in _limiters:
+            settings = LLM_RATE_LIMITS.get(provider, {})
+            _limiters[provider] = ProviderLimiter(
+                provider,
+                settings.get('max_concurrency', 4),
+                settings.get('initial_concurrency'),
+                settings.get('rpm', 0),
+                settings.get('tpm', 0),
+            )
+        return _limiters[provider]
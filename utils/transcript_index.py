@@ -0,0 +1,124 @@
+from bisect import bisect_left, bisect_right
+from collections.abc import Mapping
+from itertools import accumulate
+from typing import Any, Dict, List, Optional
+
+
+def _is_sorted(values: List[float]) -> bool:
+    return all(a <= b for a, b in zip(values, values[1:]))
+
+
+class TranscriptIndex(Mapping):
+    """Read-only transcript wrapper answering time-range queries in O(log n + k).
+
+    Built once per transcript: segment and flattened word start/end arrays plus
+    running maxima of the end times, so overlap queries are two bisects and a
+    short filter. It behaves like the transcript dict (`index['segments']`,
+    `index.get('language')`), so it can be passed anywhere a transcript is.
+    Transcripts whose start times are not sorted fall back to linear scans.
+    """
+
+    def __init__(self, transcript: Dict[str, Any]):
+        self.transcript = transcript
+        self.segments = transcript.get('segments', [])
+
+        self.segment_starts = [segment['start'] for segment in self.segments]
+        self.segment_ends = [segment['end'] for segment in self.segments]
+        self.segment_max_ends = list(accumulate(self.segment_ends, max))
+
+        # Flattened words; word_offsets[i]:word_offsets[i + 1] are the words of segment i.
+        self.words = []
+        self.word_segments = []
+        self.word_offsets = [0]
+        for segment_index, segment in enumerate(self.segments):
+            for word in segment.get('words', []):
+                self.words.append(word)
+                self.word_segments.append(segment_index)
+            self.word_offsets.append(len(self.words))
+        self.word_starts = [word['start'] for word in self.words]
+        self.word_max_ends = list(accumulate((word['end'] for word in self.words), max))
+
+        self.segments_sorted = _is_sorted(self.segment_starts)
+        self.words_sorted = self.segments_sorted and _is_sorted(self.word_starts)
+
+    def __getitem__(self, key):
+        return self.transcript[key]
+
+    def __iter__(self):
+        return iter(self.transcript)
+
+    def __len__(self):
+        return len(self.transcript)
+
+    def _segment_overlaps(self, segment_index: int, start_time: float, end_time: float) -> bool:
+        return self.segment_starts[segment_index] < end_time and self.segment_ends[segment_index] > start_time
+
+    def _segment_bounds(self, start_time: float, end_time: float):
+        """[lo, hi) segment indices that can overlap (start_time, end_time)."""
+        hi = bisect_left(self.segment_starts, end_time)
+        lo = bisect_right(self.segment_max_ends, start_time, 0, hi)
+        return lo, hi
+
+    def segments_in_range(self, start_time: float, end_time: float) -> List[Dict]:
+        """Segments overlapping (start_time, end_time), in transcript order."""
+        if not self.segments_sorted:
+            return [
+                segment for segment in self.segments
+                if segment['start'] < end_time and segment['end'] > start_time
+            ]
+
+        lo, hi = self._segment_bounds(start_time, end_time)
+        return [
+            self.segments[index] for index in range(lo, hi)
+            if self.segment_ends[index] > start_time
+        ]
+
+    def words_in_range(self, start_time: float, end_time: float) -> List[Dict]:
+        """Words overlapping (start_time, end_time) from segments that overlap it too."""
+        if not self.words_sorted:
+            return [
+                word
+                for segment in self.segments_in_range(start_time, end_time)
+                for word in segment.get('words', [])
+                if word['start'] < end_time and word['end'] > start_time
+            ]
+
+        lo, hi = self._segment_bounds(start_time, end_time)
+        word_lo, word_hi = self.word_offsets[lo], self.word_offsets[hi]
+        word_hi = bisect_left(self.word_starts, end_time, word_lo, word_hi)
+        word_lo = bisect_right(self.word_max_ends, start_time, word_lo, word_hi)
+
+        return [
+            self.words[index] for index in range(word_lo, word_hi)
+            if self.words[index]['end'] > start_time
+            and self._segment_overlaps(self.word_segments[index], start_time, end_time)
+        ]
+
+    def text_at(self, time: float) -> Optional[Dict]:
+        """Word spoken at `time` (bounds inclusive), or the whole segment if no word matches."""
+        if self.segments_sorted:
+            hi = bisect_right(self.segment_starts, time)
+            lo = bisect_left(self.segment_max_ends, time, 0, hi)
+            candidates = range(lo, hi)
+        else:
+            candidates = range(len(self.segments))
+
+        for index in candidates:
+            segment = self.segments[index]
+            if segment['start'] <= time <= segment['end']:
+                for word in segment.get('words', []):
+                    if word['start'] <= time <= word['end']:
+                        return word
+                return {
+                    'word': segment['text'],
+                    'start': segment['start'],
+                    'end': segment['end'],
+                }
+        return None
+
+
+def build_transcript_index(transcript) -> TranscriptIndex:
+    """Return transcript as a TranscriptIndex, reusing it if it already is one."""
+    if isinstance(transcript, TranscriptIndex):
+        return transcript
+    return TranscriptIndex(transcript)
@@ -0,0 +1,75 @@
+import hashlib
+import json
+import threading
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+from config import TRANSCRIPTS_DIR
+from utils.helpers import atomic_write_json, load_json_file
+from utils.video_metadata import _video_cache_key, get_content_fingerprint
+
+_index_lock = threading.Lock()
+
+
+class TranscriptStore:
+    """Transcripts keyed by source content fingerprint and transcriber signature.
+
+    Files live in `<root>/store/{fingerprint}_{signature hash}.json`, so the same
+    upload under two names shares one transcript and unrelated videos with the
+    same stem never collide. `<root>/index.json` maps resolved source paths to
+    their fingerprint so unchanged files are not re-hashed.
+    """
+
+    def __init__(self, root: Path = TRANSCRIPTS_DIR):
+        self.root = Path(root)
+        self.store_dir = self.root / "store"
+        self.index_path = self.root / "index.json"
+        self.store_dir.mkdir(parents=True, exist_ok=True)
+
+    def _read_index(self) -> Dict[str, Dict[str, Any]]:
+        if not self.index_path.exists():
+            return {}
+        return load_json_file(self.index_path) or {}
+
+    def fingerprint(self, video_path: str) -> str:
+        resolved_path, mtime_ns, size = _video_cache_key(video_path)
+        entry = self._read_index().get(resolved_path)
+        if entry and entry.get('mtime_ns') == mtime_ns and entry.get('size') == size:
+            return entry['fingerprint']
+
+        fingerprint = get_content_fingerprint(video_path)
+        with _index_lock:
+            index = self._read_index()
+            index[resolved_path] = {'fingerprint': fingerprint, 'mtime_ns': mtime_ns, 'size': size}
+            atomic_write_json(index, self.index_path)
+        return fingerprint
+
+    def path_for(self, video_path: str, signature: Dict[str, Any]) -> Path:
+        signature_hash = hashlib.sha256(json.dumps(signature, sort_keys=True).encode()).hexdigest()[:16]
+        return self.store_dir / f"{self.fingerprint(video_path)}_{signature_hash}.json"
+
+    def legacy_path(self, video_path: str) -> Path:
+        """Pre-fingerprint cache location, `<root>/{stem}_transcript.json`."""
+        return self.root / f"{Path(video_path).stem}_transcript.json"
+
+    def load(self, video_path: str, signature: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        transcript_path = self.path_for(video_path, signature)
+        data = load_json_file(transcript_path) if transcript_path.exists() else None
+
+        if data is None:
+            # Adopt a legacy stem-keyed transcript, but only if it was made from this file.
+            legacy = self.legacy_path(video_path)
+            data = load_json_file(legacy) if legacy.exists() else None
+            if data is None or data.get('transcriber') != signature:
+                return None
+            if Path(data.get('video_path', '')).expanduser().resolve() != Path(video_path).expanduser().resolve():
+                return None
+            self.save(transcript_path, data)
+
+        if data.get('transcriber') != signature:
+            return None
+        data['video_path'] = str(video_path)
+        return data
+
+    def save(self, transcript_path: Path, transcript_data: Dict[str, Any]):
+        atomic_write_json(transcript_data, transcript_path)
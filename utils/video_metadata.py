@@ -1,11 +1,19 @@
+import hashlib
+import re
+import subprocess
 from fractions import Fraction
 from functools import lru_cache
 from pathlib import Path
-from typing import Any, Dict, Tuple
+from typing import Any, Dict, List, Tuple
 
 import ffmpeg
 
-from config import VIDEO_INFO_CACHE_SIZE
+from config import VIDEO_INFO_CACHE_SIZE, FINGERPRINT_SAMPLE_COUNT, FINGERPRINT_SAMPLE_SIZE
+
+try:
+    import xxhash
+except ImportError:
+    xxhash = None
 
 
 def _video_cache_key(video_path: str) -> Tuple[str, int, int]:
@@ -51,7 +59,12 @@ def _probe_video_cached(resolved_path: str, mtime_ns: int, size: int) -> Dict[st
             'width': int(video_stream.get('width') or 0),
             'height': int(video_stream.get('height') or 0),
             'video_codec': video_stream.get('codec_name', ''),
+            'pix_fmt': video_stream.get('pix_fmt', ''),
             'fps': float(Fraction(fps_value)) if fps_value != '0/0' else 0.0,
+            # Codec parameters a stream-copied cut has to match
+            'video_profile': video_stream.get('profile', ''),
+            'video_level': int(video_stream.get('level') or 0),
+            'video_time_base': video_stream.get('time_base', ''),
         })
 
     if audio_stream:
@@ -67,3 +80,122 @@ def _probe_video_cached(resolved_path: str, mtime_ns: int, size: int) -> Dict[st
 def get_video_info(video_path: str) -> Dict[str, Any]:
     resolved_path, mtime_ns, size = _video_cache_key(video_path)
     return dict(_probe_video_cached(resolved_path, mtime_ns, size))
+
+
+@lru_cache(maxsize=VIDEO_INFO_CACHE_SIZE)
+def _probe_keyframes_cached(resolved_path: str, mtime_ns: int, size: int) -> Tuple[float, ...]:
+    _ = (mtime_ns, size)
+
+    # Packet flags come from the demuxer, so no frame has to be decoded.
+    result = subprocess.run(
+        [
+            'ffprobe', '-v', 'error',
+            '-select_streams', 'v:0',
+            '-show_entries', 'packet=pts_time,flags',
+            '-of', 'csv=p=0',
+            resolved_path,
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(f"ffprobe keyframe scan failed: {result.stderr.strip()}")
+
+    keyframes = []
+    for line in result.stdout.splitlines():
+        pts_time, _, flags = line.partition(',')
+        if 'K' not in flags or pts_time in ('', 'N/A'):
+            continue
+        keyframes.append(float(pts_time))
+
+    return tuple(sorted(keyframes))
+
+
+def get_keyframe_times(video_path: str) -> List[float]:
+    """Sorted presentation times (seconds) of the video keyframes, cached per file version."""
+    resolved_path, mtime_ns, size = _video_cache_key(video_path)
+    return list(_probe_keyframes_cached(resolved_path, mtime_ns, size))
+
+
+# "[trace_headers @ 0x...] 45          max_num_ref_frames          00101 = 4"
+_TRACE_FIELD = re.compile(r'^\[trace_headers[^\]]*\]\s+\d+\s+(\S+)\s+[01]+\s+=\s+(-?\d+)\s*$')
+_TRACE_SECTIONS = {'Sequence Parameter Set': 'sps', 'Picture Parameter Set': 'pps'}
+
+
+@lru_cache(maxsize=VIDEO_INFO_CACHE_SIZE)
+def _probe_parameter_sets_cached(resolved_path: str, mtime_ns: int, size: int) -> Dict[str, Dict[str, int]]:
+    _ = (mtime_ns, size)
+
+    # ffprobe does not report entropy coding or most SPS/PPS fields, so dump the
+    # parameter sets of the first packet with the trace_headers bitstream filter.
+    result = subprocess.run(
+        [
+            'ffmpeg', '-hide_banner', '-nostdin', '-v', 'info',
+            '-i', resolved_path,
+            '-map', '0:v:0', '-c', 'copy', '-bsf:v', 'trace_headers',
+            '-frames:v', '1', '-f', 'null', '-',
+        ],
+        stdout=subprocess.PIPE,
+        stderr=subprocess.PIPE,
+        text=True,
+    )
+    if result.returncode != 0:
+        raise Exception(f"ffmpeg parameter set dump failed: {result.stderr.strip()[-500:]}")
+
+    # Only the first SPS and PPS are kept (the ones in the container extradata).
+    parameter_sets: Dict[str, Dict[str, int]] = {}
+    section = None
+    for line in result.stderr.splitlines():
+        if not line.startswith('[trace_headers'):
+            continue
+        match = _TRACE_FIELD.match(line)
+        if match:
+            if section:
+                field, value = match.groups()
+                parameter_sets[section].setdefault(field, int(value))
+            continue
+        # Any other header line (extradata, slice header, SEI...) ends the section
+        name = _TRACE_SECTIONS.get(line.split(']', 1)[1].strip())
+        section = name if name and name not in parameter_sets else None
+        if section:
+            parameter_sets[section] = {}
+
+    return parameter_sets
+
+
+def get_parameter_sets(video_path: str) -> Dict[str, Dict[str, int]]:
+    """First H.264 SPS and PPS of video_path as {'sps': {field: value}, 'pps': {...}}."""
+    resolved_path, mtime_ns, size = _video_cache_key(video_path)
+    return {name: dict(fields) for name, fields in _probe_parameter_sets_cached(resolved_path, mtime_ns, size).items()}
+
+
+@lru_cache(maxsize=VIDEO_INFO_CACHE_SIZE)
+def _fingerprint_cached(resolved_path: str, mtime_ns: int, size: int) -> str:
+    _ = mtime_ns
+
+    hasher = xxhash.xxh3_128() if xxhash else hashlib.blake2b(digest_size=16)
+    hasher.update(str(size).encode())
+
+    # Head, tail and evenly spaced blocks: a few MB read regardless of file size.
+    block = FINGERPRINT_SAMPLE_SIZE
+    if size <= block * (FINGERPRINT_SAMPLE_COUNT + 2):
+        offsets = [0]
+        block = size
+    else:
+        stride = (size - block) / (FINGERPRINT_SAMPLE_COUNT + 1)
+        offsets = [int(stride * index) for index in range(FINGERPRINT_SAMPLE_COUNT + 2)]
+
+    with open(resolved_path, 'rb') as f:
+        for offset in offsets:
+            f.seek(offset)
+            hasher.update(f.read(block))
+
+    prefix = 'xxh3' if xxhash else 'b2b'
+    return f"{prefix}-{hasher.hexdigest()}"
+
+
+def get_content_fingerprint(video_path: str) -> str:
+    """Sampled content hash of video_path; identical uploads under different names share it."""
+    resolved_path, mtime_ns, size = _video_cache_key(video_path)
+    return _fingerprint_cached(resolved_path, mtime_ns, size)